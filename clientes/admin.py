@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Empresa, ReporteAsistencia, ArchivoReporte
+from .models import Empresa, ReporteAsistencia, ArchivoReporte, TrabajoPdfReporte
 
 class ArchivoReporteInline(admin.TabularInline):
     model = ArchivoReporte
@@ -12,7 +12,7 @@ class ArchivoReporteInline(admin.TabularInline):
         if obj.archivo:
             # Si es imagen, muestra miniatura; si es PDF, muestra icono
             if obj.archivo.name.lower().endswith(('.png', '.jpg', '.jpeg')):
-                return format_html('<img src="{}" style="width: 50px; height: auto; border-radius: 5px;" />', obj.archivo.url)
+                return format_html('<img src="{}" style="width: 50px; height: auto; border-radius: 5px;" />', obj.url_miniatura)
             return format_html('<i class="bi bi-file-pdf text-danger" style="font-size: 20px;"></i> PDF')
         return "-"
     ver_archivo.short_description = 'Previsualización'
@@ -78,4 +78,13 @@ class ArchivoReporteAdmin(admin.ModelAdmin):
         if obj.tipo == 'PDF':
             return format_html('<b style="color: #d9534f;">📄 PDF</b>')
         return format_html('<b style="color: #5bc0de;">🖼️ Imagen</b>')
-    tipo_icon.short_description = 'Tipo de Archivo'
\ No newline at end of file
+    tipo_icon.short_description = 'Tipo de Archivo'
+
+@admin.register(TrabajoPdfReporte)
+class TrabajoPdfReporteAdmin(admin.ModelAdmin):
+    """Cola de generación de PDFs (procesada por manage.py procesar_pdfs_reportes)."""
+
+    list_display = ['id', 'reporte', 'estado', 'progreso', 'usuario', 'intentos', 'fecha_creacion', 'fecha_fin']
+    list_filter = ['estado', 'fecha_creacion']
+    search_fields = ['reporte__numero_reporte']
+    readonly_fields = ['firma', 'progreso', 'etapa', 'intentos', 'fecha_creacion', 'fecha_inicio', 'fecha_fin']
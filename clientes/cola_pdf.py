@@ -0,0 +1,260 @@
+# clientes/cola_pdf.py - GENERACIÓN DE PDFs DE REPORTES EN SEGUNDO PLANO
+
+"""
+Cola de generación del PDF completo de los reportes, respaldada en la base de
+datos como la de facturas (compras/ingesta.py): la tabla TrabajoPdfReporte es
+la cola y no hace falta ningún broker externo.
+
+La vista ya no llama a pisa.CreatePDF ni une adjuntos: si el PDF vigente está
+en el almacén de artefactos (clientes/pdf.py) lo sirve, y si no encola un
+trabajo y responde enseguida con su id. El navegador consulta el estado
+(progreso y etapa) y descarga el PDF cuando el trabajo está listo.
+
+El worker (manage.py procesar_pdfs_reportes) renderiza en un pool de procesos.
+Límites para que los PDFs no dejen sin CPU a los workers web:
+- REPORTES_PDF_PROCESOS: PDFs generándose a la vez (procesos del pool).
+- REPORTES_PDF_NICE: prioridad de CPU más baja para esos procesos.
+- REPORTES_PDF_MAX_EN_COLA_USUARIO: trabajos sin terminar por usuario.
+"""
+
+import logging
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import proceso_pdf
+from .models import ReporteAsistencia, TrabajoPdfReporte
+from .pdf import firma_reporte, generar_artefacto, invalidar_artefactos
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo 'procesando' más viejo que esto se considera abandonado
+# (worker reiniciado o caído) y se vuelve a encolar
+MINUTOS_TRABAJO_COLGADO = 15
+MAX_INTENTOS = 3
+
+ESTADOS_EN_CURSO = ('pendiente', 'procesando')
+
+
+class ColaLlena(Exception):
+    """El usuario ya tiene el máximo de PDFs en cola o generándose."""
+
+
+def _configuracion(nombre, defecto):
+    return getattr(settings, nombre, defecto)
+
+
+# ==========================================================
+# 1. ENCOLADO (LADO DE LA VISTA)
+# ==========================================================
+
+def encolar_pdf(reporte, usuario=None, firma=None):
+    """
+    Trabajo que genera el PDF vigente del reporte. Si ya hay uno en curso para
+    la misma firma se reutiliza (varios clics o usuarios sobre el mismo reporte
+    generan un único PDF). Lanza ColaLlena si el usuario superó su límite.
+    """
+    firma = firma or firma_reporte(reporte)
+    en_curso = (
+        TrabajoPdfReporte.objects.filter(reporte=reporte, firma=firma, estado__in=ESTADOS_EN_CURSO)
+        .order_by('fecha_creacion').first()
+    )
+    if en_curso is not None:
+        return en_curso
+
+    if usuario is not None and cupo_usuario(usuario) <= 0:
+        limite = _configuracion('REPORTES_PDF_MAX_EN_COLA_USUARIO', 5)
+        raise ColaLlena(f'Ya tiene {limite} PDFs en preparación. Espere a que terminen.')
+
+    return TrabajoPdfReporte.objects.create(reporte=reporte, usuario=usuario, firma=firma)
+
+
+def cupo_usuario(usuario):
+    """Cuántos trabajos más puede encolar el usuario (REPORTES_PDF_MAX_EN_COLA_USUARIO)."""
+    limite = _configuracion('REPORTES_PDF_MAX_EN_COLA_USUARIO', 5)
+    return limite - TrabajoPdfReporte.objects.filter(usuario=usuario, estado__in=ESTADOS_EN_CURSO).count()
+
+
+def reporte_modificado(reporte_id):
+    """Llamado al confirmar cambios del reporte o de sus adjuntos (clientes/signals.py)."""
+    invalidar_artefactos(reporte_id)
+    if not _configuracion('REPORTES_PDF_REGENERAR', False):
+        return
+    reporte = (
+        ReporteAsistencia.objects.select_related('empresa', 'usuario')
+        .prefetch_related('archivos').filter(pk=reporte_id).first()
+    )
+    if reporte is not None:
+        encolar_pdf(reporte)
+
+
+def trabajo_a_dict(trabajo):
+    return {
+        'trabajo_id': trabajo.id,
+        'reporte_id': trabajo.reporte_id,
+        'estado': trabajo.estado,
+        'estado_display': trabajo.get_estado_display(),
+        'terminado': trabajo.terminado,
+        'progreso': trabajo.progreso,
+        'etapa': trabajo.etapa,
+        'mensaje': trabajo.mensaje,
+    }
+
+
+# ==========================================================
+# 2. RENDER (EN LOS PROCESOS DEL POOL)
+# ==========================================================
+
+def _informar_progreso(trabajo_id, estado, porcentaje, etapa):
+    # Un UPDATE por etapa como máximo: las consultas del navegador leen esta fila
+    if porcentaje - estado['porcentaje'] < 5 and etapa == estado['etapa']:
+        return
+    estado.update(porcentaje=porcentaje, etapa=etapa)
+    TrabajoPdfReporte.objects.filter(id=trabajo_id).update(progreso=porcentaje, etapa=etapa[:100])
+
+
+def renderizar_trabajo(trabajo_id):
+    """
+    Genera el PDF de un trabajo ya tomado ('procesando') y guarda el resultado.
+    Corre en un proceso del pool. Retorna (estado, mensaje).
+    """
+    trabajo = TrabajoPdfReporte.objects.get(id=trabajo_id)
+    try:
+        reporte = (
+            ReporteAsistencia.objects.select_related('empresa', 'usuario')
+            .prefetch_related('archivos').get(pk=trabajo.reporte_id)
+        )
+        # Si el reporte cambió desde que se encoló, se genera la versión actual
+        firma = firma_reporte(reporte)
+        progreso = partial(_informar_progreso, trabajo_id, {'porcentaje': 0, 'etapa': ''})
+        generar_artefacto(reporte, firma, progreso=progreso)
+    except Exception as e:
+        logger.exception('Error generando el PDF del trabajo %s', trabajo_id)
+        campos = {'estado': 'error', 'mensaje': f'Error: {str(e)[:200]}'}
+    else:
+        campos = {'estado': 'listo', 'firma': firma, 'progreso': 100, 'etapa': 'PDF listo', 'mensaje': ''}
+
+    TrabajoPdfReporte.objects.filter(id=trabajo_id).update(fecha_fin=timezone.now(), **campos)
+    return campos['estado'], campos['mensaje']
+
+
+# ==========================================================
+# 3. WORKER
+# ==========================================================
+
+def tomar_siguiente_trabajo():
+    """
+    Reserva el trabajo pendiente más antiguo. El UPDATE condicionado a
+    estado='pendiente' garantiza que dos workers nunca tomen el mismo trabajo.
+    """
+    while True:
+        trabajo_id = (
+            TrabajoPdfReporte.objects.filter(estado='pendiente')
+            .order_by('fecha_creacion', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if trabajo_id is None:
+            return None
+
+        tomado = TrabajoPdfReporte.objects.filter(id=trabajo_id, estado='pendiente').update(
+            estado='procesando',
+            fecha_inicio=timezone.now(),
+            intentos=F('intentos') + 1,
+            progreso=0,
+            etapa='',
+        )
+        if tomado:
+            return TrabajoPdfReporte.objects.get(id=trabajo_id)
+
+
+def liberar_trabajos_colgados(minutos=MINUTOS_TRABAJO_COLGADO):
+    """Reencola los trabajos abandonados; los que agotaron MAX_INTENTOS quedan en error."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    colgados = TrabajoPdfReporte.objects.filter(estado='procesando', fecha_inicio__lt=limite)
+    return _devolver_a_la_cola(colgados, 'La generación del PDF se interrumpió demasiadas veces.')
+
+
+def _devolver_a_la_cola(trabajos, mensaje):
+    agotados = trabajos.filter(intentos__gte=MAX_INTENTOS).update(
+        estado='error', mensaje=mensaje, fecha_fin=timezone.now(),
+    )
+    reencolados = trabajos.filter(intentos__lt=MAX_INTENTOS).update(estado='pendiente', progreso=0, etapa='')
+    return reencolados, agotados
+
+
+def _crear_pool(procesos):
+    return ProcessPoolExecutor(
+        max_workers=procesos,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=proceso_pdf.inicializar,
+        initargs=(_configuracion('REPORTES_PDF_NICE', 10),),
+    )
+
+
+def ejecutar_worker(procesos=None, intervalo=2.0, una_vez=False, max_trabajos=None, salida=None):
+    """
+    Bucle del worker: mantiene hasta `procesos` PDFs generándose a la vez y
+    duerme `intervalo` segundos cuando la cola está vacía. Con una_vez=True
+    vacía la cola y sale. Retorna la cantidad de trabajos terminados.
+    """
+    procesos = max(1, procesos or _configuracion('REPORTES_PDF_PROCESOS', 2))
+    procesados = 0
+    liberar_trabajos_colgados()
+
+    pool = _crear_pool(procesos)
+    en_curso = {}
+    try:
+        while True:
+            while len(en_curso) < procesos and (max_trabajos is None or procesados + len(en_curso) < max_trabajos):
+                trabajo = tomar_siguiente_trabajo()
+                if trabajo is None:
+                    break
+                en_curso[pool.submit(renderizar_trabajo, trabajo.id)] = trabajo
+
+            if not en_curso:
+                if una_vez or (max_trabajos is not None and procesados >= max_trabajos):
+                    break
+                time.sleep(intervalo)
+                liberar_trabajos_colgados()
+                continue
+
+            terminados, _ = wait(en_curso, timeout=intervalo, return_when=FIRST_COMPLETED)
+            pool_roto = False
+            for futuro in terminados:
+                trabajo = en_curso.pop(futuro)
+                try:
+                    estado, mensaje = futuro.result()
+                except BrokenProcessPool:
+                    # Un proceso murió (p. ej. sin memoria): se reintenta en un pool nuevo
+                    _devolver_a_la_cola(
+                        TrabajoPdfReporte.objects.filter(id=trabajo.id, estado='procesando'),
+                        'El proceso de render terminó inesperadamente.',
+                    )
+                    estado, mensaje = 'reencolado', ''
+                    pool_roto = True
+                except Exception as e:
+                    logger.exception('Error en el trabajo de PDF %s', trabajo.id)
+                    TrabajoPdfReporte.objects.filter(id=trabajo.id).update(
+                        estado='error', mensaje=f'Error: {str(e)[:200]}', fecha_fin=timezone.now(),
+                    )
+                    estado, mensaje = 'error', str(e)
+                else:
+                    procesados += 1
+                if salida:
+                    salida(f'PDF del reporte {trabajo.reporte_id} (trabajo {trabajo.id}): {estado} {mensaje}'.rstrip())
+
+            if pool_roto:
+                pool.shutdown(wait=False, cancel_futures=True)
+                pool = _crear_pool(procesos)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    return procesados
@@ -0,0 +1,175 @@
+# clientes/exportacion.py - EXPORTACIÓN MASIVA DE REPORTES (ZIP EN STREAMING)
+
+"""
+Todos los reportes de una empresa en un período, en un ZIP con un PDF por
+reporte (antes había que descargar reporte_pdf uno por uno).
+
+- Los reportes con el PDF vigente en el almacén de artefactos (clientes/pdf.py)
+  entran al ZIP enseguida.
+- Los que faltan se encolan en TrabajoPdfReporte y los genera el worker de
+  siempre (manage.py procesar_pdfs_reportes): la exportación no arranca
+  procesos propios, así que vale el mismo tope global de REPORTES_PDF_PROCESOS
+  y el límite por usuario REPORTES_PDF_MAX_EN_COLA_USUARIO (se encolan de a
+  poco, a medida que terminan los anteriores). El request solo espera
+  consultando la cola; no usa CPU del worker web.
+- El ZIP se escribe y se envía a medida que cada PDF termina: nunca se arma el
+  archivo completo en memoria ni en disco. Sin posibilidad de seek, zipfile
+  escribe el tamaño y el CRC de cada entrada después de sus datos.
+- La espera total de la cola tiene un tope (REPORTES_EXPORTACION_ESPERA
+  segundos), muy por debajo del timeout de los workers web (gunicorn corta
+  el request entero aunque se esté enviando). Los PDFs que no llegan a
+  terminar siguen en la cola: volver a exportar los encuentra generados.
+- Los reportes que no se pudieron generar o no llegaron a tiempo se listan en
+  ERRORES.txt dentro del ZIP.
+"""
+
+import logging
+import time
+import zipfile
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cola_pdf import ColaLlena, encolar_pdf
+from .models import ReporteAsistencia, TrabajoPdfReporte
+from .pdf import abrir_artefacto, firma_reporte
+
+logger = logging.getLogger(__name__)
+
+TAMANO_BLOQUE_ZIP = 256 * 1024
+
+# Cada cuánto se consulta la cola mientras se esperan los PDFs faltantes
+SEGUNDOS_ENTRE_CONSULTAS = 1.0
+
+
+class ExportacionDemasiadoGrande(Exception):
+    """El período seleccionado supera REPORTES_EXPORTACION_MAX reportes."""
+
+
+def reportes_para_exportar(empresa, desde, hasta):
+    return (
+        ReporteAsistencia.objects.filter(empresa=empresa, fecha_asistencia__range=(desde, hasta))
+        .select_related('empresa', 'usuario').prefetch_related('archivos')
+        .order_by('fecha_asistencia', 'numero_reporte')
+    )
+
+
+def validar_exportacion(reportes):
+    """Cantidad de reportes del queryset (un COUNT: no se cargan antes de validar)."""
+    maximo = getattr(settings, 'REPORTES_EXPORTACION_MAX', 500)
+    cantidad = reportes.count()
+    if cantidad > maximo:
+        raise ExportacionDemasiadoGrande(
+            f'El período tiene {cantidad} reportes y el máximo por exportación es {maximo}. '
+            'Elija un rango de fechas más corto.'
+        )
+    return cantidad
+
+
+# ==========================================================
+# 1. PDFs: ALMACÉN DE ARTEFACTOS Y COLA DEL WORKER
+# ==========================================================
+
+def pdfs_a_medida_que_terminan(reportes, usuario, errores):
+    """
+    Genera (reporte, archivo abierto) en el orden en que cada PDF está listo:
+    primero los ya generados y después los que produce el worker, durante
+    REPORTES_EXPORTACION_ESPERA segundos como máximo. Los que fallan o no
+    terminan a tiempo se agregan a `errores` como (reporte, mensaje).
+    """
+    limite = time.monotonic() + getattr(settings, 'REPORTES_EXPORTACION_ESPERA', 20)
+    faltantes = []
+    for reporte in reportes:
+        firma = firma_reporte(reporte)
+        archivo = abrir_artefacto(reporte.pk, firma)
+        if archivo is None:
+            faltantes.append((reporte, firma))
+        else:
+            yield reporte, archivo
+
+    en_curso = {}  # trabajo_id -> reporte
+    while faltantes or en_curso:
+        # Se encola mientras el usuario tenga cupo; el resto espera su turno
+        while faltantes:
+            reporte, firma = faltantes[0]
+            try:
+                trabajo = encolar_pdf(reporte, usuario, firma)
+            except ColaLlena:
+                break
+            faltantes.pop(0)
+            en_curso[trabajo.id] = reporte
+
+        terminados = TrabajoPdfReporte.objects.filter(
+            id__in=list(en_curso), estado__in=('listo', 'error'),
+        ).values_list('id', 'estado', 'firma', 'mensaje')
+        for trabajo_id, estado, firma, mensaje in terminados:
+            reporte = en_curso.pop(trabajo_id)
+            archivo = abrir_artefacto(reporte.pk, firma) if estado == 'listo' else None
+            if archivo is not None:
+                yield reporte, archivo
+            elif estado == 'listo':
+                # Se editó el reporte mientras se exportaba y su PDF ya se invalidó
+                errores.append((reporte, 'El reporte se modificó durante la exportación.'))
+            else:
+                errores.append((reporte, mensaje or 'No se pudo generar el PDF.'))
+
+        if not (en_curso or faltantes):
+            return
+        if time.monotonic() + SEGUNDOS_ENTRE_CONSULTAS > limite:
+            # Los encolados se siguen generando: la próxima exportación los encuentra listos
+            errores.extend((reporte, 'El PDF todavía se está generando. Vuelva a exportar en unos minutos.')
+                           for reporte in en_curso.values())
+            errores.extend((reporte, 'El PDF no llegó a encolarse. Vuelva a exportar en unos minutos.')
+                           for reporte, _ in faltantes)
+            return
+        time.sleep(SEGUNDOS_ENTRE_CONSULTAS)
+
+
+# ==========================================================
+# 2. ZIP EN STREAMING
+# ==========================================================
+
+class _SalidaZip:
+    """Destino sin seek de zipfile: acumula lo escrito hasta que el generador lo envía."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def zip_reportes(reportes, usuario=None):
+    """
+    Bytes del ZIP (para StreamingHttpResponse), enviados a medida que cada
+    PDF termina. Los PDFs ya vienen comprimidos: las entradas van sin comprimir.
+    """
+    salida = _SalidaZip()
+    errores = []
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_STORED) as archivo_zip:
+        for reporte, pdf in pdfs_a_medida_que_terminan(reportes, usuario, errores):
+            with pdf:
+                info = zipfile.ZipInfo(
+                    f'{reporte.numero_reporte}.pdf',
+                    date_time=timezone.localtime(reporte.fecha_actualizacion).timetuple()[:6],
+                )
+                with archivo_zip.open(info, 'w', force_zip64=True) as entrada:
+                    while bloque := pdf.read(TAMANO_BLOQUE_ZIP):
+                        entrada.write(bloque)
+                        yield salida.vaciar()
+            yield salida.vaciar()
+
+        if errores:
+            archivo_zip.writestr('ERRORES.txt', '\n'.join(
+                f'{reporte.numero_reporte}: {mensaje}' for reporte, mensaje in errores
+            ) + '\n')
+    yield salida.vaciar()
@@ -96,4 +96,21 @@ ArchivoReporteFormSet = forms.inlineformset_factory(
     form=ArchivoReporteForm,
     extra=1,
     can_delete=True
-)
\ No newline at end of file
+)
+
+class ExportarReportesForm(forms.Form):
+    """Filtro de la exportación masiva a ZIP (clientes/exportacion.py)."""
+    empresa = forms.ModelChoiceField(
+        queryset=Empresa.objects.order_by('nombre'),
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        empty_label='Seleccione una empresa',
+    )
+    desde = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+    hasta = forms.DateField(widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}))
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('desde'), cleaned_data.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha "desde" no puede ser posterior a "hasta".')
+        return cleaned_data
@@ -0,0 +1,132 @@
+# clientes/imagenes.py - DERIVADOS DE LAS FOTOS ADJUNTAS A LOS REPORTES
+
+"""
+Las fotos de ArchivoReporte llegan del celular a resolución completa (4000px y
+varios MB). Servirlas así en detalle_reporte y embeberlas en el PDF inflaba el
+peso de la página, el tamaño del PDF y el tiempo de xhtml2pdf.
+
+Al subir una foto se generan con Pillow tres derivados JPEG, guardados junto
+al original (reportes/<numero>/<nombre con extensión>__<variante>.jpg):
+- miniatura: tarjetas de detalle_reporte y previsualización del admin.
+- media: vista en pantalla completa (srcset de las tarjetas).
+- pdf: la que embebe reporte_pdf.html.
+
+El original no se toca (sigue disponible para "Ver" y descargar). Si un
+derivado falta (foto subida antes de este cambio o que Pillow no pudo leer)
+se usa el original; manage.py generar_derivados_imagenes completa los que falten
+y borra los que quedaron con el nombre anterior (sin la extensión del original).
+"""
+
+import io
+import logging
+import math
+import os
+
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# variante -> (lado máximo en px, calidad JPEG)
+VARIANTES = {
+    'miniatura': (480, 70),
+    'media': (1600, 82),
+    # Media hoja A4 a ~200 dpi: la celda de foto del PDF ocupa unos 9 cm
+    'pdf': (1200, 75),
+}
+
+
+def nombre_derivado(nombre_original, variante):
+    # Con la extensión: foto.jpg y foto.png del mismo reporte no comparten derivados
+    return f'{nombre_original}__{variante}.jpg'
+
+
+def nombre_derivado_anterior(nombre_original, variante):
+    """Nombre que usaban los derivados antes de incluir la extensión del original."""
+    raiz, _ = os.path.splitext(nombre_original)
+    return f'{raiz}__{variante}.jpg'
+
+
+def _codificar(imagen, calidad):
+    salida = io.BytesIO()
+    imagen.save(salida, 'JPEG', quality=calidad, optimize=True, progressive=True)
+    return salida.getvalue()
+
+
+def _abrir_rgb(archivo):
+    imagen = Image.open(archivo)
+    # En JPEG, draft() decodifica directamente a 1/2, 1/4 u 1/8 de la escala
+    # (mucho más rápido que decodificar 12 MP y reducir después). Pide el
+    # tamaño del derivado más grande con la proporción de la foto: draft no
+    # baja de ese tamaño en ninguno de los dos lados
+    ancho, alto = imagen.size
+    escala = max(lado for lado, _ in VARIANTES.values()) / max(ancho, alto)
+    if escala < 1:
+        imagen.draft('RGB', (math.ceil(ancho * escala), math.ceil(alto * escala)))
+    # Las fotos de celular vienen giradas por EXIF: xhtml2pdf no lo respeta
+    imagen = ImageOps.exif_transpose(imagen)
+    if imagen.mode in ('RGBA', 'LA', 'P'):
+        imagen = imagen.convert('RGBA')
+        fondo = Image.new('RGB', imagen.size, 'white')
+        fondo.paste(imagen, mask=imagen.getchannel('A'))
+        return fondo
+    return imagen.convert('RGB')
+
+
+def generar_derivados(adjunto, forzar=False):
+    """
+    Genera los derivados que falten de la foto `adjunto` (ArchivoReporte).
+    Retorna la cantidad generada; 0 si no es una foto o no se pudo leer.
+    """
+    if adjunto.tipo != 'foto' or not adjunto.archivo:
+        return 0
+    storage = adjunto.archivo.storage
+    nombres = {v: nombre_derivado(adjunto.archivo.name, v) for v in VARIANTES}
+    faltantes = [v for v, nombre in nombres.items() if forzar or not storage.exists(nombre)]
+    if not faltantes:
+        return 0
+
+    try:
+        with storage.open(adjunto.archivo.name, 'rb') as original:
+            imagen = _abrir_rgb(original)
+    except (OSError, Image.DecompressionBombError) as e:
+        logger.warning('No se pudieron generar los derivados de %s: %s', adjunto.archivo.name, e)
+        return 0
+
+    # De la más grande a la más chica: cada variante se reduce desde la anterior
+    for variante in sorted(faltantes, key=lambda v: -VARIANTES[v][0]):
+        lado, calidad = VARIANTES[variante]
+        imagen.thumbnail((lado, lado), Image.LANCZOS)
+        if storage.exists(nombres[variante]):
+            storage.delete(nombres[variante])
+        storage.save(nombres[variante], ContentFile(_codificar(imagen, calidad)))
+    return len(faltantes)
+
+
+def borrar_derivados(storage, nombre_original):
+    """Borra los derivados de la foto, también los que quedaron con el nombre anterior."""
+    nombres = [nombre_derivado(nombre_original, variante) for variante in VARIANTES]
+    nombres += [nombre_derivado_anterior(nombre_original, variante) for variante in VARIANTES]
+    for nombre in nombres:
+        if storage.exists(nombre):
+            storage.delete(nombre)
+
+
+def borrar_derivados_anteriores(adjunto):
+    """Borra los derivados con el nombre anterior. Retorna cuántos había."""
+    storage = adjunto.archivo.storage
+    borrados = 0
+    for variante in VARIANTES:
+        nombre = nombre_derivado_anterior(adjunto.archivo.name, variante)
+        if storage.exists(nombre):
+            storage.delete(nombre)
+            borrados += 1
+    return borrados
+
+
+def derivado(adjunto, variante):
+    """Nombre en el storage del derivado, o el del original si todavía no existe."""
+    nombre = nombre_derivado(adjunto.archivo.name, variante)
+    if adjunto.tipo == 'foto' and adjunto.archivo.storage.exists(nombre):
+        return nombre
+    return adjunto.archivo.name
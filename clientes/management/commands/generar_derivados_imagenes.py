@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+
+from clientes.imagenes import borrar_derivados_anteriores, generar_derivados
+from clientes.models import ArchivoReporte
+from clientes.pdf import invalidar_artefactos
+
+
+class Command(BaseCommand):
+    help = ('Genera la miniatura, el tamaño medio y la versión para PDF de las fotos adjuntas '
+            'a los reportes que no los tengan (fotos subidas antes de que existieran) y borra '
+            'los derivados con el nombre anterior, sin la extensión del original.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true',
+                            help='Vuelve a generar también los derivados existentes.')
+
+    def handle(self, *args, **options):
+        fotos = ArchivoReporte.objects.filter(tipo='foto').only('id', 'reporte_id', 'archivo', 'tipo')
+        procesadas = 0
+        anteriores = 0
+        reportes = set()
+        for adjunto in fotos.iterator(chunk_size=200):
+            if generar_derivados(adjunto, forzar=options['forzar']):
+                procesadas += 1
+                reportes.add(adjunto.reporte_id)
+            # Después de generar los nuevos: foto.jpg y foto.png compartían estos nombres
+            anteriores += borrar_derivados_anteriores(adjunto)
+
+        # Los PDFs ya generados embeben el original: se regeneran con la versión reducida
+        for reporte_id in reportes:
+            invalidar_artefactos(reporte_id)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Derivados generados para {procesadas} fotos de {len(reportes)} reportes; '
+            f'{anteriores} derivados con el nombre anterior borrados.'
+        ))
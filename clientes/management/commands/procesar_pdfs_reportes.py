@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from clientes.cola_pdf import ejecutar_worker
+
+
+class Command(BaseCommand):
+    help = ('Worker de PDFs de reportes: genera en un pool de procesos los PDFs de la cola '
+            'TrabajoPdfReporte (dejar corriendo junto al servidor).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=None,
+                            help='PDFs generándose a la vez (default: REPORTES_PDF_PROCESOS).')
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía (default: 2).')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los trabajos pendientes y termina.')
+        parser.add_argument('--max-trabajos', type=int, default=None,
+                            help='Termina después de procesar esta cantidad de trabajos.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Worker de PDFs de reportes iniciado. Ctrl+C para detener.')
+        try:
+            procesados = ejecutar_worker(
+                procesos=options['procesos'],
+                intervalo=options['intervalo'],
+                una_vez=options['una_vez'],
+                max_trabajos=options['max_trabajos'],
+                salida=self.stdout.write,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Trabajos procesados: {procesados}'))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('clientes', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoPdfReporte',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('firma', models.CharField(max_length=32, verbose_name='Firma del reporte')),
+                ('estado', models.CharField(choices=[('pendiente', 'En cola'), ('procesando', 'Generando'), ('listo', 'Listo'), ('error', 'Error')], default='pendiente', max_length=20)),
+                ('progreso', models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')),
+                ('etapa', models.CharField(blank=True, default='', max_length=100)),
+                ('mensaje', models.TextField(blank=True, default='', verbose_name='Mensaje / Error')),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True)),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True)),
+                ('reporte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trabajos_pdf', to='clientes.reporteasistencia')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos_pdf_reporte', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Trabajo de PDF de Reporte',
+                'verbose_name_plural': 'Trabajos de PDF de Reportes',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='clientes_tr_estado_9c518c_idx')],
+            },
+        ),
+    ]
@@ -6,6 +6,8 @@ import os
 from django.db.models.signals import post_delete
 from django.dispatch import receiver
 
+from .imagenes import derivado
+
 
 def reporte_file_path(instance, filename):
     """Genera la ruta para archivos adjuntos del reporte"""
@@ -79,6 +81,11 @@ class ReporteAsistencia(models.Model):
             
             super().save(*args, **kwargs)
 
+    @property
+    def fotos(self):
+        """Adjuntos de tipo foto (usa los archivos precargados si los hay)."""
+        return [adjunto for adjunto in self.archivos.all() if adjunto.tipo == 'foto']
+
 class ArchivoReporte(models.Model):
     TIPO_CHOICES = [
         ('foto', 'Fotografía'),
@@ -108,9 +115,65 @@ class ArchivoReporte(models.Model):
             ext = os.path.splitext(self.archivo.name)[1].lower()
             self.tipo = 'pdf' if ext == '.pdf' else 'foto'
         super().save(*args, **kwargs)
+
+    # Derivados reducidos de las fotos (clientes/imagenes.py); el original si faltan
+    @property
+    def url_miniatura(self):
+        return self.archivo.storage.url(derivado(self, 'miniatura'))
+
+    @property
+    def url_media(self):
+        return self.archivo.storage.url(derivado(self, 'media'))
+
+    @property
+    def ruta_pdf(self):
+        return self.archivo.storage.path(derivado(self, 'pdf'))
     
     def auto_delete_file_on_delete(sender, instance, **kwargs):
         """Borra el archivo físico cuando se elimina el registro de la BD"""
         if instance.archivo:
             if os.path.isfile(instance.archivo.path):
-                os.remove(instance.archivo.path)
\ No newline at end of file
+                os.remove(instance.archivo.path)
+
+class TrabajoPdfReporte(models.Model):
+    """
+    Generación del PDF completo de un reporte, procesada por el worker
+    (manage.py procesar_pdfs_reportes). El PDF queda en el almacén de
+    artefactos de clientes/pdf.py con el nombre de la firma del reporte.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'En cola'),
+        ('procesando', 'Generando'),
+        ('listo', 'Listo'),
+        ('error', 'Error'),
+    ]
+
+    reporte = models.ForeignKey(ReporteAsistencia, on_delete=models.CASCADE, related_name='trabajos_pdf')
+    # Nulo en las regeneraciones automáticas (REPORTES_PDF_REGENERAR)
+    usuario = models.ForeignKey(
+        User, on_delete=models.SET_NULL, null=True, blank=True, related_name='trabajos_pdf_reporte'
+    )
+    firma = models.CharField(max_length=32, verbose_name='Firma del reporte')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='pendiente')
+    progreso = models.PositiveSmallIntegerField(default=0, verbose_name='Progreso (%)')
+    etapa = models.CharField(max_length=100, blank=True, default='')
+    mensaje = models.TextField(blank=True, default='', verbose_name='Mensaje / Error')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_inicio = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Trabajo de PDF de Reporte'
+        verbose_name_plural = 'Trabajos de PDF de Reportes'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"PDF {self.reporte_id} ({self.estado})"
+
+    @property
+    def terminado(self):
+        return self.estado in ('listo', 'error')
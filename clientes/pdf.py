@@ -0,0 +1,209 @@
+# clientes/pdf.py - PDF DE REPORTES DE ASISTENCIA (RENDER Y ARTEFACTOS EN DISCO)
+
+"""
+El PDF completo de un reporte (la plantilla reporte_pdf.html renderizada con
+xhtml2pdf y los adjuntos PDF unidos al final) se guarda en disco y se sirve
+con FileResponse mientras el reporte no cambie; ya no se vuelve a generar en
+cada descarga.
+
+El nombre del artefacto es una firma de fecha_actualizacion del reporte, de
+los datos de empresa y técnico que muestra y del conjunto de adjuntos (id,
+archivo y descripción). Si cambia cualquiera de ellos cambia la firma, así que
+nunca se sirve un PDF viejo aunque la invalidación no llegue a correr. Las
+señales (clientes/signals.py) borran los artefactos del reporte al editarlo o
+tocar sus adjuntos y, con REPORTES_PDF_REGENERAR, encolan su regeneración
+(clientes/cola_pdf.py) para que la próxima descarga ya lo encuentre.
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+
+from django.conf import settings
+from django.template.loader import get_template
+from xhtml2pdf import pisa
+
+from .union_pdf import EscritorPdf
+
+logger = logging.getLogger(__name__)
+
+# El PDF base (sin adjuntos) se arma en memoria hasta este tamaño y después en
+# disco; los adjuntos se unen en streaming (clientes/union_pdf.py)
+MAX_BASE_EN_MEMORIA = 8 * 1024 * 1024
+
+
+class ErrorRenderPdf(Exception):
+    """xhtml2pdf no pudo generar el PDF base del reporte."""
+
+
+def directorio_artefactos():
+    """Fuera de MEDIA_ROOT por defecto: los PDFs no quedan publicados en /media/."""
+    return getattr(settings, 'REPORTES_PDF_DIR', os.path.join(settings.BASE_DIR, 'artefactos', 'reportes_pdf'))
+
+
+# ==========================================================
+# 1. RENDER DEL PDF COMPLETO
+# ==========================================================
+
+def link_callback(uri, rel):
+    """
+    Convierte URIs de Media y Static en rutas de sistema de archivos absolutas
+    para que xhtml2pdf pueda encontrar las imágenes.
+    """
+    sUrl = settings.STATIC_URL
+    sRoot = settings.STATIC_ROOT
+    mUrl = settings.MEDIA_URL
+    mRoot = settings.MEDIA_ROOT
+
+    if uri.startswith(mUrl):
+        path = os.path.join(mRoot, uri.replace(mUrl, ""))
+    elif uri.startswith(sUrl):
+        path = os.path.join(sRoot, uri.replace(sUrl, ""))
+    else:
+        return uri
+
+    # Asegurarse de que el archivo existe
+    if not os.path.isfile(path):
+        return uri
+    return path
+
+
+def _sin_progreso(porcentaje, etapa):
+    pass
+
+
+def renderizar_pdf(reporte, destino, progreso=_sin_progreso):
+    """
+    Escribe en `destino` (archivo binario) el reporte seguido de sus adjuntos PDF,
+    objeto por objeto: la memoria no crece con el tamaño de los adjuntos.
+    `progreso(porcentaje, etapa)` informa el avance (lo usa la cola de clientes/cola_pdf.py).
+    """
+    progreso(5, 'Renderizando el reporte')
+    html = get_template('clientes/reporte_pdf.html').render({'reporte': reporte})
+
+    with tempfile.SpooledTemporaryFile(max_size=MAX_BASE_EN_MEMORIA) as reporte_base:
+        pisa_status = pisa.CreatePDF(html, dest=reporte_base, link_callback=link_callback)
+        if pisa_status.err:
+            raise ErrorRenderPdf(f'Error al generar el PDF base de {reporte.numero_reporte}')
+
+        progreso(50, 'Reporte generado')
+        escritor = EscritorPdf(destino)
+        reporte_base.seek(0)
+        escritor.agregar(reporte_base)
+
+    adjuntos = [a for a in reporte.archivos.all() if a.archivo.name.lower().endswith('.pdf')]
+    for numero, adjunto in enumerate(adjuntos, start=1):
+        progreso(50 + 40 * (numero - 1) // len(adjuntos), f'Uniendo adjuntos ({numero}/{len(adjuntos)})')
+        try:
+            escritor.agregar(adjunto.archivo.path)
+        except Exception as e:
+            logger.warning('No se pudo adjuntar el PDF %s: %s', adjunto.archivo.name, e)
+
+    progreso(90, 'Guardando el PDF')
+    escritor.cerrar()
+
+
+# ==========================================================
+# 2. ALMACÉN DE ARTEFACTOS
+# ==========================================================
+
+def firma_reporte(reporte):
+    """Hash de todo lo que cambia el contenido del PDF (usa los adjuntos precargados si los hay)."""
+    partes = [
+        reporte.fecha_actualizacion.isoformat(),
+        reporte.empresa.nombre,
+        reporte.usuario.get_full_name() or reporte.usuario.username,
+    ]
+    for adjunto in sorted(reporte.archivos.all(), key=lambda a: a.pk):
+        partes.append(f'{adjunto.pk}:{adjunto.archivo.name}:{adjunto.descripcion or ""}')
+    return hashlib.sha256('\n'.join(partes).encode()).hexdigest()[:32]
+
+
+def ruta_artefacto(reporte_id, firma):
+    return os.path.join(directorio_artefactos(), str(reporte_id), f'{firma}.pdf')
+
+
+def generar_artefacto(reporte, firma=None, progreso=_sin_progreso):
+    """
+    Renderiza el PDF a un temporal en el mismo directorio y lo publica con un
+    rename atómico (nunca se sirve un archivo a medio escribir). Borra los
+    artefactos anteriores del reporte. Retorna la ruta.
+    """
+    firma = firma or firma_reporte(reporte)
+    ruta = ruta_artefacto(reporte.pk, firma)
+    directorio = os.path.dirname(ruta)
+    os.makedirs(directorio, exist_ok=True)
+
+    descriptor, temporal = tempfile.mkstemp(dir=directorio, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'wb') as destino:
+            renderizar_pdf(reporte, destino, progreso)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+    _borrar_artefactos(directorio, conservar=os.path.basename(ruta))
+    return ruta
+
+
+def _borrar_artefactos(directorio, conservar=None):
+    """
+    Borra los PDFs de `directorio` salvo `conservar`. En Windows no se puede
+    borrar un PDF que un FileResponse todavía está enviando (PermissionError):
+    queda para la próxima limpieza (otra generación o invalidación), su firma
+    ya no es la vigente así que no se vuelve a servir. Retorna cuántos quedaron.
+    """
+    try:
+        nombres = os.listdir(directorio)
+    except FileNotFoundError:
+        return 0
+
+    quedan = 0
+    for nombre in nombres:
+        if not nombre.endswith('.pdf') or nombre == conservar:
+            continue
+        try:
+            os.remove(os.path.join(directorio, nombre))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            quedan += 1
+            logger.info('No se pudo borrar el artefacto %s, queda para la próxima limpieza: %s', nombre, e)
+    return quedan
+
+
+def abrir_artefacto(reporte_id, firma):
+    """
+    El PDF ya generado con esa firma, abierto ('rb'), o None. Se abre en vez de
+    devolver la ruta para que una invalidación concurrente no lo borre entre el
+    chequeo y la lectura.
+    """
+    try:
+        return open(ruta_artefacto(reporte_id, firma), 'rb')
+    except FileNotFoundError:
+        return None
+
+
+def abrir_pdf(reporte):
+    """PDF vigente del reporte, generándolo en el acto si no existe. Retorna (archivo, desde_cache)."""
+    firma = firma_reporte(reporte)
+    archivo = abrir_artefacto(reporte.pk, firma)
+    if archivo is not None:
+        return archivo, True
+    return open(generar_artefacto(reporte, firma), 'rb'), False
+
+
+def invalidar_artefactos(reporte_id):
+    """
+    Borra los PDFs del reporte. Los que siguen abiertos quedan para la próxima
+    limpieza, y el directorio también si tiene un render en curso (.tmp).
+    """
+    directorio = os.path.join(directorio_artefactos(), str(reporte_id))
+    if _borrar_artefactos(directorio):
+        return
+    try:
+        os.rmdir(directorio)
+    except OSError:
+        pass
@@ -0,0 +1,18 @@
+# ============================================================
+# clientes/proceso_pdf.py - ARRANQUE DE LOS PROCESOS DE RENDER DE PDFs
+# ============================================================
+#
+# Los procesos del pool arrancan de cero (spawn, también en Linux: así no
+# heredan la conexión a la base del worker) e importan el inicializador antes
+# de ejecutarlo. Por eso vive en este módulo, que no importa modelos.
+
+import os
+
+
+def inicializar(nice=0):
+    """Carga Django en el proceso hijo y le baja la prioridad de CPU."""
+    if nice and hasattr(os, 'nice'):
+        os.nice(nice)
+
+    import django
+    django.setup()
@@ -0,0 +1,55 @@
+# clientes/signals.py - SEÑALES DEL MÓDULO CLIENTES
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import ArchivoReporte, ReporteAsistencia
+from .cola_pdf import reporte_modificado
+from .imagenes import borrar_derivados, generar_derivados
+from .pdf import invalidar_artefactos
+
+
+# ==========================================================
+# DERIVADOS DE LAS FOTOS ADJUNTAS (clientes/imagenes.py)
+# ==========================================================
+@receiver(post_save, sender=ArchivoReporte, dispatch_uid='clientes_derivados_archivo')
+def generar_derivados_archivo(sender, instance, raw=False, **kwargs):
+    """Al subir la foto: antes de que el PDF del reporte se vuelva a generar."""
+    if not raw:
+        generar_derivados(instance)
+
+
+@receiver(post_delete, sender=ArchivoReporte, dispatch_uid='clientes_derivados_archivo_del')
+def borrar_derivados_archivo(sender, instance, **kwargs):
+    if instance.tipo == 'foto' and instance.archivo:
+        storage, nombre = instance.archivo.storage, instance.archivo.name
+        transaction.on_commit(lambda: borrar_derivados(storage, nombre))
+
+
+# ==========================================================
+# ARTEFACTOS PDF DE LOS REPORTES (clientes/pdf.py)
+# ==========================================================
+def _reporte_modificado_al_confirmar(reporte_id):
+    transaction.on_commit(lambda: reporte_modificado(reporte_id))
+
+
+@receiver(post_save, sender=ReporteAsistencia, dispatch_uid='clientes_pdf_reporte')
+def invalidar_pdf_reporte(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _reporte_modificado_al_confirmar(instance.pk)
+
+
+@receiver(post_delete, sender=ReporteAsistencia, dispatch_uid='clientes_pdf_reporte_del')
+def borrar_pdf_reporte(sender, instance, **kwargs):
+    reporte_id = instance.pk
+    transaction.on_commit(lambda: invalidar_artefactos(reporte_id))
+
+
+@receiver(post_save, sender=ArchivoReporte, dispatch_uid='clientes_pdf_archivo')
+@receiver(post_delete, sender=ArchivoReporte, dispatch_uid='clientes_pdf_archivo_del')
+def invalidar_pdf_archivo(sender, instance, raw=False, **kwargs):
+    """Agregar, editar o quitar un adjunto cambia el PDF completo del reporte."""
+    if raw:
+        return
+    _reporte_modificado_al_confirmar(instance.reporte_id)
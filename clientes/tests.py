@@ -1,3 +1,303 @@
-from django.test import TestCase
+import io
+import os
+import tempfile
+import zipfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from pypdf import PdfReader, PdfWriter
+from reportlab.pdfgen import canvas
+
+from . import cola_pdf
+from .exportacion import reportes_para_exportar, zip_reportes
+from .imagenes import derivado, nombre_derivado_anterior
+from .models import ArchivoReporte, Empresa, ReporteAsistencia, TrabajoPdfReporte
+from .pdf import firma_reporte, invalidar_artefactos, ruta_artefacto
+from .union_pdf import EscritorPdf
+
+
+def _pdf_con_texto(*textos):
+    """PDF con una página por texto (fuente y contenido comprimido, como los reportes)."""
+    salida = io.BytesIO()
+    lienzo = canvas.Canvas(salida)
+    for texto in textos:
+        lienzo.drawString(72, 720, texto)
+        lienzo.showPage()
+    lienzo.save()
+    salida.seek(0)
+    return salida
+
+
+def _pdf_en_blanco(paginas, password=None):
+    escritor = PdfWriter()
+    for _ in range(paginas):
+        escritor.add_blank_page(width=300, height=400)
+    if password is not None:
+        escritor.encrypt(user_password=password, owner_password='propietario')
+    salida = io.BytesIO()
+    escritor.write(salida)
+    salida.seek(0)
+    return salida
+
+
+# ==========================================================
+# UNIÓN DE PDFs (clientes/union_pdf.py)
+# ==========================================================
+
+class EscritorPdfTestCase(SimpleTestCase):
+
+    def _unir(self, *origenes):
+        destino = io.BytesIO()
+        escritor = EscritorPdf(destino)
+        for origen in origenes:
+            escritor.agregar(origen)
+        escritor.cerrar()
+        destino.seek(0)
+        return escritor, PdfReader(destino, strict=True)
+
+    def test_une_paginas_en_orden(self):
+        escritor, lector = self._unir(_pdf_con_texto('Reporte 1', 'Reporte 2'), _pdf_en_blanco(3), _pdf_con_texto('Anexo'))
+
+        self.assertEqual(escritor.paginas, 6)
+        self.assertEqual(len(lector.pages), 6)
+        self.assertIn('Reporte 1', lector.pages[0].extract_text())
+        self.assertIn('Reporte 2', lector.pages[1].extract_text())
+        self.assertEqual(float(lector.pages[2].mediabox.width), 300)
+        self.assertIn('Anexo', lector.pages[5].extract_text())
+
+    def test_acepta_rutas(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'adjunto.pdf')
+            with open(ruta, 'wb') as archivo:
+                archivo.write(_pdf_con_texto('Desde disco').getvalue())
+            escritor, lector = self._unir(ruta)
+        self.assertEqual(escritor.paginas, 1)
+        self.assertIn('Desde disco', lector.pages[0].extract_text())
+
+    def test_cifrado_sin_contrasena_de_apertura(self):
+        escritor, lector = self._unir(_pdf_en_blanco(2, password=''))
+        self.assertEqual(len(lector.pages), 2)
+
+    def test_adjunto_danado_no_rompe_la_salida(self):
+        destino = io.BytesIO()
+        escritor = EscritorPdf(destino)
+        escritor.agregar(_pdf_con_texto('Reporte'))
+        with self.assertRaises(Exception):
+            escritor.agregar(io.BytesIO(b'%PDF-1.4\nesto no es un pdf'))
+        escritor.agregar(_pdf_en_blanco(1))
+        escritor.cerrar()
+
+        destino.seek(0)
+        lector = PdfReader(destino, strict=True)
+        self.assertEqual(len(lector.pages), 2)
+        self.assertIn('Reporte', lector.pages[0].extract_text())
+
+
+# ==========================================================
+# COLA DE PDFs DE REPORTES (clientes/cola_pdf.py)
+# ==========================================================
+
+@override_settings(REPORTES_PDF_MAX_EN_COLA_USUARIO=2)
+class ColaPdfTestCase(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('tecnico', password='clave')
+        empresa = Empresa.objects.create(nombre='Cliente')
+        self.reportes = [
+            ReporteAsistencia.objects.create(
+                fecha_asistencia=date(2025, 3, 3), empresa=empresa, maquina='Torno', persona_solicita='Ana',
+                usuario=self.usuario, problema='-', problema_encontrado='-', solucion='-',
+            )
+            for _ in range(3)
+        ]
+
+    def test_encolar_reutiliza_el_trabajo_en_curso(self):
+        trabajo = cola_pdf.encolar_pdf(self.reportes[0], self.usuario, firma='v1')
+
+        self.assertEqual(cola_pdf.encolar_pdf(self.reportes[0], self.usuario, firma='v1').id, trabajo.id)
+        self.assertNotEqual(cola_pdf.encolar_pdf(self.reportes[0], self.usuario, firma='v2').id, trabajo.id)
+        self.assertEqual(cola_pdf.cupo_usuario(self.usuario), 0)
+
+    def test_limite_por_usuario(self):
+        cola_pdf.encolar_pdf(self.reportes[0], self.usuario, firma='v1')
+        listo = cola_pdf.encolar_pdf(self.reportes[1], self.usuario, firma='v1')
+        with self.assertRaises(cola_pdf.ColaLlena):
+            cola_pdf.encolar_pdf(self.reportes[2], self.usuario, firma='v1')
+
+        # Los terminados no ocupan cupo; los encolados por el sistema no tienen límite
+        TrabajoPdfReporte.objects.filter(id=listo.id).update(estado='listo')
+        cola_pdf.encolar_pdf(self.reportes[2], self.usuario, firma='v1')
+        cola_pdf.encolar_pdf(self.reportes[1], firma='v2')
+
+    def test_toma_en_orden_y_una_sola_vez(self):
+        trabajos = [cola_pdf.encolar_pdf(reporte, firma='v1') for reporte in self.reportes]
+        TrabajoPdfReporte.objects.filter(id=trabajos[0].id).update(progreso=40, etapa='Uniendo adjuntos')
+
+        filtrar = TrabajoPdfReporte.objects.filter
+
+        def filtrar_con_carrera(*args, **kwargs):
+            # Otro worker toma el segundo trabajo entre el SELECT y el UPDATE
+            if kwargs == {'id': trabajos[1].id, 'estado': 'pendiente'}:
+                filtrar(id=trabajos[1].id).update(estado='procesando', intentos=1)
+            return filtrar(*args, **kwargs)
+
+        primero = cola_pdf.tomar_siguiente_trabajo()
+        with mock.patch.object(TrabajoPdfReporte.objects, 'filter', side_effect=filtrar_con_carrera):
+            segundo = cola_pdf.tomar_siguiente_trabajo()
+
+        self.assertEqual((primero.id, primero.intentos, primero.progreso, primero.etapa), (trabajos[0].id, 1, 0, ''))
+        self.assertEqual(segundo.id, trabajos[2].id)
+        self.assertIsNone(cola_pdf.tomar_siguiente_trabajo())
+
+    def test_liberar_trabajos_colgados(self):
+        trabajos = [cola_pdf.encolar_pdf(reporte, firma='v1') for reporte in self.reportes]
+        for _ in trabajos:
+            cola_pdf.tomar_siguiente_trabajo()
+        viejo = timezone.now() - timedelta(minutes=cola_pdf.MINUTOS_TRABAJO_COLGADO + 1)
+        colgado, agotado, reciente = trabajos
+        TrabajoPdfReporte.objects.filter(id=colgado.id).update(fecha_inicio=viejo, progreso=60)
+        TrabajoPdfReporte.objects.filter(id=agotado.id).update(fecha_inicio=viejo, intentos=cola_pdf.MAX_INTENTOS)
+
+        self.assertEqual(cola_pdf.liberar_trabajos_colgados(), (1, 1))
+        estados = dict(TrabajoPdfReporte.objects.values_list('id', 'estado'))
+        self.assertEqual(estados, {colgado.id: 'pendiente', agotado.id: 'error', reciente.id: 'procesando'})
+        colgado.refresh_from_db()
+        self.assertEqual(colgado.progreso, 0)
+
+
+# ==========================================================
+# ARTEFACTOS PDF EN DISCO (clientes/pdf.py)
+# ==========================================================
+
+class ArtefactosPdfTestCase(SimpleTestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(REPORTES_PDF_DIR=directorio.name)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+        for firma in ('vieja', 'abierta'):
+            os.makedirs(os.path.dirname(ruta_artefacto(7, firma)), exist_ok=True)
+            with open(ruta_artefacto(7, firma), 'wb') as archivo:
+                archivo.write(b'%PDF-1.7')
+
+    def test_invalidar_borra_el_directorio(self):
+        invalidar_artefactos(7)
+        self.assertFalse(os.path.exists(os.path.dirname(ruta_artefacto(7, 'vieja'))))
+        invalidar_artefactos(7)
+
+    def test_pdf_en_uso_queda_para_la_proxima_limpieza(self):
+        """En Windows, borrar un PDF que un FileResponse todavía envía lanza PermissionError."""
+        borrar = os.remove
+
+        def borrar_salvo_abierto(ruta):
+            if ruta == ruta_artefacto(7, 'abierta'):
+                raise PermissionError(32, 'El archivo está en uso')
+            borrar(ruta)
+
+        with mock.patch('clientes.pdf.os.remove', side_effect=borrar_salvo_abierto):
+            invalidar_artefactos(7)
+        self.assertFalse(os.path.exists(ruta_artefacto(7, 'vieja')))
+        self.assertTrue(os.path.exists(ruta_artefacto(7, 'abierta')))
+
+        invalidar_artefactos(7)
+        self.assertFalse(os.path.exists(os.path.dirname(ruta_artefacto(7, 'abierta'))))
+
+
+# ==========================================================
+# DERIVADOS DE LAS FOTOS (clientes/imagenes.py)
+# ==========================================================
+
+class DerivadosImagenesTestCase(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(MEDIA_ROOT=directorio.name, REPORTES_PDF_DIR=os.path.join(directorio.name, 'pdf'))
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        usuario = User.objects.create_user('tecnico', password='clave')
+        self.reporte = ReporteAsistencia.objects.create(
+            fecha_asistencia=date(2025, 3, 3), empresa=Empresa.objects.create(nombre='Cliente'), maquina='Torno',
+            persona_solicita='Ana', usuario=usuario, problema='-', problema_encontrado='-', solucion='-',
+        )
+
+    def _foto(self, nombre, color, formato):
+        salida = io.BytesIO()
+        Image.new('RGB', (2000, 1500), color).save(salida, formato)
+        return ArchivoReporte.objects.create(
+            reporte=self.reporte, archivo=SimpleUploadedFile(nombre, salida.getvalue()),
+        )
+
+    def _color(self, adjunto, variante):
+        with Image.open(adjunto.archivo.storage.path(derivado(adjunto, variante))) as imagen:
+            return imagen.convert('RGB').getpixel((0, 0))
+
+    def test_mismo_nombre_distinta_extension(self):
+        jpg = self._foto('foto.jpg', (255, 0, 0), 'JPEG')
+        png = self._foto('foto.png', (0, 0, 255), 'PNG')
+
+        self.assertNotEqual(derivado(jpg, 'miniatura'), derivado(png, 'miniatura'))
+        self.assertGreater(self._color(jpg, 'miniatura')[0], 200)
+        self.assertGreater(self._color(png, 'miniatura')[2], 200)
+        with Image.open(png.ruta_pdf) as imagen:
+            self.assertEqual(max(imagen.size), 1200)
+
+    def test_comando_borra_los_derivados_con_el_nombre_anterior(self):
+        foto = self._foto('foto.jpg', (255, 0, 0), 'JPEG')
+        storage = foto.archivo.storage
+        anterior = storage.save(nombre_derivado_anterior(foto.archivo.name, 'media'), ContentFile(b'viejo'))
+
+        call_command('generar_derivados_imagenes', stdout=io.StringIO())
+        self.assertFalse(storage.exists(anterior))
+        self.assertNotEqual(derivado(foto, 'media'), foto.archivo.name)
+
+
+# ==========================================================
+# EXPORTACIÓN A ZIP (clientes/exportacion.py)
+# ==========================================================
+
+class ExportacionTestCase(TestCase):
+
+    def setUp(self):
+        directorio = tempfile.TemporaryDirectory()
+        self.addCleanup(directorio.cleanup)
+        ajuste = override_settings(REPORTES_PDF_DIR=directorio.name, REPORTES_EXPORTACION_ESPERA=0)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+        self.usuario = User.objects.create_user('tecnico', password='clave')
+        self.empresa = Empresa.objects.create(nombre='Cliente')
+        for dia in (3, 4):
+            ReporteAsistencia.objects.create(
+                fecha_asistencia=date(2025, 3, dia), empresa=self.empresa, maquina='Torno', persona_solicita='Ana',
+                usuario=self.usuario, problema='-', problema_encontrado='-', solucion='-',
+            )
+
+    def test_no_espera_mas_que_el_tope(self):
+        """Con el worker detenido: el ZIP trae los PDFs ya generados y lista el resto en ERRORES.txt."""
+        listo, pendiente = reportes_para_exportar(self.empresa, date(2025, 3, 1), date(2025, 3, 31))
+        ruta = ruta_artefacto(listo.pk, firma_reporte(listo))
+        os.makedirs(os.path.dirname(ruta))
+        with open(ruta, 'wb') as archivo:
+            archivo.write(_pdf_en_blanco(1).getvalue())
+
+        reportes = reportes_para_exportar(self.empresa, date(2025, 3, 1), date(2025, 3, 31))
+        with mock.patch('clientes.exportacion.time.sleep') as dormir:
+            contenido = b''.join(zip_reportes(reportes, self.usuario))
+        dormir.assert_not_called()
+
+        with zipfile.ZipFile(io.BytesIO(contenido)) as archivo_zip:
+            self.assertEqual(archivo_zip.namelist(), [f'{listo.numero_reporte}.pdf', 'ERRORES.txt'])
+            self.assertIn(pendiente.numero_reporte, archivo_zip.read('ERRORES.txt').decode())
+        # Sigue en la cola para la próxima exportación
+        self.assertTrue(TrabajoPdfReporte.objects.filter(reporte=pendiente, estado='pendiente').exists())
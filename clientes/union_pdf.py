@@ -0,0 +1,170 @@
+# clientes/union_pdf.py - UNIÓN DE PDFs EN STREAMING (REPORTE + ADJUNTOS)
+
+"""
+Une varios PDFs en uno escribiendo cada objeto al archivo de salida apenas se
+lee, en vez de armar el documento completo en memoria.
+
+PdfMerger (PyPDF2) y PdfWriter.append (pypdf) copian cada adjunto entero a un
+BytesIO y mantienen todas las páginas clonadas hasta el write() final, así que
+la memoria crecía con el tamaño total de los adjuntos (un reporte con cientos
+de páginas escaneadas). Acá pypdf se usa solo para leer (PdfReader sobre el
+archivo abierto, que carga los objetos bajo demanda) y para serializar cada
+objeto; los números de objeto se reasignan y las referencias se traducen al
+vuelo. En memoria queda, como máximo, el objeto más grande (una imagen
+escaneada) más la tabla de offsets.
+
+Uso:
+    escritor = EscritorPdf(destino)
+    escritor.agregar(archivo_o_ruta)
+    ...
+    escritor.cerrar()
+"""
+
+import logging
+from collections import deque
+
+from pypdf import PdfReader
+from pypdf.generic import (
+    ArrayObject,
+    DictionaryObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+logger = logging.getLogger(__name__)
+
+# Números fijos del catálogo y del árbol de páginas del documento unido
+NUMERO_CATALOGO = 1
+NUMERO_PAGINAS = 2
+
+# Claves de página que no se copian: /Parent se reemplaza por el árbol nuevo y
+# las anotaciones (/Annots, /B) pueden apuntar a páginas y objetos del
+# documento original que no forman parte de la salida
+CLAVES_PAGINA_EXCLUIDAS = ('/Parent', '/Annots', '/B')
+
+
+class EscritorPdf:
+    """Escribe en `destino` (archivo binario con tell()) la concatenación de los PDFs agregados."""
+
+    def __init__(self, destino):
+        self._destino = destino
+        self._offsets = {}
+        self._siguiente = NUMERO_PAGINAS + 1
+        self._paginas = []
+        self._destino.write(b'%PDF-1.7\n%\xe2\xe3\xcf\xd3\n')
+
+    @property
+    def paginas(self):
+        return len(self._paginas)
+
+    def _reservar(self):
+        numero = self._siguiente
+        self._siguiente += 1
+        return numero
+
+    def _escribir_objeto(self, numero, objeto):
+        self._offsets[numero] = self._destino.tell()
+        self._destino.write(f'{numero} 0 obj\n'.encode())
+        objeto.write_to_stream(self._destino)
+        self._destino.write(b'\nendobj\n')
+
+    def agregar(self, origen):
+        """
+        Agrega todas las páginas de `origen` (ruta o archivo binario abierto).
+        Si el PDF está dañado o cifrado no se agrega ninguna de sus páginas y
+        se propaga la excepción; lo ya escrito queda como objetos huérfanos.
+        Retorna la cantidad de páginas agregadas.
+        """
+        if isinstance(origen, (str, bytes)) or hasattr(origen, '__fspath__'):
+            with open(origen, 'rb') as archivo:
+                return self._agregar_documento(archivo)
+        return self._agregar_documento(origen)
+
+    def _agregar_documento(self, archivo):
+        lector = PdfReader(archivo, strict=False)
+        if lector.is_encrypted:
+            # PDFs con contraseña de permisos pero sin contraseña de apertura
+            lector.decrypt('')
+
+        # Números nuevos por referencia del documento de origen; las páginas se
+        # reservan primero para que las referencias entre páginas apunten bien
+        numeros = {}
+        pendientes = deque()
+        paginas = list(lector.pages)
+        for pagina in paginas:
+            ref = pagina.indirect_reference
+            numeros[(ref.idnum, ref.generation)] = self._reservar()
+
+        def traducir(objeto):
+            if isinstance(objeto, IndirectObject):
+                clave = (objeto.idnum, objeto.generation)
+                if clave not in numeros:
+                    numeros[clave] = self._reservar()
+                    pendientes.append(objeto)
+                return IndirectObject(numeros[clave], 0, None)
+            if isinstance(objeto, StreamObject):
+                # Se copian los bytes ya codificados: no se descomprime nada
+                copia = objeto.__class__()
+                copia._data = objeto._data
+                for clave, valor in objeto.items():
+                    if clave != '/Length':
+                        copia[NameObject(clave)] = traducir(valor)
+                return copia
+            if isinstance(objeto, DictionaryObject):
+                return DictionaryObject({NameObject(k): traducir(v) for k, v in objeto.items() if k != '/Parent'})
+            if isinstance(objeto, ArrayObject):
+                return ArrayObject(traducir(v) for v in objeto)
+            return objeto
+
+        nuevas = []
+        for pagina in paginas:
+            ref = pagina.indirect_reference
+            numero = numeros[(ref.idnum, ref.generation)]
+            copia = DictionaryObject({
+                NameObject(k): traducir(v) for k, v in pagina.items() if k not in CLAVES_PAGINA_EXCLUIDAS
+            })
+            copia[NameObject('/Parent')] = IndirectObject(NUMERO_PAGINAS, 0, None)
+            self._escribir_objeto(numero, copia)
+            nuevas.append(numero)
+
+            while pendientes:
+                ref = pendientes.popleft()
+                objeto = lector.get_object(ref)
+                # El lector guarda todo objeto resuelto: se descarta apenas se
+                # escribe para que las imágenes ya copiadas no se acumulen
+                lector.resolved_objects.pop((ref.generation, ref.idnum), None)
+                self._escribir_objeto(
+                    numeros[(ref.idnum, ref.generation)],
+                    NullObject() if objeto is None else traducir(objeto),
+                )
+
+        self._paginas.extend(nuevas)
+        return len(nuevas)
+
+    def cerrar(self):
+        """Escribe el árbol de páginas, el catálogo, la tabla xref y el trailer."""
+        self._escribir_objeto(NUMERO_PAGINAS, DictionaryObject({
+            NameObject('/Type'): NameObject('/Pages'),
+            NameObject('/Kids'): ArrayObject(IndirectObject(n, 0, None) for n in self._paginas),
+            NameObject('/Count'): NumberObject(len(self._paginas)),
+        }))
+        self._escribir_objeto(NUMERO_CATALOGO, DictionaryObject({
+            NameObject('/Type'): NameObject('/Catalog'),
+            NameObject('/Pages'): IndirectObject(NUMERO_PAGINAS, 0, None),
+        }))
+        # Números reservados de un adjunto que falló a mitad de camino
+        for numero in range(1, self._siguiente):
+            if numero not in self._offsets:
+                self._escribir_objeto(numero, NullObject())
+
+        inicio_xref = self._destino.tell()
+        self._destino.write(f'xref\n0 {self._siguiente}\n0000000000 65535 f \n'.encode())
+        for numero in range(1, self._siguiente):
+            self._destino.write(f'{self._offsets[numero]:010d} 00000 n \n'.encode())
+        self._destino.write(
+            f'trailer\n<< /Size {self._siguiente} /Root {NUMERO_CATALOGO} 0 R >>\n'
+            f'startxref\n{inicio_xref}\n%%EOF\n'.encode()
+        )
@@ -13,7 +13,11 @@ urlpatterns = [
     path('asistencias/<int:pk>/', views.detalle_reporte, name='detalle_reporte'),
     path('asistencias/<int:pk>/editar/', views.editar_reporte, name='editar_reporte'),
     path('asistencias/<int:pk>/eliminar/', views.eliminar_reporte, name='eliminar_reporte'),
+    path('asistencias/exportar/', views.exportar_reportes, name='exportar_reportes'),
     path('asistencias/<int:pk>/pdf/', views.reporte_pdf, name='reporte_pdf'),
+    path('asistencias/<int:pk>/pdf/solicitar/', views.solicitar_pdf_reporte, name='solicitar_pdf_reporte'),
+    path('asistencias/pdf/trabajos/<int:trabajo_id>/', views.estado_pdf_reporte, name='estado_pdf_reporte'),
+    path('asistencias/pdf/trabajos/<int:trabajo_id>/descargar/', views.descargar_pdf_reporte, name='descargar_pdf_reporte'),
     
     # Empresas
     path('empresas/', views.empresas_lista, name='empresas'),
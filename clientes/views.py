@@ -3,26 +3,24 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count
 from django.core.paginator import Paginator
-from .models import Empresa, ReporteAsistencia, ArchivoReporte
-from .forms import EmpresaForm, ReporteAsistenciaForm, ArchivoReporteFormSet
+from .models import Empresa, ReporteAsistencia, ArchivoReporte, TrabajoPdfReporte
+from .forms import EmpresaForm, ReporteAsistenciaForm, ArchivoReporteFormSet, ExportarReportesForm
 from django.http import HttpResponse
-from reportlab.pdfgen import canvas
-from django.template.loader import get_template
-from xhtml2pdf import pisa
 from django.http import HttpResponse
 import os
 from django.conf import settings
-from django.template.loader import get_template
 from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django.contrib.auth.decorators import login_required
-from xhtml2pdf import pisa
 from .models import ReporteAsistencia
-import io
 from django.core.files.storage import default_storage
-from PyPDF2 import PdfMerger
+from .cola_pdf import ColaLlena, cupo_usuario, encolar_pdf, trabajo_a_dict
+from .exportacion import ExportacionDemasiadoGrande, reportes_para_exportar, validar_exportacion, zip_reportes
+from .pdf import ErrorRenderPdf, abrir_artefacto, abrir_pdf, firma_reporte, ruta_artefacto
 from django.utils.text import slugify
-from django.http import FileResponse, Http404, HttpResponse
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.http import require_POST
 import mimetypes
 @login_required
 def clientes_dashboard(request):
@@ -216,85 +214,133 @@ def crear_empresa(request):
         'form': form,
     }
     return render(request, 'clientes/crear_empresa.html', context)
+def _respuesta_pdf(archivo, reporte):
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=f'Reporte_Completo_{reporte.numero_reporte}.pdf',
+        content_type='application/pdf',
+    )
+
+
+def _reporte_para_pdf(pk):
+    return get_object_or_404(
+        ReporteAsistencia.objects.select_related('empresa', 'usuario').prefetch_related('archivos'),
+        pk=pk
+    )
+
+
 @login_required
 def reporte_pdf(request, pk):
-    reporte = get_object_or_404(ReporteAsistencia, pk=pk)
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Reporte_{reporte.numero_reporte}.pdf"'
-    
-    p = canvas.Canvas(response)
-    p.drawString(100, 800, f"REPORTE DE ASISTENCIA: {reporte.numero_reporte}")
-    p.drawString(100, 780, f"Empresa: {reporte.empresa.nombre}")
-    p.drawString(100, 760, f"Fecha Servicio: {reporte.fecha_asistencia}")
-    p.drawString(100, 740, f"Máquina: {reporte.maquina}")
-    p.drawString(100, 720, f"Problema: {reporte.problema}")
-    p.drawString(100, 700, f"Solución: {reporte.solucion}")
-    
-    p.showPage()
-    p.save()
-    return response
-def link_callback(uri, rel):
     """
-    Convierte URIs de Media y Static en rutas de sistema de archivos absolutas
-    para que xhtml2pdf pueda encontrar las imágenes.
+    PDF completo del reporte (base + adjuntos PDF). Si ya está generado se
+    sirve desde el almacén de artefactos (clientes/pdf.py); si no, se encola
+    (clientes/cola_pdf.py) y se muestra una página que espera al worker y
+    descarga el PDF al terminar.
     """
-    sUrl = settings.STATIC_URL
-    sRoot = settings.STATIC_ROOT
-    mUrl = settings.MEDIA_URL
-    mRoot = settings.MEDIA_ROOT
-
-    if uri.startswith(mUrl):
-        path = os.path.join(mRoot, uri.replace(mUrl, ""))
-    elif uri.startswith(sUrl):
-        path = os.path.join(sRoot, uri.replace(sUrl, ""))
+    reporte = _reporte_para_pdf(pk)
+    firma = firma_reporte(reporte)
+    archivo = abrir_artefacto(reporte.pk, firma)
+    if archivo is not None:
+        return _respuesta_pdf(archivo, reporte)
+
+    if not getattr(settings, 'REPORTES_PDF_EN_COLA', True):
+        try:
+            archivo, _ = abrir_pdf(reporte)
+        except ErrorRenderPdf:
+            return HttpResponse('Error al generar el PDF base', status=500)
+        return _respuesta_pdf(archivo, reporte)
+
+    context = {'reporte': reporte, 'trabajo': None, 'error': None}
+    try:
+        trabajo = encolar_pdf(reporte, request.user, firma)
+    except ColaLlena as e:
+        context['error'] = str(e)
     else:
-        return uri
+        context['trabajo'] = trabajo
+        context['estado_url'] = reverse('clientes:estado_pdf_reporte', args=[trabajo.id])
+    return render(request, 'clientes/reporte_pdf_espera.html', context)
 
-    # Asegurarse de que el archivo existe
-    if not os.path.isfile(path):
-        return uri
-    return path
 
 @login_required
-def reporte_pdf(request, pk):
-    reporte = get_object_or_404(ReporteAsistencia.objects.prefetch_related('archivos'), pk=pk)
-    
-    # 1. Generar el PDF del reporte base (HTML)
-    template = get_template('clientes/reporte_pdf.html')
-    html = template.render({'reporte': reporte})
-    
-    reporte_base_io = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=reporte_base_io, link_callback=link_callback)
-    
-    if pisa_status.err:
-        return HttpResponse('Error al generar el PDF base', status=500)
+@require_POST
+def solicitar_pdf_reporte(request, pk):
+    """
+    API: pide el PDF de un reporte. Responde 200 con la URL de descarga si ya
+    está generado, 202 con el trabajo encolado, o 429 si el usuario ya tiene
+    demasiados PDFs en preparación.
+    """
+    reporte = _reporte_para_pdf(pk)
+    firma = firma_reporte(reporte)
+    if os.path.exists(ruta_artefacto(reporte.pk, firma)):
+        return JsonResponse({'terminado': True, 'estado': 'listo', 'descarga_url': reverse('clientes:reporte_pdf', args=[pk])})
+
+    try:
+        trabajo = encolar_pdf(reporte, request.user, firma)
+    except ColaLlena as e:
+        return JsonResponse({'error': str(e)}, status=429)
+    return JsonResponse(_estado_trabajo_pdf(trabajo), status=202)
+
+
+def _estado_trabajo_pdf(trabajo):
+    data = trabajo_a_dict(trabajo)
+    data['estado_url'] = reverse('clientes:estado_pdf_reporte', args=[trabajo.id])
+    data['descarga_url'] = (
+        reverse('clientes:descargar_pdf_reporte', args=[trabajo.id]) if trabajo.estado == 'listo' else None
+    )
+    return data
+
+
+@login_required
+def estado_pdf_reporte(request, trabajo_id):
+    """Estado y progreso de un trabajo de PDF (JSON), consultado periódicamente por el navegador."""
+    trabajo = get_object_or_404(TrabajoPdfReporte, id=trabajo_id)
+    return JsonResponse(_estado_trabajo_pdf(trabajo))
+
+
+@login_required
+def descargar_pdf_reporte(request, trabajo_id):
+    """PDF generado por un trabajo terminado."""
+    trabajo = get_object_or_404(TrabajoPdfReporte.objects.select_related('reporte'), id=trabajo_id, estado='listo')
+    archivo = abrir_artefacto(trabajo.reporte_id, trabajo.firma)
+    if archivo is None:
+        # El reporte cambió después de generarse: se vuelve a pedir la versión actual
+        return redirect('clientes:reporte_pdf', pk=trabajo.reporte_id)
+    return _respuesta_pdf(archivo, trabajo.reporte)
+
+
+@login_required
+def exportar_reportes(request):
+    """
+    Exporta en un ZIP los PDFs de todos los reportes de una empresa en un
+    período. El ZIP se envía a medida que cada PDF está listo (clientes/exportacion.py).
+    """
+    # Desde la lista de asistencias llega solo ?empresa=: se preselecciona sin validar
+    datos = request.GET if 'desde' in request.GET else None
+    form = ExportarReportesForm(datos, initial={'empresa': request.GET.get('empresa')})
+    cantidad = None
+    if form.is_valid():
+        empresa, desde, hasta = (form.cleaned_data[c] for c in ('empresa', 'desde', 'hasta'))
+        reportes = reportes_para_exportar(empresa, desde, hasta)
+        try:
+            cantidad = validar_exportacion(reportes)
+        except ExportacionDemasiadoGrande as e:
+            messages.error(request, str(e))
+        else:
+            if not cantidad:
+                messages.warning(request, f'{empresa.nombre} no tiene reportes entre {desde:%d/%m/%Y} y {hasta:%d/%m/%Y}.')
+            elif 'descargar' in request.GET and cupo_usuario(request.user) <= 0:
+                messages.error(request, 'Ya tiene PDFs en preparación. Espere a que terminen y vuelva a exportar.')
+            elif 'descargar' in request.GET:
+                response = StreamingHttpResponse(zip_reportes(reportes, request.user), content_type='application/zip')
+                response['Content-Disposition'] = (
+                    f'attachment; filename="Reportes_{slugify(empresa.nombre)}_{desde:%Y%m%d}_{hasta:%Y%m%d}.zip"'
+                )
+                return response
+
+    return render(request, 'clientes/exportar_reportes.html', {'form': form, 'cantidad': cantidad})
 
-    # 2. Preparar el "Merger" para unir archivos
-    merger = PdfMerger()
-    
-    # Añadimos el reporte base al principio
-    reporte_base_io.seek(0)
-    merger.append(reporte_base_io)
-
-    # 3. Buscar adjuntos que sean PDF y unirlos
-    for adjunto in reporte.archivos.all():
-        if adjunto.archivo.name.lower().endswith('.pdf'):
-            try:
-                # Abrimos el archivo desde el almacenamiento
-                path_archivo = adjunto.archivo.path
-                merger.append(path_archivo)
-            except Exception as e:
-                print(f"No se pudo adjuntar el PDF {adjunto.archivo.name}: {e}")
-
-    # 4. Crear la respuesta final
-    response = HttpResponse(content_type='application/pdf')
-    response['Content-Disposition'] = f'attachment; filename="Reporte_Completo_{reporte.numero_reporte}.pdf"'
-    
-    # Guardar todo el contenido unido en la respuesta
-    merger.write(response)
-    merger.close()
 
-    return response
 @login_required
 def listar_documentos_red(request):
     """Explorador de archivos para la Unidad Y:"""
@@ -14,9 +14,9 @@ from .models import (
 # ==========================================================
 @admin.register(Inventario)
 class InventarioAdmin(admin.ModelAdmin):
-    list_display = ('Producto', 'CodigoProducto', 'Cantidad', 'MinimoAdmisible', 'Ubicacion')
+    list_display = ('Producto', 'CodigoProducto', 'Cantidad', 'MinimoAdmisible', 'EstadoStock', 'Ubicacion')
     
-    list_filter = ('Ubicacion',) 
+    list_filter = ('EstadoStock', 'Ubicacion')
     
     search_fields = ('Producto', 'CodigoProducto', 'Marca', 'Modelo') 
     
@@ -181,4 +181,60 @@ class ProveedorAdmin(admin.ModelAdmin):
     
     def has_delete_permission(self, request, obj=None):
         """Evitar borrado accidental - solo desactivar."""
-        return False
\ No newline at end of file
+        return False
+
+from .models import TrabajoFactura, ExtraccionFacturaPdf
+
+@admin.register(TrabajoFactura)
+class TrabajoFacturaAdmin(admin.ModelAdmin):
+    """Cola de extracción de facturas (procesada por manage.py procesar_facturas)."""
+
+    list_display = ('id', 'nombre_original', 'estado', 'factura', 'usuario', 'intentos', 'fecha_creacion', 'fecha_fin')
+    list_filter = ('estado', 'fecha_creacion')
+    search_fields = ('nombre_original', 'factura__numero_factura', 'hash_sha256')
+    readonly_fields = ('datos_extraidos', 'intentos', 'fecha_creacion', 'fecha_inicio', 'fecha_fin')
+
+
+@admin.register(ExtraccionFacturaPdf)
+class ExtraccionFacturaPdfAdmin(admin.ModelAdmin):
+    """Caché de extracción por SHA-256 del PDF."""
+
+    list_display = ('hash_sha256', 'numero_factura', 'ruc_proveedor', 'aciertos', 'fecha_creacion')
+    search_fields = ('hash_sha256', 'numero_factura', 'ruc_proveedor')
+    readonly_fields = ('hash_sha256', 'archivo', 'datos_extraidos', 'aciertos', 'fecha_creacion')
+
+
+from .models import ValoracionUbicacion, SnapshotValoracion, AjusteValoracion
+
+@admin.register(ValoracionUbicacion)
+class ValoracionUbicacionAdmin(admin.ModelAdmin):
+    """Acumulados de valoración por ubicación (se mantienen solos; ver compras/valoracion.py)."""
+
+    list_display = ('ubicacion', 'cantidad', 'valor_gs', 'movimientos', 'fecha_actualizacion')
+    readonly_fields = ('ubicacion', 'cantidad', 'valor_gs', 'movimientos', 'fecha_actualizacion')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SnapshotValoracion)
+class SnapshotValoracionAdmin(admin.ModelAdmin):
+    """Valoración al cierre de cada día (manage.py snapshot_valoracion)."""
+
+    list_display = ('fecha', 'ubicacion', 'cantidad', 'valor_gs', 'tasa_cambio', 'valor_usd')
+    list_filter = ('ubicacion',)
+    date_hierarchy = 'fecha'
+    readonly_fields = ('fecha', 'ubicacion', 'cantidad', 'valor_gs', 'tasa_cambio', 'valor_usd', 'fecha_creacion')
+
+
+@admin.register(AjusteValoracion)
+class AjusteValoracionAdmin(admin.ModelAdmin):
+    """Cambios de los acumulados que no vienen de movimientos (se registran solos)."""
+
+    list_display = ('fecha', 'ubicacion', 'motivo', 'cantidad', 'valor_gs')
+    list_filter = ('motivo', 'ubicacion')
+    date_hierarchy = 'fecha'
+    readonly_fields = ('fecha', 'ubicacion', 'motivo', 'cantidad', 'valor_gs')
+
+    def has_add_permission(self, request):
+        return False
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def verificar_indice_busqueda(sender, using, **kwargs):
+    """Reinstala el índice de búsqueda si alguna migración lo dejó sin triggers."""
+    from django.db import connections
+    from .busqueda import asegurar_indice
+
+    asegurar_indice(connections[using])
 
 
 class ComprasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'compras'
+
+    def ready(self):
+        from mi_proyecto.cache import conectar_invalidacion
+        from . import signals  # noqa: F401
+        conectar_invalidacion(self)
+        post_migrate.connect(verificar_indice_busqueda, sender=self)
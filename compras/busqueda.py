@@ -0,0 +1,384 @@
+# compras/busqueda.py - MOTOR DE BÚSQUEDA DE INVENTARIO
+
+"""
+Índice de búsqueda sobre Inventario (CodigoProducto, Producto, Marca, Modelo).
+
+Se elige el motor según el backend configurado en DATABASES:
+- PostgreSQL: columnas generadas (texto normalizado + tsvector) con índices
+  GIN pg_trgm y de texto completo. Postgres las mantiene solas en cada save.
+- SQLite: tabla virtual FTS5 con tokenizador trigram, sincronizada por
+  triggers sobre Inventario (cubre también bulk_create/bulk_update).
+- Cualquier otro backend (o SQLite sin FTS5): icontains como antes.
+
+Encima del índice hay una caché en memoria del autocompletado (sección 3).
+
+La búsqueda es por subcadena (igual que el icontains original) pero usando
+el índice, y los resultados del autocompletado vienen ordenados por relevancia.
+"""
+
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+TABLA_FTS = 'InventarioBusqueda'
+TRIGGERS_FTS = ('InventarioBusqueda_ai', 'InventarioBusqueda_ad', 'InventarioBusqueda_au')
+
+# Los trigramas necesitan al menos 3 caracteres por término
+LARGO_MINIMO_TERMINO = 3
+
+# Pesos de relevancia por columna: el SKU pesa más que el nombre, y éste más que marca/modelo
+PESOS_SQLITE = (10.0, 5.0, 2.0, 2.0)
+
+_estado_indice = {}
+
+
+# ==========================================================
+# 1. INSTALACIÓN DEL ÍNDICE (usado por migraciones y post_migrate)
+# ==========================================================
+
+def instalar_indice(conexion=connection):
+    """Crea (o recrea) el índice de búsqueda para el backend de `conexion`."""
+    if conexion.vendor == 'sqlite':
+        _instalar_sqlite(conexion)
+    elif conexion.vendor == 'postgresql':
+        _instalar_postgres(conexion)
+    _estado_indice.pop(conexion.alias, None)
+
+
+def desinstalar_indice(conexion=connection):
+    """Elimina el índice de búsqueda (reverso de la migración)."""
+    with conexion.cursor() as cursor:
+        if conexion.vendor == 'sqlite':
+            for trigger in TRIGGERS_FTS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+            cursor.execute(f'DROP TABLE IF EXISTS "{TABLA_FTS}"')
+        elif conexion.vendor == 'postgresql':
+            cursor.execute('DROP INDEX IF EXISTS "Inventario_busqueda_trgm"')
+            cursor.execute('DROP INDEX IF EXISTS "Inventario_busqueda_tsv"')
+            cursor.execute('ALTER TABLE "Inventario" DROP COLUMN IF EXISTS busqueda_vector')
+            cursor.execute('ALTER TABLE "Inventario" DROP COLUMN IF EXISTS busqueda_texto')
+    _estado_indice.pop(conexion.alias, None)
+
+
+def asegurar_indice(conexion=connection):
+    """
+    Verifica que el índice siga instalado y lo reconstruye si no.
+    En SQLite, las migraciones que "rehacen" la tabla Inventario borran los triggers.
+    """
+    if conexion.vendor != 'sqlite':
+        return
+    with conexion.cursor() as cursor:
+        cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name IN (%s, %s, %s)",
+            TRIGGERS_FTS,
+        )
+        instalados = cursor.fetchone()[0]
+    if instalados != len(TRIGGERS_FTS):
+        instalar_indice(conexion)
+
+
+def _instalar_sqlite(conexion):
+    with conexion.cursor() as cursor:
+        for trigger in TRIGGERS_FTS:
+            cursor.execute(f'DROP TRIGGER IF EXISTS "{trigger}"')
+        cursor.execute(f'DROP TABLE IF EXISTS "{TABLA_FTS}"')
+
+        # remove_diacritics en trigram requiere SQLite >= 3.45; si no, sin él.
+        # Si FTS5/trigram no existe en absoluto, se queda el fallback icontains.
+        creada = False
+        for tokenizador in ('trigram remove_diacritics 1', 'trigram'):
+            try:
+                cursor.execute(
+                    f'CREATE VIRTUAL TABLE "{TABLA_FTS}" USING fts5('
+                    f'CodigoProducto, Producto, Marca, Modelo, tokenize="{tokenizador}")'
+                )
+                creada = True
+                break
+            except Exception:
+                continue
+        if not creada:
+            return
+
+        # El rowid del índice es el rowid de la fila en Inventario
+        columnas = 'rowid, CodigoProducto, Producto, Marca, Modelo'
+        valores_new = 'new.rowid, new.CodigoProducto, new.Producto, new.Marca, new.Modelo'
+        cursor.execute(
+            f'CREATE TRIGGER "InventarioBusqueda_ai" AFTER INSERT ON "Inventario" BEGIN '
+            f'INSERT INTO "{TABLA_FTS}"({columnas}) VALUES ({valores_new}); END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER "InventarioBusqueda_ad" AFTER DELETE ON "Inventario" BEGIN '
+            f'DELETE FROM "{TABLA_FTS}" WHERE rowid = old.rowid; END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER "InventarioBusqueda_au" AFTER UPDATE OF CodigoProducto, Producto, Marca, Modelo '
+            f'ON "Inventario" BEGIN '
+            f'DELETE FROM "{TABLA_FTS}" WHERE rowid = old.rowid; '
+            f'INSERT INTO "{TABLA_FTS}"({columnas}) VALUES ({valores_new}); END'
+        )
+        cursor.execute(
+            f'INSERT INTO "{TABLA_FTS}"({columnas}) '
+            f'SELECT rowid, CodigoProducto, Producto, Marca, Modelo FROM "Inventario"'
+        )
+
+
+def _instalar_postgres(conexion):
+    texto = (
+        "lower(\"CodigoProducto\" || ' ' || \"Producto\" || ' ' || "
+        "coalesce(\"Marca\", '') || ' ' || coalesce(\"Modelo\", ''))"
+    )
+    vector = (
+        "setweight(to_tsvector('simple', coalesce(\"CodigoProducto\", '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(\"Producto\", '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(\"Marca\", '') || ' ' || coalesce(\"Modelo\", '')), 'C')"
+    )
+    with conexion.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        cursor.execute(
+            f'ALTER TABLE "Inventario" ADD COLUMN IF NOT EXISTS busqueda_texto text '
+            f'GENERATED ALWAYS AS ({texto}) STORED'
+        )
+        cursor.execute(
+            f'ALTER TABLE "Inventario" ADD COLUMN IF NOT EXISTS busqueda_vector tsvector '
+            f'GENERATED ALWAYS AS ({vector}) STORED'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS "Inventario_busqueda_trgm" '
+            'ON "Inventario" USING gin (busqueda_texto gin_trgm_ops)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS "Inventario_busqueda_tsv" '
+            'ON "Inventario" USING gin (busqueda_vector)'
+        )
+
+
+def _motor(conexion=connection):
+    """Devuelve 'sqlite', 'postgresql' o None (sin índice: se usa icontains)."""
+    if conexion.alias not in _estado_indice:
+        motor = None
+        if conexion.vendor == 'sqlite':
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABLA_FTS]
+                )
+                motor = 'sqlite' if cursor.fetchone() else None
+        elif conexion.vendor == 'postgresql':
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM information_schema.columns "
+                    "WHERE table_name = 'Inventario' AND column_name = 'busqueda_vector'"
+                )
+                motor = 'postgresql' if cursor.fetchone() else None
+        _estado_indice[conexion.alias] = motor
+    return _estado_indice[conexion.alias]
+
+
+# ==========================================================
+# 2. CONSULTAS
+# ==========================================================
+
+def normalizar_terminos(texto):
+    """Separa la consulta en términos en minúscula (solo caracteres de palabra)."""
+    terminos = re.findall(r'\w+', (texto or '').lower())
+    return [t for t in terminos if len(t) >= LARGO_MINIMO_TERMINO]
+
+
+def _patron_like(termino):
+    # '_' es comodín en LIKE; se escapa para buscarlo literal
+    return '%' + termino.replace('_', '\\_') + '%'
+
+
+def _expresion_fts(terminos):
+    # Cada término entre comillas: FTS5 lo trata como subcadena literal
+    return ' AND '.join(f'"{t}"' for t in terminos)
+
+
+def _q_icontains(texto):
+    return (
+        Q(Producto__icontains=texto) |
+        Q(CodigoProducto__icontains=texto) |
+        Q(Marca__icontains=texto) |
+        Q(Modelo__icontains=texto)
+    )
+
+
+def filtro_busqueda(texto):
+    """
+    Q para filtrar Inventario por el texto de búsqueda usando el índice.
+    Sin orden ni límite: sirve para combinar con otros filtros (ej. deposito_view).
+    """
+    terminos = normalizar_terminos(texto)
+    motor = _motor()
+
+    if not terminos or motor is None:
+        return _q_icontains(texto)
+
+    if motor == 'sqlite':
+        sql = f'SELECT CodigoProducto FROM "{TABLA_FTS}" WHERE "{TABLA_FTS}" MATCH %s'
+        return Q(CodigoProducto__in=RawSQL(sql, [_expresion_fts(terminos)]))
+
+    condiciones = ' AND '.join(['busqueda_texto LIKE %s'] * len(terminos))
+    sql = f'SELECT "CodigoProducto" FROM "Inventario" WHERE {condiciones}'
+    return Q(CodigoProducto__in=RawSQL(sql, [_patron_like(t) for t in terminos]))
+
+
+def buscar_codigos(texto, limite=15):
+    """Devuelve los CodigoProducto que coinciden con `texto`, de más a menos relevante."""
+    from .models import Inventario
+
+    terminos = normalizar_terminos(texto)
+    motor = _motor()
+
+    if not terminos or motor is None:
+        return list(
+            Inventario.objects.filter(_q_icontains(texto))
+            .order_by('CodigoProducto')
+            .values_list('CodigoProducto', flat=True)[:limite]
+        )
+
+    with connection.cursor() as cursor:
+        if motor == 'sqlite':
+            pesos = ', '.join(str(p) for p in PESOS_SQLITE)
+            cursor.execute(
+                f'SELECT CodigoProducto FROM "{TABLA_FTS}" WHERE "{TABLA_FTS}" MATCH %s '
+                f'ORDER BY bm25("{TABLA_FTS}", {pesos}) LIMIT %s',
+                [_expresion_fts(terminos), limite],
+            )
+        else:
+            condiciones = ' AND '.join(['busqueda_texto LIKE %s'] * len(terminos))
+            consulta_ts = ' & '.join(f'{t}:*' for t in terminos)
+            cursor.execute(
+                f'SELECT "CodigoProducto" FROM "Inventario" WHERE {condiciones} '
+                f"ORDER BY ts_rank(busqueda_vector, to_tsquery('simple', %s)) DESC, "
+                f'similarity(busqueda_texto, %s) DESC, "CodigoProducto" LIMIT %s',
+                [_patron_like(t) for t in terminos] + [consulta_ts, ' '.join(terminos), limite],
+            )
+        return [fila[0] for fila in cursor.fetchall()]
+
+
+def buscar_productos(texto, campos, limite=15):
+    """
+    Busca en el inventario y devuelve dicts (`.values(*campos)`) ordenados por relevancia.
+    """
+    from .models import Inventario
+
+    codigos = buscar_codigos(texto, limite=limite)
+    filas = Inventario.objects.filter(CodigoProducto__in=codigos).values(*campos)
+    por_codigo = {fila['CodigoProducto']: fila for fila in filas}
+    return [por_codigo[c] for c in codigos if c in por_codigo]
+
+
+# ==========================================================
+# 3. CACHÉ DE AUTOCOMPLETADO (LRU + TTL, EN MEMORIA DEL PROCESO)
+# ==========================================================
+
+def normalizar_consulta(texto):
+    """Clave de caché: minúsculas y espacios colapsados."""
+    return ' '.join((texto or '').lower().split())
+
+
+class CachePrefijos:
+    """
+    Caché LRU con vencimiento por tiempo para resultados del autocompletado.
+
+    Cada entrada guarda los items ya formateados junto con su texto buscable.
+    Si una consulta no está en caché pero sí un prefijo suyo cuyo resultado
+    estaba completo (menos items que el límite), se filtra ese resultado en
+    memoria: al seguir tecleando, los resultados solo pueden reducirse.
+
+    Es por proceso: cada worker de gunicorn tiene la suya, por eso el TTL es
+    corto y las invalidaciones por señales solo alcanzan al worker que escribió.
+    """
+
+    def __init__(self, max_entradas=512, ttl=30):
+        self.max_entradas = max_entradas
+        self.ttl = ttl
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.aciertos_prefijo = 0
+        self.fallos = 0
+        self.invalidaciones = 0
+
+    def obtener(self, clave):
+        """Devuelve la lista de items para `clave` o None si hay que consultar la BD."""
+        ahora = time.monotonic()
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada and ahora - entrada[0] <= self.ttl:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return [item for _, item in entrada[1]]
+
+            derivados = self._derivar_de_prefijo(clave, ahora)
+            if derivados is not None:
+                self.aciertos_prefijo += 1
+                self._guardar(clave, derivados, completo=True, ahora=ahora)
+                return [item for _, item in derivados]
+
+            self.fallos += 1
+            return None
+
+    def guardar(self, clave, filas, completo):
+        """
+        Guarda `filas` como lista de (texto_buscable, item).
+        `completo` indica que no se cortó por el límite (sirve como base de prefijo).
+        """
+        with self._lock:
+            self._guardar(clave, filas, completo, time.monotonic())
+
+    def invalidar(self, **kwargs):
+        """Vacía la caché (conectado a las señales de Inventario y StockMovement)."""
+        with self._lock:
+            self._entradas.clear()
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.aciertos_prefijo + self.fallos
+            return {
+                'entradas': len(self._entradas),
+                'max_entradas': self.max_entradas,
+                'ttl_segundos': self.ttl,
+                'aciertos': self.aciertos,
+                'aciertos_prefijo': self.aciertos_prefijo,
+                'fallos': self.fallos,
+                'invalidaciones': self.invalidaciones,
+                'tasa_aciertos': round((self.aciertos + self.aciertos_prefijo) / consultas, 4) if consultas else 0.0,
+            }
+
+    def _guardar(self, clave, filas, completo, ahora):
+        self._entradas[clave] = (ahora, filas, completo)
+        self._entradas.move_to_end(clave)
+        while len(self._entradas) > self.max_entradas:
+            self._entradas.popitem(last=False)
+
+    def _derivar_de_prefijo(self, clave, ahora):
+        terminos = normalizar_terminos(clave)
+        if not terminos or _motor() is None:
+            # Sin índice (o sin términos indexables) la búsqueda es icontains sobre
+            # la frase completa: filtrar por términos no daría lo mismo
+            return None
+        for largo in range(len(clave) - 1, LARGO_MINIMO_TERMINO - 1, -1):
+            entrada = self._entradas.get(clave[:largo])
+            if not entrada or not entrada[2] or ahora - entrada[0] > self.ttl:
+                continue
+            if not normalizar_terminos(clave[:largo]):
+                continue
+            return [
+                (texto, item) for texto, item in entrada[1]
+                if all(t in texto for t in terminos)
+            ]
+        return None
+
+
+cache_autocompletado = CachePrefijos(
+    max_entradas=getattr(settings, 'AUTOCOMPLETADO_CACHE_MAX_ENTRADAS', 512),
+    ttl=getattr(settings, 'AUTOCOMPLETADO_CACHE_TTL', 30),
+)
@@ -0,0 +1,174 @@
+# compras/historial.py - HISTORIAL DE MOVIMIENTOS POR PRODUCTO
+
+"""
+Historial de StockMovement de un producto, pensado para SKUs con años de
+actividad. Ambas consultas usan el índice (producto, fecha_movimiento):
+
+- Paginación por cursor sobre (fecha_movimiento, id), del más nuevo al más
+  viejo. El id desempata movimientos con la misma fecha (los lotes se graban
+  con un único timezone.now()), así no se repiten ni se pierden filas entre bloques.
+- Agregados por día, semana o mes de cantidades y costos por tipo de
+  movimiento, calculados en la base (GROUP BY) dentro de una ventana acotada.
+"""
+
+import base64
+from datetime import datetime, time, timedelta
+
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import StockMovement
+
+PAGINA_HISTORIAL = 25
+PAGINA_HISTORIAL_MAX = 200
+
+TIPOS = ('ENTRADA', 'SALIDA', 'AJUSTE')
+
+# agrupar -> (función de truncado, ventana por defecto en días)
+AGRUPACIONES = {
+    'dia': (TruncDay, 90),
+    'semana': (TruncWeek, 7 * 52),
+    'mes': (TruncMonth, 365 * 3),
+}
+
+# Ventana máxima que se acepta desde los parámetros (10 años)
+MAX_DIAS_AGREGADOS = 3660
+
+
+class CursorInvalido(ValueError):
+    """El cursor recibido no corresponde a ninguno emitido por esta API."""
+
+
+# ==========================================================
+# 1. PAGINACIÓN POR CURSOR (fecha_movimiento, id)
+# ==========================================================
+
+def codificar_cursor(movimiento):
+    """Cursor opaco con la fecha y el id del último movimiento entregado."""
+    texto = f'{movimiento.fecha_movimiento.isoformat()}|{movimiento.pk}'
+    return base64.urlsafe_b64encode(texto.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """(fecha_movimiento, id) del cursor. Lanza CursorInvalido si no se puede leer."""
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        fecha, pk = base64.urlsafe_b64decode(cursor + relleno).decode().split('|')
+        fecha = datetime.fromisoformat(fecha)
+        pk = int(pk)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise CursorInvalido(f'Cursor inválido: {cursor!r}') from e
+    if timezone.is_naive(fecha):
+        fecha = timezone.make_aware(fecha)
+    return fecha, pk
+
+
+def pagina_movimientos(producto, cursor=None, limite=PAGINA_HISTORIAL):
+    """
+    Un bloque de movimientos del producto, del más reciente al más viejo.
+    Retorna (movimientos, siguiente_cursor); siguiente_cursor es None si no hay más.
+    """
+    limite = max(1, min(int(limite), PAGINA_HISTORIAL_MAX))
+    qs = StockMovement.objects.filter(producto=producto).order_by('-fecha_movimiento', '-id')
+
+    if cursor:
+        fecha, pk = decodificar_cursor(cursor)
+        qs = qs.filter(Q(fecha_movimiento__lt=fecha) | Q(fecha_movimiento=fecha, id__lt=pk))
+
+    # Una fila extra solo para saber si existe un bloque siguiente
+    movimientos = list(qs[:limite + 1])
+    hay_mas = len(movimientos) > limite
+    movimientos = movimientos[:limite]
+
+    siguiente_cursor = codificar_cursor(movimientos[-1]) if hay_mas else None
+    return movimientos, siguiente_cursor
+
+
+def movimiento_a_dict(movimiento):
+    return {
+        'id': movimiento.pk,
+        'fecha': timezone.localtime(movimiento.fecha_movimiento).isoformat(),
+        'tipo': movimiento.tipo_movimiento,
+        'cantidad': movimiento.cantidad_movida,
+        'costo_unitario': str(movimiento.costo_unitario) if movimiento.costo_unitario is not None else None,
+        'costo_total': str(movimiento.costo_total) if movimiento.costo_total is not None else None,
+        'referencia': movimiento.referencia,
+        'motivo': movimiento.motivo,
+    }
+
+
+# ==========================================================
+# 2. AGREGADOS POR PERÍODO
+# ==========================================================
+
+def ventana_agregados(agrupar, desde=None, hasta=None):
+    """
+    Límites [inicio, fin) en la zona horaria local. Sin fechas se usa la
+    ventana por defecto de la agrupación, terminando hoy.
+    """
+    _, dias_defecto = AGRUPACIONES[agrupar]
+    hoy = timezone.localdate()
+    hasta = hasta or hoy
+    desde = desde or (hasta - timedelta(days=dias_defecto - 1))
+    if desde > hasta:
+        desde, hasta = hasta, desde
+    if (hasta - desde).days >= MAX_DIAS_AGREGADOS:
+        desde = hasta - timedelta(days=MAX_DIAS_AGREGADOS - 1)
+
+    inicio = timezone.make_aware(datetime.combine(desde, time.min))
+    fin = timezone.make_aware(datetime.combine(hasta + timedelta(days=1), time.min))
+    return inicio, fin
+
+
+def agregados_movimientos(producto, agrupar='mes', desde=None, hasta=None):
+    """
+    Filas por período (solo los que tienen movimientos), de la más vieja a la
+    más nueva, con cantidad, costo total y cantidad de movimientos por tipo.
+    Los movimientos sin costo_total registrado suman 0 al costo.
+    """
+    if agrupar not in AGRUPACIONES:
+        raise ValueError(f'Agrupación desconocida: {agrupar!r}')
+    truncar, _ = AGRUPACIONES[agrupar]
+    inicio, fin = ventana_agregados(agrupar, desde, hasta)
+
+    cero = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+    anotaciones = {}
+    for tipo in TIPOS:
+        filtro = Q(tipo_movimiento=tipo)
+        clave = tipo.lower()
+        anotaciones[f'cantidad_{clave}'] = Coalesce(Sum('cantidad_movida', filter=filtro), Value(0.0))
+        anotaciones[f'costo_{clave}'] = Coalesce(Sum('costo_total', filter=filtro), cero)
+        anotaciones[f'movimientos_{clave}'] = Count('id', filter=filtro)
+
+    filas = (
+        StockMovement.objects
+        .filter(producto=producto, fecha_movimiento__gte=inicio, fecha_movimiento__lt=fin)
+        .annotate(periodo=truncar('fecha_movimiento'))
+        .order_by()
+        .values('periodo')
+        .annotate(**anotaciones)
+        .order_by('periodo')
+    )
+
+    resultado = []
+    for fila in filas:
+        periodo = fila.pop('periodo')
+        if isinstance(periodo, datetime):
+            periodo = timezone.localtime(periodo).date() if timezone.is_aware(periodo) else periodo.date()
+        por_tipo = {
+            tipo.lower(): {
+                'cantidad': fila[f'cantidad_{tipo.lower()}'],
+                'costo': fila[f'costo_{tipo.lower()}'],
+                'movimientos': fila[f'movimientos_{tipo.lower()}'],
+            }
+            for tipo in TIPOS
+        }
+        resultado.append({
+            'periodo': periodo,
+            **por_tipo,
+            # Variación neta de stock: los ajustes ya vienen con su signo
+            'neto': por_tipo['entrada']['cantidad'] - por_tipo['salida']['cantidad'] + por_tipo['ajuste']['cantidad'],
+        })
+
+    return resultado, inicio, fin
@@ -0,0 +1,371 @@
+# compras/importacion.py - IMPORTACIÓN MASIVA DE INVENTARIO (EXCEL / CSV)
+
+"""
+Carga del maestro de Inventario desde un XLSX o CSV (reemplaza al script
+excel.py, que escribía directo en la tabla de SQLite con to_sql y fallaba al
+repetir la carga por la clave primaria CodigoProducto).
+
+El archivo se procesa por bloques de TAMANO_BLOQUE_IMPORTACION filas:
+
+1. Lectura: CSV con pandas (chunksize) y XLSX en modo read-only de openpyxl,
+   sin cargar el archivo completo en memoria.
+2. Validación y conversión con operaciones de columna de pandas (sin recorrer
+   filas en Python): nombres de columna normalizados, números y fechas
+   convertidos, filas inválidas informadas con su número de fila.
+3. Upsert con bulk_create(update_conflicts=True) sobre CodigoProducto, en la
+   base que esté configurada. Las celdas vacías conservan el valor actual del
+   producto. Cada diferencia de Cantidad queda registrada como un movimiento
+   AJUSTE. PrecioTotalGS y EstadoStock se recalculan (el PrecioTotalGS del
+   archivo se ignora).
+
+bulk_create no dispara señales: cada bloque actualiza a mano los acumulados
+de valoración (compras/valoracion.py) con sus movimientos AJUSTE, y los
+cambios de precio y de ubicación de productos existentes quedan como ajustes
+fechados (así las fechas anteriores a la importación conservan su valor).
+"""
+
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from decimal import Decimal
+from itertools import repeat
+
+import numpy as np
+import pandas as pd
+from django.db import transaction
+from django.utils import timezone
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from mi_proyecto.cache import invalidar_modelos
+
+from .busqueda import cache_autocompletado
+from .models import MARGEN_STOCK_BAJO, Inventario, StockMovement
+from .valoracion import (
+    SIN_UBICACION, ajustar_acumulados, ajustar_precios, registrar_movimientos, valorar_productos,
+)
+
+TAMANO_BLOQUE_IMPORTACION = 5000
+
+COLUMNAS_TEXTO = ('Producto', 'Marca', 'Modelo', 'Descripcion', 'Ubicacion')
+COLUMNAS_NUMERICAS = ('Cantidad', 'MinimoAdmisible', 'MaximoAdmisible', 'PrecioGS', 'PrecioUSD')
+COLUMNA_FECHA = 'FechaUltimoMovimiento'
+COLUMNAS_IMPORTABLES = ('CodigoProducto', *COLUMNAS_TEXTO, *COLUMNAS_NUMERICAS, COLUMNA_FECHA)
+
+CAMPOS_UPSERT = [*COLUMNAS_TEXTO, *COLUMNAS_NUMERICAS, 'PrecioTotalGS', 'EstadoStock', COLUMNA_FECHA]
+
+LARGO_CODIGO = Inventario._meta.get_field('CodigoProducto').max_length
+MOTIVO_AJUSTE = 'Ajuste por importación de inventario'
+CENTAVOS = Decimal('0.01')
+
+
+class ArchivoInvalido(Exception):
+    """El archivo no se puede importar (formato no soportado o sin columna CodigoProducto)."""
+
+
+# ==========================================================
+# 1. LECTURA POR BLOQUES
+# ==========================================================
+
+def normalizar_columna(nombre):
+    """'Código Producto' -> 'CodigoProducto'; sin distinguir mayúsculas ni acentos."""
+    texto = unicodedata.normalize('NFKD', str(nombre)).encode('ascii', 'ignore').decode()
+    clave = re.sub(r'[^A-Za-z0-9_]+', '', texto).lower()
+    return _COLUMNAS_POR_CLAVE.get(clave, clave)
+
+
+_COLUMNAS_POR_CLAVE = {columna.lower(): columna for columna in COLUMNAS_IMPORTABLES}
+
+
+def _bloques_xlsx(ruta, tamano, hoja=None):
+    try:
+        libro = load_workbook(ruta, read_only=True, data_only=True)
+    except (InvalidFileException, KeyError, OSError) as e:
+        raise ArchivoInvalido(f'No se pudo abrir el Excel: {e}') from e
+    try:
+        if hoja and hoja not in libro.sheetnames:
+            raise ArchivoInvalido(f'La hoja {hoja!r} no existe en el archivo.')
+        filas = libro[hoja].iter_rows(values_only=True) if hoja else libro.active.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if encabezado is None:
+            return
+        columnas = ['' if c is None else str(c) for c in encabezado]
+        bloque = []
+        for fila in filas:
+            bloque.append(fila[:len(columnas)])
+            if len(bloque) == tamano:
+                yield pd.DataFrame(bloque, columns=columnas, dtype=object)
+                bloque = []
+        if bloque:
+            yield pd.DataFrame(bloque, columns=columnas, dtype=object)
+    finally:
+        libro.close()
+
+
+def leer_bloques(ruta, tamano=TAMANO_BLOQUE_IMPORTACION, hoja=None, separador=','):
+    """DataFrames de hasta `tamano` filas con los nombres de columna normalizados y todo como texto."""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension == '.csv':
+        bloques = pd.read_csv(ruta, sep=separador, dtype=str, keep_default_na=False,
+                              chunksize=tamano, encoding='utf-8-sig')
+    elif extension in ('.xlsx', '.xlsm'):
+        bloques = _bloques_xlsx(ruta, tamano, hoja)
+    else:
+        raise ArchivoInvalido(f'Formato no soportado: {extension or ruta!r} (use .xlsx o .csv).')
+
+    for bloque in bloques:
+        bloque.columns = [normalizar_columna(c) for c in bloque.columns]
+        if 'CodigoProducto' not in bloque.columns:
+            raise ArchivoInvalido('El archivo no tiene la columna CodigoProducto.')
+        # Columnas desconocidas (p. ej. PrecioTotalGS) se descartan; repetidas, vale la primera
+        bloque = bloque.loc[:, ~bloque.columns.duplicated()]
+        bloque = bloque[[c for c in COLUMNAS_IMPORTABLES if c in bloque.columns]]
+        yield bloque.astype('string').apply(lambda columna: columna.str.strip())
+
+
+# ==========================================================
+# 2. VALIDACIÓN Y CONVERSIÓN (VECTORIZADA)
+# ==========================================================
+
+def preparar_bloque(bloque, vistos):
+    """
+    Valida y convierte un bloque (índice = número de fila en el archivo).
+
+    Retorna (datos, rechazados): datos indexado por CodigoProducto, con NaN
+    donde la celda viene vacía; rechazados es una lista de (fila, codigo, error).
+    `vistos` acumula los códigos ya leídos: un código repetido en el archivo
+    vale solo en su primera aparición (como hacía excel.py).
+    """
+    bloque = bloque.fillna('')
+    # Filas completamente vacías (típicas al final de un Excel) se ignoran sin informar
+    bloque = bloque[(bloque != '').any(axis=1)]
+
+    codigo = bloque['CodigoProducto'].str.replace(r'^(\d+)\.0$', r'\1', regex=True)
+    errores = pd.Series('', index=bloque.index, dtype='string')
+
+    def marcar(condicion, mensaje):
+        nonlocal errores
+        errores = errores.mask((errores == '') & condicion, mensaje)
+
+    marcar(codigo == '', 'Falta CodigoProducto.')
+    marcar(codigo.str.len() > LARGO_CODIGO, f'CodigoProducto de más de {LARGO_CODIGO} caracteres.')
+    marcar(codigo.duplicated() | codigo.isin(vistos), 'CodigoProducto repetido en el archivo (vale la primera fila).')
+
+    datos = pd.DataFrame({'CodigoProducto': codigo}, index=bloque.index)
+    for columna in COLUMNAS_TEXTO:
+        if columna in bloque.columns:
+            datos[columna] = bloque[columna].replace('', pd.NA)
+
+    for columna in COLUMNAS_NUMERICAS:
+        if columna not in bloque.columns:
+            continue
+        texto = bloque[columna]
+        numero = pd.to_numeric(texto, errors='coerce').astype(float)
+        marcar((texto != '') & numero.isna(), f'{columna} no es un número: se leyó un texto.')
+        marcar(numero.notna() & ~np.isfinite(numero), f'{columna} no es un número finito.')
+        marcar(numero < 0, f'{columna} no puede ser negativo.')
+        datos[columna] = numero
+
+    if COLUMNA_FECHA in bloque.columns:
+        texto = bloque[COLUMNA_FECHA]
+        fecha = pd.to_datetime(texto, errors='coerce', format='mixed')
+        marcar((texto != '') & fecha.isna(), f'{COLUMNA_FECHA} no es una fecha válida.')
+        if fecha.dt.tz is None:
+            fecha = fecha.dt.tz_localize(timezone.get_current_timezone(), ambiguous='NaT', nonexistent='NaT')
+        datos[COLUMNA_FECHA] = fecha.dt.tz_convert('UTC')
+
+    vistos.update(codigo[codigo != ''])
+
+    invalidas = errores != ''
+    rechazados = list(zip(errores.index[invalidas], codigo[invalidas], errores[invalidas]))
+    datos['fila'] = datos.index
+    return datos[~invalidas].set_index('CodigoProducto'), rechazados
+
+
+# ==========================================================
+# 3. UPSERT Y AJUSTES
+# ==========================================================
+
+def _a_objetos(tabla, columnas):
+    """Filas del DataFrame como dicts con None en lugar de NaN/NaT."""
+    tabla = tabla[columnas].astype(object)
+    return tabla.where(tabla.notna(), None).to_dict('records')
+
+
+def _ajustar_valoracion(cantidad, ubicacion_anterior, ubicacion_nueva, precio_anterior, precio_nuevo):
+    """
+    Traslados y cambios de precio de productos existentes como ajustes
+    fechados (Series indexadas por CodigoProducto, `cantidad` es la Cantidad
+    anterior). Se llama antes del upsert y de crear los AJUSTE, con la base
+    todavía en el estado anterior.
+    """
+    trasladados = list(cantidad.index[ubicacion_nueva != ubicacion_anterior])
+    if trasladados:
+        valores = valorar_productos(zip(trasladados, cantidad[trasladados], precio_anterior[trasladados]))
+        traslados = defaultdict(lambda: [0.0, Decimal('0'), 0])
+        for codigo in trasladados:
+            unidades = float(cantidad[codigo])
+            traslados[ubicacion_anterior[codigo]][0] -= unidades
+            traslados[ubicacion_anterior[codigo]][1] -= valores[codigo]
+            traslados[ubicacion_nueva[codigo]][0] += unidades
+            traslados[ubicacion_nueva[codigo]][1] += valores[codigo]
+        ajustar_acumulados({u: d for u, d in traslados.items() if d[0] or d[1]}, 'traslado')
+
+    # Después del traslado: el precio se revaloriza en la ubicación nueva
+    ajustar_precios(zip(cantidad.index, ubicacion_nueva, cantidad, precio_anterior, precio_nuevo))
+
+
+def guardar_bloque(datos, referencia, simular=False):
+    """
+    Upsert de un bloque ya validado y AJUSTE por cada diferencia de Cantidad.
+    Retorna (creados, actualizados, ajustes, rechazados).
+    Con simular=True hace todo dentro de la transacción y la revierte.
+    """
+    if datos.empty:
+        return 0, 0, 0, []
+    ahora = timezone.now()
+
+    with transaction.atomic():
+        # Mismo orden de bloqueo que los movimientos en lote
+        codigos = sorted(datos.index)
+        encontrados = pd.DataFrame.from_records(
+            Inventario.objects.select_for_update().filter(CodigoProducto__in=codigos)
+            .order_by('CodigoProducto')
+            .values('CodigoProducto', *COLUMNAS_TEXTO, *COLUMNAS_NUMERICAS, COLUMNA_FECHA),
+            columns=['CodigoProducto', *COLUMNAS_TEXTO, *COLUMNAS_NUMERICAS, COLUMNA_FECHA],
+        ).set_index('CodigoProducto')
+        es_nuevo = ~datos.index.isin(encontrados.index)
+        existentes = encontrados.reindex(datos.index)
+        existentes[COLUMNA_FECHA] = pd.to_datetime(existentes[COLUMNA_FECHA], utc=True)
+
+        # Producto es obligatorio en el modelo: un producto nuevo debe traerlo
+        sin_nombre = es_nuevo & (datos['Producto'].isna().to_numpy() if 'Producto' in datos else True)
+        rechazados = list(zip(
+            datos['fila'][sin_nombre], datos.index[sin_nombre],
+            repeat('Producto nuevo sin nombre (columna Producto).'),
+        ))
+        datos, existentes, es_nuevo = datos[~sin_nombre], existentes[~sin_nombre], es_nuevo[~sin_nombre]
+        if datos.empty:
+            return 0, 0, 0, rechazados
+
+        # Celda vacía o columna ausente: valor actual, o el del modelo si el producto es nuevo
+        completos = pd.DataFrame(index=datos.index)
+        for columna in (*COLUMNAS_TEXTO, *COLUMNAS_NUMERICAS):
+            actual = existentes[columna]
+            completos[columna] = datos[columna].fillna(actual) if columna in datos else actual
+            if columna in COLUMNAS_NUMERICAS:
+                completos[columna] = completos[columna].astype(float).fillna(0.0)
+
+        anterior = existentes['Cantidad'].astype(float).fillna(0.0)
+        delta = completos['Cantidad'] - anterior
+        con_ajuste = delta.abs() > 1e-9
+
+        # Fecha del archivo; si no viene, ahora para los que cambian de stock y la actual para el resto
+        if COLUMNA_FECHA in datos:
+            fecha = datos[COLUMNA_FECHA]
+        else:
+            fecha = pd.Series(pd.NaT, index=datos.index, dtype='datetime64[ns, UTC]')
+        fecha = fecha.mask(fecha.isna() & con_ajuste, pd.Timestamp(ahora))
+        fecha = fecha.fillna(existentes[COLUMNA_FECHA]).fillna(pd.Timestamp(ahora))
+        completos[COLUMNA_FECHA] = fecha.map(pd.Timestamp.to_pydatetime).astype(object)
+
+        # Derivados, con las mismas reglas que recalcular_totales()
+        cantidad, minimo = completos['Cantidad'], completos['MinimoAdmisible']
+        completos['PrecioTotalGS'] = cantidad * completos['PrecioGS']
+        completos['EstadoStock'] = np.select(
+            [cantidad <= minimo, cantidad <= minimo + MARGEN_STOCK_BAJO], ['critico', 'bajo'], default='optimo'
+        )
+
+        # Existentes que cambian de precio o de ubicación: ajustes fechados con
+        # la Cantidad anterior (la diferencia de stock va por el AJUSTE)
+        precio_anterior = existentes['PrecioGS'].astype(float).fillna(0.0)
+        ubicacion_anterior = existentes['Ubicacion'].fillna(SIN_UBICACION)
+        ubicacion_nueva = completos['Ubicacion'].fillna(SIN_UBICACION)
+        revalorizados = ~es_nuevo & (
+            (completos['PrecioGS'] != precio_anterior) | (ubicacion_nueva != ubicacion_anterior)
+        )
+        _ajustar_valoracion(
+            anterior[revalorizados], ubicacion_anterior[revalorizados], ubicacion_nueva[revalorizados],
+            precio_anterior[revalorizados], completos['PrecioGS'][revalorizados],
+        )
+
+        filas = _a_objetos(completos.reset_index(), ['CodigoProducto', *CAMPOS_UPSERT])
+        productos = [Inventario(**fila) for fila in filas]
+        Inventario.objects.bulk_create(
+            productos,
+            update_conflicts=True,
+            unique_fields=['CodigoProducto'],
+            update_fields=CAMPOS_UPSERT,
+            batch_size=TAMANO_BLOQUE_IMPORTACION,
+        )
+
+        por_codigo = {producto.CodigoProducto: producto for producto in productos}
+        movimientos = []
+        for codigo, diferencia, precio in zip(
+            delta.index[con_ajuste], delta[con_ajuste], completos['PrecioGS'][con_ajuste]
+        ):
+            costo_unitario = Decimal(str(precio)).quantize(CENTAVOS)
+            movimientos.append(StockMovement(
+                producto=por_codigo[codigo],
+                tipo_movimiento='AJUSTE',
+                cantidad_movida=float(diferencia),
+                costo_unitario=costo_unitario,
+                costo_total=(abs(Decimal(str(diferencia))) * costo_unitario).quantize(CENTAVOS),
+                motivo=MOTIVO_AJUSTE,
+                referencia=referencia,
+                fecha_movimiento=ahora,
+                ubicacion=por_codigo[codigo].Ubicacion or '',
+            ))
+        StockMovement.objects.bulk_create(movimientos, batch_size=TAMANO_BLOQUE_IMPORTACION)
+        registrar_movimientos(movimientos)
+
+        if simular:
+            transaction.set_rollback(True)
+        else:
+            # bulk_create no dispara señales: se invalida la caché a mano
+            transaction.on_commit(cache_autocompletado.invalidar)
+            invalidar_modelos(Inventario)
+
+    creados = int(es_nuevo.sum())
+    return creados, len(productos) - creados, len(movimientos), rechazados
+
+
+def importar_inventario(ruta, tamano=TAMANO_BLOQUE_IMPORTACION, hoja=None, separador=',',
+                        simular=False, referencia=None, progreso=None):
+    """
+    Importa el archivo completo, un bloque por transacción.
+    `progreso(resumen)` se llama al terminar cada bloque.
+    Retorna el resumen con los totales, las filas rechazadas y el rendimiento.
+    """
+    referencia = (referencia or f'IMPORT {os.path.basename(ruta)}')[:100]
+    resumen = {
+        'filas': 0, 'bloques': 0, 'creados': 0, 'actualizados': 0, 'ajustes': 0,
+        'rechazados': [], 'segundos': 0.0, 'filas_por_segundo': 0.0, 'simulado': simular,
+    }
+    inicio = time.perf_counter()
+    vistos = set()
+    # Fila 1 = encabezado
+    siguiente_fila = 2
+
+    for bloque in leer_bloques(ruta, tamano, hoja=hoja, separador=separador):
+        bloque.index = pd.RangeIndex(siguiente_fila, siguiente_fila + len(bloque))
+        siguiente_fila += len(bloque)
+
+        datos, rechazados = preparar_bloque(bloque, vistos)
+        creados, actualizados, ajustes, sin_nombre = guardar_bloque(datos, referencia, simular=simular)
+        rechazados += sin_nombre
+
+        resumen['filas'] += len(bloque)
+        resumen['bloques'] += 1
+        resumen['creados'] += creados
+        resumen['actualizados'] += actualizados
+        resumen['ajustes'] += ajustes
+        resumen['rechazados'].extend(sorted(rechazados, key=lambda r: r[0]))
+        resumen['segundos'] = time.perf_counter() - inicio
+        resumen['filas_por_segundo'] = resumen['filas'] / resumen['segundos'] if resumen['segundos'] else 0.0
+        if progreso:
+            progreso(resumen)
+
+    return resumen
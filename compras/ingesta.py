@@ -0,0 +1,282 @@
+# compras/ingesta.py - EXTRACCIÓN DE FACTURAS EN SEGUNDO PLANO
+
+"""
+Cola de extracción de PDFs de facturas respaldada en la base de datos.
+
+La vista solo guarda el PDF y crea un TrabajoFactura 'pendiente'; el worker
+(manage.py procesar_facturas) toma los trabajos de a uno, ejecuta
+extraer_datos_pdf y crea/actualiza el Proveedor y la Factura. No hace falta
+ningún broker externo: la tabla TrabajoFactura es la cola.
+
+Los PDFs se guardan por contenido (SHA-256): un archivo repetido no se vuelve
+a escribir en disco y, si ya se extrajo, tampoco se vuelve a parsear
+(ExtraccionFacturaPdf).
+"""
+
+import hashlib
+import logging
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import ExtraccionFacturaPdf, Factura, Proveedor, TrabajoFactura
+from .utils import extraer_datos_pdf
+
+logger = logging.getLogger(__name__)
+
+# Un trabajo 'procesando' más viejo que esto se considera abandonado
+# (worker reiniciado o caído) y se vuelve a encolar
+MINUTOS_TRABAJO_COLGADO = 10
+MAX_INTENTOS = 3
+
+DIRECTORIO_CONTENIDO = 'facturas/originales/sha256'
+
+
+class ExtraccionFallida(Exception):
+    """El PDF no permitió obtener número de factura y RUC, o la factura ya fue procesada."""
+
+
+# ==========================================================
+# 1. ALMACENAMIENTO POR CONTENIDO Y CACHÉ DE EXTRACCIÓN
+# ==========================================================
+
+def calcular_sha256(archivo):
+    """SHA-256 del archivo leído por bloques (no carga el PDF entero en memoria)."""
+    digest = hashlib.sha256()
+    archivo.seek(0)
+    for bloque in archivo.chunks():
+        digest.update(bloque)
+    archivo.seek(0)
+    return digest.hexdigest()
+
+
+def ruta_por_contenido(hash_sha256):
+    """facturas/originales/sha256/ab/abcdef....pdf"""
+    return f'{DIRECTORIO_CONTENIDO}/{hash_sha256[:2]}/{hash_sha256}.pdf'
+
+
+def guardar_por_contenido(archivo, hash_sha256):
+    """Guarda el PDF en su ruta por contenido; si ya existe no escribe nada."""
+    ruta = ruta_por_contenido(hash_sha256)
+    if default_storage.exists(ruta):
+        return ruta
+    return default_storage.save(ruta, archivo)
+
+
+def extraccion_en_cache(hash_sha256):
+    """Datos extraídos previamente para este contenido, o None."""
+    if not hash_sha256:
+        return None
+    datos = (
+        ExtraccionFacturaPdf.objects.filter(hash_sha256=hash_sha256)
+        .values_list('datos_extraidos', flat=True)
+        .first()
+    )
+    if datos is not None:
+        ExtraccionFacturaPdf.objects.filter(hash_sha256=hash_sha256).update(aciertos=F('aciertos') + 1)
+    return datos
+
+
+def guardar_extraccion(hash_sha256, ruta, datos_extraidos):
+    """Cachea solo extracciones exitosas: un fallo puede deberse al parser y no al PDF."""
+    if not hash_sha256 or datos_extraidos.get('extraction_status') != 'OK':
+        return
+    try:
+        with transaction.atomic():
+            ExtraccionFacturaPdf.objects.create(
+                hash_sha256=hash_sha256,
+                archivo=ruta,
+                numero_factura=datos_extraidos.get('numero_factura', 'N/A'),
+                ruc_proveedor=datos_extraidos.get('ruc_proveedor', 'N/A'),
+                datos_extraidos=datos_extraidos,
+            )
+    except IntegrityError:
+        # Otro worker cacheó el mismo contenido al mismo tiempo
+        pass
+
+
+# ==========================================================
+# 2. ENCOLADO (LADO DE LA VISTA)
+# ==========================================================
+
+def encolar_factura(archivo_pdf, usuario):
+    """
+    Guarda el PDF (una sola vez por contenido) y crea el trabajo de extracción.
+    Si el mismo contenido ya fue extraído, el trabajo se resuelve en el acto
+    desde la caché, sin pasar por el worker ni parsear el PDF.
+    """
+    hash_sha256 = calcular_sha256(archivo_pdf)
+    ruta = guardar_por_contenido(archivo_pdf, hash_sha256)
+    en_cache = ExtraccionFacturaPdf.objects.filter(hash_sha256=hash_sha256).exists()
+
+    trabajo = TrabajoFactura.objects.create(
+        archivo=ruta,
+        nombre_original=archivo_pdf.name[:255],
+        hash_sha256=hash_sha256,
+        usuario=usuario,
+        # Creado ya 'procesando' para que ningún worker lo tome
+        estado='procesando' if en_cache else 'pendiente',
+        fecha_inicio=timezone.now() if en_cache else None,
+        intentos=1 if en_cache else 0,
+    )
+
+    if en_cache:
+        procesar_trabajo(trabajo)
+    return trabajo
+
+
+# ==========================================================
+# 3. EXTRACCIÓN Y REGISTRO DE LA FACTURA
+# ==========================================================
+
+def registrar_factura_extraida(datos_extraidos, nombre_pdf, usuario):
+    """
+    Busca o crea el Proveedor y la Factura a partir de los datos extraídos.
+    Retorna (factura, proveedor_creado). Lanza ExtraccionFallida si faltan datos
+    o si la factura ya fue procesada.
+    """
+    if datos_extraidos.get('extraction_status') == 'FALLO':
+        raise ExtraccionFallida('No se pudieron extraer datos del PDF. Verifica que sea una factura válida.')
+
+    numero_factura = datos_extraidos.get('numero_factura')
+    ruc_proveedor = datos_extraidos.get('ruc_proveedor')
+
+    if numero_factura == 'N/A' or ruc_proveedor == 'N/A':
+        raise ExtraccionFallida('No se encontró el número de factura o RUC del proveedor. Verifica el PDF.')
+
+    with transaction.atomic():
+        proveedor, proveedor_creado = Proveedor.objects.get_or_create(
+            ruc=ruc_proveedor,
+            defaults={
+                'nombre': f'Proveedor {ruc_proveedor}',
+                'activo': True
+            }
+        )
+
+        factura, creada = Factura.objects.select_for_update().get_or_create(
+            numero_factura=numero_factura,
+            defaults={
+                'proveedor': proveedor,
+                'ruc_proveedor': ruc_proveedor,
+                'fecha_emision': timezone.now().date(),
+                'monto_total': Decimal('0'),
+                'pdf_original': nombre_pdf,
+                'usuario': usuario,
+                'estado': 'pendiente'
+            }
+        )
+
+        if not creada:
+            if factura.estado == 'procesada':
+                raise ExtraccionFallida(f'La factura {numero_factura} ya fue procesada.')
+
+            factura.proveedor = proveedor
+            factura.pdf_original = nombre_pdf
+            factura.save(update_fields=['proveedor', 'pdf_original'])
+
+    return factura, proveedor_creado
+
+
+def procesar_trabajo(trabajo):
+    """Ejecuta la extracción de un trabajo ya tomado ('procesando') y guarda el resultado."""
+    try:
+        datos_extraidos = extraccion_en_cache(trabajo.hash_sha256)
+        if datos_extraidos is None:
+            with trabajo.archivo.open('rb') as archivo:
+                datos_extraidos = extraer_datos_pdf(archivo)
+            guardar_extraccion(trabajo.hash_sha256, trabajo.archivo.name, datos_extraidos)
+
+        trabajo.datos_extraidos = datos_extraidos
+        factura, proveedor_creado = registrar_factura_extraida(
+            datos_extraidos, trabajo.archivo.name, trabajo.usuario
+        )
+    except ExtraccionFallida as e:
+        trabajo.estado = 'error'
+        trabajo.mensaje = str(e)
+    except Exception as e:
+        logger.exception('Error procesando el trabajo de factura %s', trabajo.id)
+        trabajo.estado = 'error'
+        trabajo.mensaje = f'Error: {str(e)[:200]}'
+    else:
+        trabajo.estado = 'extraida'
+        trabajo.factura = factura
+        trabajo.proveedor_creado = proveedor_creado
+        trabajo.mensaje = ''
+
+    trabajo.fecha_fin = timezone.now()
+    trabajo.save(update_fields=['estado', 'mensaje', 'datos_extraidos', 'factura', 'proveedor_creado', 'fecha_fin'])
+    return trabajo
+
+
+# ==========================================================
+# 4. WORKER
+# ==========================================================
+
+def tomar_siguiente_trabajo():
+    """
+    Reserva el trabajo pendiente más antiguo. El UPDATE condicionado a
+    estado='pendiente' garantiza que dos workers nunca tomen el mismo trabajo
+    (funciona igual en SQLite y PostgreSQL, sin SELECT ... FOR UPDATE SKIP LOCKED).
+    """
+    while True:
+        trabajo_id = (
+            TrabajoFactura.objects.filter(estado='pendiente')
+            .order_by('fecha_creacion', 'id')
+            .values_list('id', flat=True)
+            .first()
+        )
+        if trabajo_id is None:
+            return None
+
+        tomado = TrabajoFactura.objects.filter(id=trabajo_id, estado='pendiente').update(
+            estado='procesando',
+            fecha_inicio=timezone.now(),
+            intentos=F('intentos') + 1,
+        )
+        if tomado:
+            return TrabajoFactura.objects.select_related('usuario').get(id=trabajo_id)
+
+
+def liberar_trabajos_colgados(minutos=MINUTOS_TRABAJO_COLGADO):
+    """Reencola los trabajos abandonados; los que agotaron MAX_INTENTOS quedan en error."""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    colgados = TrabajoFactura.objects.filter(estado='procesando', fecha_inicio__lt=limite)
+
+    agotados = colgados.filter(intentos__gte=MAX_INTENTOS).update(
+        estado='error',
+        mensaje='La extracción se interrumpió demasiadas veces.',
+        fecha_fin=timezone.now(),
+    )
+    reencolados = colgados.filter(intentos__lt=MAX_INTENTOS).update(estado='pendiente')
+    return reencolados, agotados
+
+
+def ejecutar_worker(intervalo=2.0, una_vez=False, max_trabajos=None, salida=None):
+    """
+    Bucle del worker: procesa trabajos mientras haya y duerme `intervalo`
+    segundos cuando la cola está vacía. Con una_vez=True vacía la cola y sale.
+    Retorna la cantidad de trabajos procesados.
+    """
+    procesados = 0
+    liberar_trabajos_colgados()
+
+    while max_trabajos is None or procesados < max_trabajos:
+        trabajo = tomar_siguiente_trabajo()
+        if trabajo is None:
+            if una_vez:
+                break
+            time.sleep(intervalo)
+            liberar_trabajos_colgados()
+            continue
+
+        procesar_trabajo(trabajo)
+        procesados += 1
+        if salida:
+            salida(f'Trabajo {trabajo.id} ({trabajo.nombre_original}): {trabajo.estado} {trabajo.mensaje}'.rstrip())
+
+    return procesados
@@ -0,0 +1,59 @@
+from django.apps import apps
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import models
+
+from compras.ingesta import DIRECTORIO_CONTENIDO, calcular_sha256, guardar_por_contenido
+from compras.models import Factura, TrabajoFactura
+
+
+class Command(BaseCommand):
+    help = ('Mueve los PDFs de facturas ya cargados al almacenamiento por contenido (SHA-256) '
+            'y apunta las facturas (pdf_original y pdf_registro) y los trabajos a la copia única.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--eliminar', action='store_true',
+                            help='Borra los archivos originales que quedan sin referencias.')
+
+    def handle(self, *args, **options):
+        por_nombre = {}  # nombre anterior -> ruta por contenido
+        repuntados = 0
+
+        for modelo, campo in ((Factura, 'pdf_original'), (Factura, 'pdf_registro'), (TrabajoFactura, 'archivo')):
+            registros = modelo.objects.exclude(**{f'{campo}__startswith': DIRECTORIO_CONTENIDO}).exclude(**{campo: ''})
+            for registro in registros.iterator():
+                archivo = getattr(registro, campo)
+                nombre = archivo.name
+
+                if nombre not in por_nombre:
+                    if not default_storage.exists(nombre):
+                        self.stdout.write(self.style.WARNING(f'No existe en disco: {nombre}'))
+                        continue
+                    with default_storage.open(nombre, 'rb') as f:
+                        hash_sha256 = calcular_sha256(f)
+                        por_nombre[nombre] = guardar_por_contenido(f, hash_sha256)
+
+                modelo.objects.filter(pk=registro.pk).update(**{campo: por_nombre[nombre]})
+                repuntados += 1
+
+        unicos = len(set(por_nombre.values()))
+        self.stdout.write(f'Registros actualizados: {repuntados}. Archivos: {len(por_nombre)} -> {unicos} únicos.')
+
+        if options['eliminar']:
+            eliminados = 0
+            for nombre in por_nombre:
+                if _referenciado(nombre):
+                    self.stdout.write(self.style.WARNING(f'Se conserva (todavía referenciado): {nombre}'))
+                    continue
+                default_storage.delete(nombre)
+                eliminados += 1
+            self.stdout.write(self.style.SUCCESS(f'Archivos originales eliminados: {eliminados}'))
+
+
+def _referenciado(nombre):
+    """True si algún FileField de cualquier modelo sigue apuntando a `nombre`."""
+    for modelo in apps.get_models():
+        for campo in modelo._meta.get_fields():
+            if isinstance(campo, models.FileField) and modelo._default_manager.filter(**{campo.name: nombre}).exists():
+                return True
+    return False
@@ -0,0 +1,74 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from compras.importacion import TAMANO_BLOQUE_IMPORTACION, ArchivoInvalido, importar_inventario
+
+# Filas rechazadas que se listan en pantalla (el resto va a --errores)
+MAX_RECHAZADOS_EN_PANTALLA = 20
+
+
+class Command(BaseCommand):
+    help = ('Importa o actualiza el maestro de Inventario desde un XLSX o CSV (reemplaza a excel.py). '
+            'Se puede repetir: actualiza los productos existentes y registra un AJUSTE por cada '
+            'cambio de Cantidad.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta del .xlsx o .csv (primera fila = encabezados).')
+        parser.add_argument('--hoja', help='Hoja del Excel (por defecto, la activa).')
+        parser.add_argument('--separador', default=',', help='Separador del CSV (por defecto ",").')
+        parser.add_argument('--bloque', type=int, default=TAMANO_BLOQUE_IMPORTACION,
+                            help=f'Filas por bloque y transacción (por defecto {TAMANO_BLOQUE_IMPORTACION}).')
+        parser.add_argument('--referencia',
+                            help='Referencia de los movimientos AJUSTE (por defecto "IMPORT <archivo>").')
+        parser.add_argument('--simular', action='store_true',
+                            help='Valida y cuenta los cambios sin guardar nada.')
+        parser.add_argument('--errores', help='Ruta de un CSV con todas las filas rechazadas.')
+
+    def _progreso(self, resumen):
+        self.stdout.write(
+            f"Bloque {resumen['bloques']}: {resumen['filas']} filas leídas "
+            f"({resumen['filas_por_segundo']:,.0f} filas/s)"
+        )
+
+    def handle(self, *args, **options):
+        if options['bloque'] < 1:
+            raise CommandError('--bloque debe ser mayor que cero.')
+
+        try:
+            resumen = importar_inventario(
+                options['archivo'],
+                tamano=options['bloque'],
+                hoja=options['hoja'],
+                separador=options['separador'],
+                simular=options['simular'],
+                referencia=options['referencia'],
+                progreso=self._progreso,
+            )
+        except FileNotFoundError:
+            raise CommandError(f"El archivo '{options['archivo']}' no se encontró.")
+        except ArchivoInvalido as e:
+            raise CommandError(str(e))
+
+        rechazados = resumen['rechazados']
+        for fila, codigo, error in rechazados[:MAX_RECHAZADOS_EN_PANTALLA]:
+            self.stdout.write(self.style.WARNING(f'  Fila {fila} ({codigo or "sin código"}): {error}'))
+        if len(rechazados) > MAX_RECHAZADOS_EN_PANTALLA:
+            self.stdout.write(self.style.WARNING(
+                f'  ... y {len(rechazados) - MAX_RECHAZADOS_EN_PANTALLA} filas rechazadas más.'
+            ))
+
+        if options['errores'] and rechazados:
+            with open(options['errores'], 'w', newline='', encoding='utf-8') as archivo:
+                writer = csv.writer(archivo)
+                writer.writerow(['fila', 'codigo_producto', 'error'])
+                writer.writerows(rechazados)
+            self.stdout.write(f"Filas rechazadas guardadas en {options['errores']}")
+
+        prefijo = 'SIMULACIÓN (sin cambios guardados). ' if resumen['simulado'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefijo}{resumen['filas']} filas en {resumen['segundos']:.2f} s "
+            f"({resumen['filas_por_segundo']:,.0f} filas/s): {resumen['creados']} creados, "
+            f"{resumen['actualizados']} actualizados, {resumen['ajustes']} ajustes de stock, "
+            f"{len(rechazados)} rechazadas."
+        ))
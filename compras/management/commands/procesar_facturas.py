@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from compras.ingesta import ejecutar_worker
+
+
+class Command(BaseCommand):
+    help = 'Worker de extracción de facturas: procesa la cola TrabajoFactura (dejar corriendo junto al servidor).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--intervalo', type=float, default=2.0,
+                            help='Segundos de espera cuando la cola está vacía (default: 2).')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesa los trabajos pendientes y termina.')
+        parser.add_argument('--max-trabajos', type=int, default=None,
+                            help='Termina después de procesar esta cantidad de trabajos.')
+
+    def handle(self, *args, **options):
+        self.stdout.write('Worker de facturas iniciado. Ctrl+C para detener.')
+        try:
+            procesados = ejecutar_worker(
+                intervalo=options['intervalo'],
+                una_vez=options['una_vez'],
+                max_trabajos=options['max_trabajos'],
+                salida=self.stdout.write,
+            )
+        except KeyboardInterrupt:
+            self.stdout.write('Worker detenido.')
+            return
+        self.stdout.write(self.style.SUCCESS(f'Trabajos procesados: {procesados}'))
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+
+from compras.reposicion import (
+    recalcular_estados, resumen_estados, stream_csv_reposicion, sugerencias_reposicion, totales_reposicion,
+)
+
+
+class Command(BaseCommand):
+    help = ('Informa los productos en stock crítico o bajo y escribe el reporte de reposición '
+            '(MaximoAdmisible - Cantidad) en CSV. Pensado para correr programado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida',
+                            help='Ruta del CSV con las sugerencias (por defecto solo se informa el resumen).')
+        parser.add_argument('--ubicacion',
+                            help='Limita el reporte a una ubicación.')
+        parser.add_argument('--recalcular', action='store_true',
+                            help='Recalcula antes el estado de todo el catálogo (datos cargados por fuera de la aplicación).')
+
+    def handle(self, *args, **options):
+        if options['recalcular']:
+            actualizados = recalcular_estados()
+            self.stdout.write(f'Estado recalculado en {actualizados} productos.')
+
+        estados = resumen_estados()
+        sugerencias = sugerencias_reposicion(ubicacion=options['ubicacion'])
+        totales = totales_reposicion(sugerencias)
+
+        self.stdout.write(
+            f"Crítico: {estados['critico']} | Bajo: {estados['bajo']} | Óptimo: {estados['optimo']}"
+        )
+        self.stdout.write(
+            f"A reponer: {totales['productos']} productos, {totales['unidades_total'] or 0:.0f} unidades, "
+            f"costo estimado ₲ {totales['costo_total'] or 0:,.0f}"
+        )
+
+        if options['salida']:
+            with open(options['salida'], 'w', newline='', encoding='utf-8') as archivo:
+                for linea in stream_csv_reposicion(sugerencias):
+                    archivo.write(linea)
+            self.stdout.write(self.style.SUCCESS(f'Reporte guardado en {options["salida"]}'))
+
+        if totales['criticos']:
+            self.stdout.write(self.style.WARNING(f"{totales['criticos']} producto(s) en stock crítico."))
@@ -0,0 +1,56 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from compras.valoracion import reconstruir_valoracion, tomar_snapshot
+
+
+class Command(BaseCommand):
+    help = ('Guarda la valoración del inventario al cierre de un día (por defecto, ayer y hoy). '
+            'Con --desde/--hasta completa un rango de fechas pasadas. '
+            'Se programa una vez por día (start_server2.vbs lo registra en el Programador de tareas).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fecha', help='Día a cerrar (AAAA-MM-DD).')
+        parser.add_argument('--desde', help='Primer día del rango a completar (AAAA-MM-DD).')
+        parser.add_argument('--hasta', help='Último día del rango (por defecto hoy).')
+        parser.add_argument('--reconstruir', action='store_true',
+                            help='Recalcula antes los acumulados por ubicación desde todos los movimientos.')
+
+    def _fecha(self, texto, opcion):
+        try:
+            fecha = parse_date(texto)
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            raise CommandError(f'{opcion}: fecha inválida {texto!r} (se espera AAAA-MM-DD).')
+        return fecha
+
+    def handle(self, *args, **options):
+        hoy = timezone.localdate()
+
+        if options['reconstruir']:
+            ubicaciones = reconstruir_valoracion()
+            self.stdout.write(f'Acumulados reconstruidos: {ubicaciones} ubicaciones.')
+
+        if options['fecha']:
+            fechas = [self._fecha(options['fecha'], '--fecha')]
+        elif options['desde']:
+            desde = self._fecha(options['desde'], '--desde')
+            hasta = self._fecha(options['hasta'], '--hasta') if options['hasta'] else hoy
+            if desde > hasta:
+                raise CommandError('--desde es posterior a --hasta.')
+            fechas = [desde + timedelta(days=i) for i in range((hasta - desde).days + 1)]
+        else:
+            fechas = [hoy - timedelta(days=1), hoy]
+
+        # Del más reciente al más viejo: cada día parte del snapshot del día siguiente
+        for fecha in sorted(fechas, reverse=True):
+            if fecha > hoy:
+                continue
+            ubicaciones = tomar_snapshot(fecha)
+            self.stdout.write(f'{fecha}: {ubicaciones} ubicaciones.')
+
+        self.stdout.write(self.style.SUCCESS(f'Snapshots guardados: {len([f for f in fechas if f <= hoy])}'))
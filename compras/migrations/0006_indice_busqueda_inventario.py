@@ -0,0 +1,24 @@
+# Índice de búsqueda de Inventario (FTS5 trigram en SQLite, pg_trgm + tsvector en PostgreSQL)
+
+from django.db import migrations
+
+
+def crear_indice(apps, schema_editor):
+    from compras.busqueda import instalar_indice
+    instalar_indice(schema_editor.connection)
+
+
+def eliminar_indice(apps, schema_editor):
+    from compras.busqueda import desinstalar_indice
+    desinstalar_indice(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0005_alter_factura_pdf_registro'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
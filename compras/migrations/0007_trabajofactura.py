@@ -0,0 +1,41 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0006_indice_busqueda_inventario'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrabajoFactura',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('archivo', models.FileField(upload_to='facturas/originales/', verbose_name='PDF Cargado')),
+                ('nombre_original', models.CharField(max_length=255, verbose_name='Nombre del Archivo')),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente de Extracción'), ('procesando', 'Procesando'), ('extraida', 'Extraída'), ('error', 'Error')], default='pendiente', max_length=20, verbose_name='Estado')),
+                ('datos_extraidos', models.JSONField(blank=True, null=True, verbose_name='Datos Extraídos')),
+                ('proveedor_creado', models.BooleanField(default=False, verbose_name='Proveedor Creado Automáticamente')),
+                ('mensaje', models.TextField(blank=True, default='', verbose_name='Mensaje / Error')),
+                ('intentos', models.PositiveSmallIntegerField(default=0, verbose_name='Intentos')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Carga')),
+                ('fecha_inicio', models.DateTimeField(blank=True, null=True, verbose_name='Inicio de Extracción')),
+                ('fecha_fin', models.DateTimeField(blank=True, null=True, verbose_name='Fin de Extracción')),
+                ('factura', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='trabajos', to='compras.factura', verbose_name='Factura Resultante')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='trabajos_factura', to=settings.AUTH_USER_MODEL, verbose_name='Usuario que Cargó')),
+            ],
+            options={
+                'verbose_name': 'Trabajo de Extracción de Factura',
+                'verbose_name_plural': 'Trabajos de Extracción de Facturas',
+                'db_table': 'TrabajoFactura',
+                'ordering': ['-fecha_creacion'],
+                'indexes': [models.Index(fields=['estado', 'fecha_creacion'], name='TrabajoFact_estado_953bd6_idx')],
+            },
+        ),
+    ]
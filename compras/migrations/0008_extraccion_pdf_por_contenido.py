@@ -0,0 +1,35 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0007_trabajofactura'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExtraccionFacturaPdf',
+            fields=[
+                ('hash_sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('archivo', models.FileField(upload_to='facturas/originales/', verbose_name='PDF (Almacenamiento por Contenido)')),
+                ('numero_factura', models.CharField(max_length=50, verbose_name='Número de Factura')),
+                ('ruc_proveedor', models.CharField(max_length=20, verbose_name='RUC del Proveedor')),
+                ('datos_extraidos', models.JSONField(verbose_name='Datos Extraídos')),
+                ('aciertos', models.PositiveIntegerField(default=0, verbose_name='Cargas Repetidas')),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True, verbose_name='Fecha de Extracción')),
+            ],
+            options={
+                'verbose_name': 'Extracción de PDF de Factura',
+                'verbose_name_plural': 'Extracciones de PDF de Facturas',
+                'db_table': 'ExtraccionFacturaPdf',
+            },
+        ),
+        migrations.AddField(
+            model_name='trabajofactura',
+            name='hash_sha256',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=64, verbose_name='SHA-256 del PDF'),
+        ),
+    ]
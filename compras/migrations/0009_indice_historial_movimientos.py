@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0008_extraccion_pdf_por_contenido'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['producto', 'fecha_movimiento'], name='StockMoveme_CodigoP_ff0959_idx'),
+        ),
+    ]
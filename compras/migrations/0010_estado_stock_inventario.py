@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+def calcular_estados(apps, schema_editor):
+    """Estado inicial de todo el catálogo en un solo UPDATE."""
+    from compras.reposicion import recalcular_estados
+
+    recalcular_estados(apps.get_model('compras', 'Inventario'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0009_indice_historial_movimientos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventario',
+            name='EstadoStock',
+            field=models.CharField(choices=[('critico', 'Crítico'), ('bajo', 'Bajo'), ('optimo', 'Óptimo')], db_column='EstadoStock', default='critico', editable=False, max_length=10, verbose_name='Estado de Stock'),
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['EstadoStock', 'CodigoProducto'], name='Inventario_EstadoS_d969b5_idx'),
+        ),
+        migrations.RunPython(calcular_estados, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:33
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def construir_valoracion(apps, schema_editor):
+    """Acumulados iniciales a partir del catálogo y del libro de movimientos existente."""
+    from compras.valoracion import reconstruir_valoracion
+
+    reconstruir_valoracion(
+        apps.get_model('compras', 'Inventario'),
+        apps.get_model('compras', 'StockMovement'),
+        apps.get_model('compras', 'ValoracionUbicacion'),
+        modelo_ajuste=None,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0010_estado_stock_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotValoracion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(verbose_name='Fecha de Cierre')),
+                ('ubicacion', models.CharField(blank=True, max_length=100, verbose_name='Ubicación')),
+                ('cantidad', models.FloatField(default=0.0, verbose_name='Unidades')),
+                ('valor_gs', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Valor (GS)')),
+                ('tasa_cambio', models.DecimalField(blank=True, decimal_places=2, max_digits=8, null=True, verbose_name='Tasa de Cambio (GS/USD)')),
+                ('valor_usd', models.DecimalField(blank=True, decimal_places=2, max_digits=16, null=True, verbose_name='Valor (USD)')),
+                ('fecha_creacion', models.DateTimeField(auto_now=True, verbose_name='Fecha de Cálculo')),
+            ],
+            options={
+                'verbose_name': 'Snapshot de Valoración',
+                'verbose_name_plural': 'Snapshots de Valoración',
+                'db_table': 'SnapshotValoracion',
+                'ordering': ['-fecha', 'ubicacion'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ValoracionUbicacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ubicacion', models.CharField(blank=True, max_length=100, unique=True, verbose_name='Ubicación')),
+                ('cantidad', models.FloatField(default=0.0, verbose_name='Unidades')),
+                ('valor_gs', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Valor (GS)')),
+                ('movimientos', models.PositiveIntegerField(default=0, verbose_name='Movimientos Aplicados')),
+                ('fecha_actualizacion', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Última Actualización')),
+            ],
+            options={
+                'verbose_name': 'Valoración por Ubicación',
+                'verbose_name_plural': 'Valoraciones por Ubicación',
+                'db_table': 'ValoracionUbicacion',
+                'ordering': ['ubicacion'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='stockmovement',
+            index=models.Index(fields=['fecha_movimiento'], name='StockMoveme_fecha_m_32c574_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='snapshotvaloracion',
+            unique_together={('fecha', 'ubicacion')},
+        ),
+        migrations.RunPython(construir_valoracion, migrations.RunPython.noop),
+    ]
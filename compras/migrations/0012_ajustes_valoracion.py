@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:09
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0011_valoracion_inventario'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AjusteValoracion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Fecha')),
+                ('ubicacion', models.CharField(blank=True, max_length=100, verbose_name='Ubicación')),
+                ('cantidad', models.FloatField(default=0.0, verbose_name='Unidades')),
+                ('valor_gs', models.DecimalField(decimal_places=2, default=0, max_digits=18, verbose_name='Valor (GS)')),
+                ('motivo', models.CharField(choices=[('apertura', 'Alta/Baja de Producto'), ('traslado', 'Traslado de Ubicación'), ('reconstruccion', 'Reconstrucción de Acumulados')], max_length=20, verbose_name='Motivo')),
+            ],
+            options={
+                'verbose_name': 'Ajuste de Valoración',
+                'verbose_name_plural': 'Ajustes de Valoración',
+                'db_table': 'AjusteValoracion',
+                'ordering': ['-fecha'],
+            },
+        ),
+    ]
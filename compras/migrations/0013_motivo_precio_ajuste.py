@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0012_ajustes_valoracion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ajustevaloracion',
+            name='motivo',
+            field=models.CharField(choices=[('apertura', 'Alta/Baja de Producto'), ('traslado', 'Traslado de Ubicación'), ('precio', 'Cambio de Precio'), ('reconstruccion', 'Reconstrucción de Acumulados')], max_length=20, verbose_name='Motivo'),
+        ),
+    ]
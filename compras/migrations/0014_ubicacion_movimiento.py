@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 08:24
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def completar_ubicacion(apps, schema_editor):
+    """Los movimientos existentes quedan con la ubicación actual de su producto (la mejor conocida)."""
+    Inventario = apps.get_model('compras', 'Inventario')
+    StockMovement = apps.get_model('compras', 'StockMovement')
+    ubicacion = Inventario.objects.filter(CodigoProducto=OuterRef('producto_id')).values('Ubicacion')[:1]
+    StockMovement.objects.update(ubicacion=Coalesce(Subquery(ubicacion), Value('')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('compras', '0013_motivo_precio_ajuste'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stockmovement',
+            name='ubicacion',
+            field=models.CharField(blank=True, max_length=100, null=True, verbose_name='Ubicación al Moverse'),
+        ),
+        migrations.RunPython(completar_ubicacion, migrations.RunPython.noop),
+    ]
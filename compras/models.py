@@ -10,6 +10,28 @@ from decimal import Decimal
 # ==========================================================
 # 1. MODELO PRINCIPAL: INVENTARIO (MAESTRO DE STOCK)
 # ==========================================================
+
+# Por encima del mínimo y hasta mínimo + este margen el stock se considera "bajo"
+MARGEN_STOCK_BAJO = 10
+
+ESTADOS_STOCK = [
+    ('critico', 'Crítico'),
+    ('bajo', 'Bajo'),
+    ('optimo', 'Óptimo'),
+]
+
+
+def calcular_estado_stock(cantidad, minimo):
+    """Estado del stock con las mismas reglas que usaba el filtro del depósito."""
+    cantidad = cantidad or 0
+    minimo = minimo or 0
+    if cantidad <= minimo:
+        return 'critico'
+    if cantidad <= minimo + MARGEN_STOCK_BAJO:
+        return 'bajo'
+    return 'optimo'
+
+
 class Inventario(models.Model):
     """
     Representa el inventario de materiales y productos en el depósito.
@@ -32,6 +54,15 @@ class Inventario(models.Model):
     Ubicacion = models.CharField(max_length=100, db_column='Ubicacion', verbose_name='Ubicación', null=True, blank=True)
     MinimoAdmisible = models.FloatField(default=0.0, db_column='MinimoAdmisible', verbose_name='Stock Mínimo')
     MaximoAdmisible = models.FloatField(default=0.0, db_column='MaximoAdmisible', verbose_name='Stock Máximo')
+    # Derivado de Cantidad y MinimoAdmisible (recalcular_totales); indexado para filtrar alertas
+    EstadoStock = models.CharField(
+        max_length=10,
+        choices=ESTADOS_STOCK,
+        default='critico',
+        editable=False,
+        db_column='EstadoStock',
+        verbose_name='Estado de Stock'
+    )
     
     # --- CAMPOS DE PRECIO ---
     PrecioGS = models.FloatField(default=0.0, db_column='PrecioGS', verbose_name='Precio Unitario (G$)')
@@ -50,16 +81,42 @@ class Inventario(models.Model):
         db_table = 'Inventario'
         verbose_name = 'Producto de Inventario'
         verbose_name_plural = 'Productos de Inventario'
+        indexes = [
+            # Filtro por estado del depósito y reporte de reposición (ambos ordenan por SKU)
+            models.Index(fields=['EstadoStock', 'CodigoProducto']),
+        ]
     
     def __str__(self):
         return f"{self.CodigoProducto} - {self.Producto}"
 
-    def save(self, *args, **kwargs):
-        """Asegura que la cantidad no sea negativa y recalcula PrecioTotalGS."""
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Valores al leer: la valoración traslada o revaloriza el producto si
+        # cambian su Ubicacion o su PrecioGS (compras/valoracion.py)
+        if {'Ubicacion', 'Cantidad', 'PrecioGS'} <= instancia.__dict__.keys():
+            instancia._guardar_originales()
+        return instancia
+
+    def _guardar_originales(self):
+        self._ubicacion_original = self.Ubicacion
+        self._cantidad_original = self.Cantidad
+        self._precio_original = self.PrecioGS
+
+    def recalcular_totales(self):
+        """
+        Asegura que la cantidad no sea negativa y recalcula PrecioTotalGS y EstadoStock.
+        Se llama desde save() y antes de cualquier bulk_update (que no pasa por save()).
+        """
         if self.Cantidad < 0:
             self.Cantidad = 0.0
         
         self.PrecioTotalGS = self.Cantidad * self.PrecioGS 
+        self.EstadoStock = calcular_estado_stock(self.Cantidad, self.MinimoAdmisible)
+
+    def save(self, *args, **kwargs):
+        """Asegura que la cantidad no sea negativa y recalcula PrecioTotalGS y EstadoStock."""
+        self.recalcular_totales()
         
         super().save(*args, **kwargs)
 
@@ -136,17 +193,35 @@ class StockMovement(models.Model):
         verbose_name="Referencia/Factura"
     )
 
+    # Ubicación del producto al momento del movimiento: la valoración a una
+    # fecha pasada agrupa por esta y no por la ubicación actual (si es NULL,
+    # p. ej. un bulk_create que no la completa, se usa la actual)
+    ubicacion = models.CharField(
+        max_length=100,
+        blank=True,
+        null=True,
+        verbose_name='Ubicación al Moverse'
+    )
+
     class Meta:
         db_table = 'StockMovement'
         verbose_name = 'Movimiento de Stock'
         verbose_name_plural = 'Movimientos de Stock'
         ordering = ['-fecha_movimiento']
+        indexes = [
+            # Historial y agregados por producto (compras/historial.py)
+            models.Index(fields=['producto', 'fecha_movimiento']),
+            # Movimientos posteriores a una fecha (snapshots de valoración)
+            models.Index(fields=['fecha_movimiento']),
+        ]
 
     def __str__(self):
         return f"{self.tipo_movimiento} de {self.cantidad_movida} de {self.producto.CodigoProducto}"
 
     def save(self, *args, **kwargs):
-        """Solo guarda el registro histórico del movimiento."""
+        """Guarda el registro histórico del movimiento con la ubicación actual del producto."""
+        if self.ubicacion is None:
+            self.ubicacion = self.producto.Ubicacion or ''
         super().save(*args, **kwargs)
 
 
@@ -365,9 +440,335 @@ class FacturaProducto(models.Model):
     def __str__(self):
         return f"{self.factura.numero_factura} - {self.producto.Producto}"
 
+    def calcular_subtotal(self):
+        """Calcula el subtotal (también se usa antes de bulk_create, que no pasa por save())."""
+        self.subtotal = Decimal(self.cantidad) * self.precio_unitario
+
     def save(self, *args, **kwargs):
         """Calcula el subtotal automáticamente."""
-        self.subtotal = Decimal(self.cantidad) * self.precio_unitario
+        self.calcular_subtotal()
         super().save(*args, **kwargs)
-# tu_app/models.py - AGREGAR ESTE MODELO AL FINAL
 
+
+# ==========================================================
+# 5. COLA DE EXTRACCIÓN DE FACTURAS (SEGUNDO PLANO)
+# ==========================================================
+class TrabajoFactura(models.Model):
+    """
+    Trabajo de extracción de un PDF de factura, procesado por el worker
+    (manage.py procesar_facturas). La Factura se crea recién cuando la
+    extracción obtiene el número de factura y el RUC del proveedor.
+    """
+    ESTADO_CHOICES = [
+        ('pendiente', 'Pendiente de Extracción'),
+        ('procesando', 'Procesando'),
+        ('extraida', 'Extraída'),
+        ('error', 'Error'),
+    ]
+
+    archivo = models.FileField(
+        upload_to='facturas/originales/',
+        verbose_name='PDF Cargado'
+    )
+
+    nombre_original = models.CharField(
+        max_length=255,
+        verbose_name='Nombre del Archivo'
+    )
+
+    hash_sha256 = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        db_index=True,
+        verbose_name='SHA-256 del PDF'
+    )
+
+    estado = models.CharField(
+        max_length=20,
+        choices=ESTADO_CHOICES,
+        default='pendiente',
+        verbose_name='Estado'
+    )
+
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        related_name='trabajos_factura',
+        verbose_name='Usuario que Cargó'
+    )
+
+    factura = models.ForeignKey(
+        Factura,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='trabajos',
+        verbose_name='Factura Resultante'
+    )
+
+    datos_extraidos = models.JSONField(
+        null=True,
+        blank=True,
+        verbose_name='Datos Extraídos'
+    )
+
+    proveedor_creado = models.BooleanField(
+        default=False,
+        verbose_name='Proveedor Creado Automáticamente'
+    )
+
+    mensaje = models.TextField(
+        blank=True,
+        default='',
+        verbose_name='Mensaje / Error'
+    )
+
+    intentos = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Intentos'
+    )
+
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Carga'
+    )
+
+    fecha_inicio = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Inicio de Extracción'
+    )
+
+    fecha_fin = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Fin de Extracción'
+    )
+
+    class Meta:
+        db_table = 'TrabajoFactura'
+        verbose_name = 'Trabajo de Extracción de Factura'
+        verbose_name_plural = 'Trabajos de Extracción de Facturas'
+        ordering = ['-fecha_creacion']
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def __str__(self):
+        return f"Trabajo {self.id} - {self.nombre_original} ({self.estado})"
+
+    @property
+    def terminado(self):
+        return self.estado in ('extraida', 'error')
+
+
+# ==========================================================
+# 6. CACHÉ DE EXTRACCIÓN POR CONTENIDO (SHA-256)
+# ==========================================================
+class ExtraccionFacturaPdf(models.Model):
+    """
+    Resultado de extraer_datos_pdf por contenido del PDF. El mismo archivo
+    (mismo SHA-256) se guarda una sola vez en disco y no se vuelve a parsear.
+    """
+    hash_sha256 = models.CharField(
+        max_length=64,
+        primary_key=True,
+        verbose_name='SHA-256'
+    )
+
+    archivo = models.FileField(
+        upload_to='facturas/originales/',
+        verbose_name='PDF (Almacenamiento por Contenido)'
+    )
+
+    numero_factura = models.CharField(
+        max_length=50,
+        verbose_name='Número de Factura'
+    )
+
+    ruc_proveedor = models.CharField(
+        max_length=20,
+        verbose_name='RUC del Proveedor'
+    )
+
+    datos_extraidos = models.JSONField(
+        verbose_name='Datos Extraídos'
+    )
+
+    aciertos = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Cargas Repetidas'
+    )
+
+    fecha_creacion = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Fecha de Extracción'
+    )
+
+    class Meta:
+        db_table = 'ExtraccionFacturaPdf'
+        verbose_name = 'Extracción de PDF de Factura'
+        verbose_name_plural = 'Extracciones de PDF de Facturas'
+
+    def __str__(self):
+        return f"{self.hash_sha256[:12]} - {self.numero_factura}"
+
+
+# ==========================================================
+# 7. VALORACIÓN DE INVENTARIO (ACUMULADOS Y SNAPSHOTS)
+# ==========================================================
+class ValoracionUbicacion(models.Model):
+    """
+    Acumulado vigente por ubicación: cantidad y valor (GS) del stock según el
+    costo registrado en cada StockMovement. Se actualiza de forma incremental
+    con cada movimiento (compras/valoracion.py); el total general es la suma
+    de las filas (una por ubicación).
+    """
+    ubicacion = models.CharField(
+        max_length=100,
+        unique=True,
+        blank=True,
+        verbose_name='Ubicación'
+    )
+
+    cantidad = models.FloatField(
+        default=0.0,
+        verbose_name='Unidades'
+    )
+
+    valor_gs = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valor (GS)'
+    )
+
+    movimientos = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Movimientos Aplicados'
+    )
+
+    fecha_actualizacion = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Última Actualización'
+    )
+
+    class Meta:
+        db_table = 'ValoracionUbicacion'
+        verbose_name = 'Valoración por Ubicación'
+        verbose_name_plural = 'Valoraciones por Ubicación'
+        ordering = ['ubicacion']
+
+    def __str__(self):
+        return f"{self.ubicacion or 'Sin ubicación'}: ₲ {self.valor_gs}"
+
+
+class SnapshotValoracion(models.Model):
+    """Valoración por ubicación al cierre de una fecha (para consultar fechas pasadas sin recorrer el historial)."""
+    fecha = models.DateField(
+        verbose_name='Fecha de Cierre'
+    )
+
+    ubicacion = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Ubicación'
+    )
+
+    cantidad = models.FloatField(
+        default=0.0,
+        verbose_name='Unidades'
+    )
+
+    valor_gs = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valor (GS)'
+    )
+
+    tasa_cambio = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Tasa de Cambio (GS/USD)'
+    )
+
+    valor_usd = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name='Valor (USD)'
+    )
+
+    fecha_creacion = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Fecha de Cálculo'
+    )
+
+    class Meta:
+        db_table = 'SnapshotValoracion'
+        verbose_name = 'Snapshot de Valoración'
+        verbose_name_plural = 'Snapshots de Valoración'
+        ordering = ['-fecha', 'ubicacion']
+        unique_together = ('fecha', 'ubicacion')
+
+    def __str__(self):
+        return f"{self.fecha} - {self.ubicacion or 'Sin ubicación'}: ₲ {self.valor_gs}"
+
+
+class AjusteValoracion(models.Model):
+    """
+    Cambio de los acumulados que no viene de un StockMovement (alta o baja de
+    un producto con stock de apertura, traslado de ubicación, cambio de precio
+    en una importación, realineación al reconstruir). Con su fecha, valoracion_al puede deshacerlo al consultar
+    fechas anteriores.
+    """
+    MOTIVO_CHOICES = [
+        ('apertura', 'Alta/Baja de Producto'),
+        ('traslado', 'Traslado de Ubicación'),
+        ('precio', 'Cambio de Precio'),
+        ('reconstruccion', 'Reconstrucción de Acumulados'),
+    ]
+
+    fecha = models.DateTimeField(
+        default=timezone.now,
+        db_index=True,
+        verbose_name='Fecha'
+    )
+
+    ubicacion = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name='Ubicación'
+    )
+
+    cantidad = models.FloatField(
+        default=0.0,
+        verbose_name='Unidades'
+    )
+
+    valor_gs = models.DecimalField(
+        max_digits=18,
+        decimal_places=2,
+        default=0,
+        verbose_name='Valor (GS)'
+    )
+
+    motivo = models.CharField(
+        max_length=20,
+        choices=MOTIVO_CHOICES,
+        verbose_name='Motivo'
+    )
+
+    class Meta:
+        db_table = 'AjusteValoracion'
+        verbose_name = 'Ajuste de Valoración'
+        verbose_name_plural = 'Ajustes de Valoración'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha:%Y-%m-%d %H:%M} - {self.ubicacion or 'Sin ubicación'}: ₲ {self.valor_gs}"
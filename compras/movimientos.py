@@ -0,0 +1,221 @@
+# compras/movimientos.py - MOVIMIENTOS DE STOCK EN LOTE
+
+"""
+Aplica muchas líneas de ingreso/egreso en una sola transacción:
+un SELECT ... FOR UPDATE ordenado para todos los SKUs, un bulk_update del
+Inventario y un bulk_create de StockMovement, con resultado por línea.
+"""
+
+import csv
+import io
+import math
+
+from django.db import transaction
+from django.utils import timezone
+
+from mi_proyecto.cache import invalidar_modelos
+
+from .models import Inventario, StockMovement
+from .busqueda import cache_autocompletado
+from .valoracion import ajustar_precios_productos, registrar_movimientos
+
+TIPOS_MOVIMIENTO = {
+    'ingreso': 'ENTRADA',
+    'egreso': 'SALIDA',
+}
+
+COLUMNAS_CSV = (
+    'codigo_producto', 'cantidad', 'observacion', 'precio_unitario_gs',
+    'precio_unitario_usd', 'tasa_cambio', 'costo_total_gs', 'referencia',
+)
+
+CAMPOS_ACTUALIZADOS = ['Cantidad', 'PrecioGS', 'PrecioUSD', 'PrecioTotalGS', 'FechaUltimoMovimiento', 'EstadoStock']
+
+
+class LoteInvalido(Exception):
+    """El lote completo no se puede procesar (formato o tipo de movimiento inválido)."""
+
+
+# ==========================================================
+# 1. LECTURA DE LÍNEAS (JSON O CSV)
+# ==========================================================
+
+def leer_lineas_csv(texto):
+    """Convierte un CSV con encabezado (ver COLUMNAS_CSV) en una lista de dicts."""
+    lector = csv.DictReader(io.StringIO(texto))
+    if not lector.fieldnames or 'codigo_producto' not in lector.fieldnames or 'cantidad' not in lector.fieldnames:
+        raise LoteInvalido("El CSV debe tener encabezado con al menos 'codigo_producto' y 'cantidad'.")
+    return [dict(fila) for fila in lector]
+
+
+def _a_float(valor, defecto=0.0):
+    """float(valor); vacío -> defecto. 'inf', 'nan' o 1e999 (JSON) son ValueError como cualquier texto."""
+    if valor is None or str(valor).strip() == '':
+        return defecto
+    numero = float(valor)
+    if not math.isfinite(numero):
+        raise ValueError(f'Número no finito: {valor!r}')
+    return numero
+
+
+def _normalizar_linea(numero, datos, is_ingreso):
+    """Valida una línea; retorna (linea_normalizada, None) o (None, mensaje_error)."""
+    if not isinstance(datos, dict):
+        return None, 'Formato de línea inválido.'
+
+    codigo = str(datos.get('codigo_producto') or '').strip().upper()
+    if not codigo:
+        return None, "El campo 'codigo_producto' es obligatorio."
+
+    try:
+        cantidad = _a_float(datos.get('cantidad'), None)
+    except (TypeError, ValueError):
+        return None, 'La cantidad ingresada no es un número válido.'
+    if cantidad is None or cantidad <= 0:
+        return None, 'La cantidad debe ser un número positivo.'
+
+    linea = {
+        'linea': numero,
+        'codigo_producto': codigo,
+        'cantidad': cantidad,
+        'observacion': str(datos.get('observacion') or '').strip(),
+        'tasa_cambio': None,
+        'precio_unitario_gs': 0.0,
+        'precio_unitario_usd': 0.0,
+        'costo_total_gs': None,
+        'referencia': None,
+    }
+
+    if is_ingreso:
+        try:
+            linea['tasa_cambio'] = _a_float(datos.get('tasa_cambio'), 1.0)
+            linea['precio_unitario_gs'] = _a_float(datos.get('precio_unitario_gs'))
+            linea['precio_unitario_usd'] = _a_float(datos.get('precio_unitario_usd'))
+            linea['costo_total_gs'] = _a_float(datos.get('costo_total_gs'), None)
+        except (TypeError, ValueError):
+            return None, 'Error en el formato de precios/tasa de cambio.'
+        linea['referencia'] = str(datos.get('referencia') or '').strip() or None
+
+    return linea, None
+
+
+# ==========================================================
+# 2. APLICACIÓN DEL LOTE
+# ==========================================================
+
+def aplicar_movimientos_lote(lineas, tipo_movimiento, todo_o_nada=False):
+    """
+    Aplica un lote de ingresos o egresos.
+
+    Las líneas inválidas (SKU inexistente, cantidad inválida, stock insuficiente)
+    se informan y se omiten; con todo_o_nada=True, cualquier error cancela el lote.
+
+    Retorna {'aplicadas': int, 'errores': int, 'confirmado': bool, 'resultados': [...]}
+    con un resultado por línea, en el mismo orden de entrada.
+    """
+    if tipo_movimiento not in TIPOS_MOVIMIENTO:
+        raise LoteInvalido(f"Tipo de movimiento inválido: '{tipo_movimiento}'. Use 'ingreso' o 'egreso'.")
+    if not isinstance(lineas, list) or not lineas:
+        raise LoteInvalido('El lote no contiene líneas.')
+
+    is_ingreso = tipo_movimiento == 'ingreso'
+    tipo_db = TIPOS_MOVIMIENTO[tipo_movimiento]
+
+    resultados = []
+    validas = []
+    for numero, datos in enumerate(lineas, start=1):
+        linea, error = _normalizar_linea(numero, datos, is_ingreso)
+        if error:
+            codigo = datos.get('codigo_producto') if isinstance(datos, dict) else None
+            resultados.append({'linea': numero, 'codigo_producto': codigo, 'ok': False, 'error': error})
+        else:
+            resultados.append(None)
+            validas.append(linea)
+
+    with transaction.atomic():
+        # Un único SELECT ... FOR UPDATE, ordenado por PK para bloquear siempre
+        # en el mismo orden y evitar deadlocks entre lotes concurrentes
+        codigos = sorted({linea['codigo_producto'] for linea in validas})
+        productos = {
+            p.CodigoProducto: p
+            for p in Inventario.objects.select_for_update().filter(CodigoProducto__in=codigos).order_by('CodigoProducto')
+        }
+
+        ahora = timezone.now()
+        movimientos = []
+        modificados = {}
+
+        for linea in validas:
+            producto = productos.get(linea['codigo_producto'])
+            numero = linea['linea']
+            cantidad = linea['cantidad']
+
+            if producto is None:
+                resultados[numero - 1] = {
+                    'linea': numero, 'codigo_producto': linea['codigo_producto'], 'ok': False,
+                    'error': f"El producto con código '{linea['codigo_producto']}' no fue encontrado.",
+                }
+                continue
+
+            if is_ingreso:
+                costo_unitario = linea['precio_unitario_gs']
+                costo_movimiento = linea['costo_total_gs']
+                if costo_movimiento is None:
+                    costo_movimiento = costo_unitario * cantidad
+                producto.PrecioGS = linea['precio_unitario_gs']
+                producto.PrecioUSD = linea['precio_unitario_usd']
+                producto.Cantidad += cantidad
+            else:
+                # El stock disponible ya descuenta las líneas anteriores del mismo lote
+                if cantidad > producto.Cantidad:
+                    resultados[numero - 1] = {
+                        'linea': numero, 'codigo_producto': producto.CodigoProducto, 'ok': False,
+                        'error': f"Stock Insuficiente. Solo hay {producto.Cantidad} unidades de '{producto.Producto}'.",
+                    }
+                    continue
+                costo_unitario = producto.PrecioGS
+                costo_movimiento = producto.PrecioGS * cantidad
+                producto.Cantidad -= cantidad
+
+            producto.FechaUltimoMovimiento = ahora
+            modificados[producto.CodigoProducto] = producto
+
+            movimientos.append(StockMovement(
+                producto=producto,
+                tipo_movimiento=tipo_db,
+                cantidad_movida=cantidad,
+                motivo=linea['observacion'],
+                costo_unitario=costo_unitario,
+                costo_total=costo_movimiento,
+                tasa_cambio=linea['tasa_cambio'],
+                referencia=linea['referencia'],
+                fecha_movimiento=ahora,
+                ubicacion=producto.Ubicacion or '',
+            ))
+            resultados[numero - 1] = {
+                'linea': numero, 'codigo_producto': producto.CodigoProducto, 'ok': True,
+                'cantidad': cantidad, 'stock_resultante': producto.Cantidad,
+            }
+
+        errores = sum(1 for r in resultados if not r['ok'])
+        confirmado = bool(movimientos) and not (todo_o_nada and errores)
+
+        if confirmado:
+            for producto in modificados.values():
+                producto.recalcular_totales()
+            Inventario.objects.bulk_update(list(modificados.values()), CAMPOS_ACTUALIZADOS)
+            ajustar_precios_productos(modificados.values())
+            StockMovement.objects.bulk_create(movimientos)
+            # bulk_update/bulk_create no disparan señales: se invalida y valora a mano
+            transaction.on_commit(cache_autocompletado.invalidar)
+            invalidar_modelos(Inventario)
+            registrar_movimientos(movimientos)
+        else:
+            transaction.set_rollback(True)
+
+    return {
+        'aplicadas': len(movimientos) if confirmado else 0,
+        'errores': errores,
+        'confirmado': confirmado,
+        'resultados': resultados,
+    }
@@ -0,0 +1,96 @@
+# compras/reposicion.py - ALERTAS DE STOCK Y SUGERENCIAS DE REPOSICIÓN
+
+"""
+Reporte de reposición sobre la columna Inventario.EstadoStock, que se mantiene
+en recalcular_totales() (save() y los caminos en bloque). Filtrar por estado
+usa el índice (EstadoStock, CodigoProducto) en vez de comparar columnas fila
+por fila, y la cantidad sugerida (MaximoAdmisible - Cantidad) se calcula en la
+misma consulta, en una sola pasada sobre los productos en alerta.
+"""
+
+from django.db.models import Case, Count, F, FloatField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from mi_proyecto.csv_streaming import stream_csv
+
+from .models import MARGEN_STOCK_BAJO, Inventario
+
+# Estados que requieren reponer
+ESTADOS_ALERTA = ('critico', 'bajo')
+
+COLUMNAS_REPOSICION = (
+    'codigo', 'producto', 'marca', 'modelo', 'ubicacion', 'estado',
+    'cantidad', 'minimo', 'maximo', 'sugerido', 'costo_estimado_gs',
+)
+
+TAMANO_BLOQUE_REPOSICION = 2000
+
+
+def recalcular_estados(modelo=Inventario):
+    """
+    Recalcula EstadoStock de todo el catálogo en un solo UPDATE (mismas reglas
+    que calcular_estado_stock). Para la carga inicial y para datos modificados
+    por fuera de la aplicación; el uso normal lo mantiene recalcular_totales().
+    """
+    return modelo.objects.update(EstadoStock=Case(
+        When(Cantidad__lte=F('MinimoAdmisible'), then=Value('critico')),
+        When(Cantidad__lte=F('MinimoAdmisible') + MARGEN_STOCK_BAJO, then=Value('bajo')),
+        default=Value('optimo'),
+    ))
+
+
+def resumen_estados():
+    """Cantidad de productos por estado ({'critico': n, 'bajo': n, 'optimo': n})."""
+    conteos = dict(
+        Inventario.objects.order_by().values_list('EstadoStock').annotate(total=Count('CodigoProducto'))
+    )
+    return {estado: conteos.get(estado, 0) for estado in ('critico', 'bajo', 'optimo')}
+
+
+def sugerencias_reposicion(ubicacion=None, estados=ESTADOS_ALERTA):
+    """
+    Productos en alerta con la cantidad a pedir para llegar al máximo.
+    Se sugiere como mínimo llegar a mínimo + MARGEN_STOCK_BAJO, para los
+    productos que no tienen máximo cargado (0 por defecto).
+    """
+    hasta_maximo = F('MaximoAdmisible') - F('Cantidad')
+    hasta_minimo = F('MinimoAdmisible') + Value(float(MARGEN_STOCK_BAJO)) - F('Cantidad')
+    sugerido = Greatest(hasta_maximo, hasta_minimo, Value(0.0), output_field=FloatField())
+
+    qs = (
+        Inventario.objects
+        .filter(EstadoStock__in=estados)
+        .only('CodigoProducto', 'Producto', 'Marca', 'Modelo', 'Ubicacion', 'EstadoStock',
+              'Cantidad', 'MinimoAdmisible', 'MaximoAdmisible', 'PrecioGS')
+        .annotate(sugerido=sugerido, costo_estimado=sugerido * F('PrecioGS'))
+        # 'critico' antes que 'bajo'
+        .order_by('-EstadoStock', 'CodigoProducto')
+    )
+    if ubicacion:
+        qs = qs.filter(Ubicacion=ubicacion)
+    return qs
+
+
+def totales_reposicion(qs):
+    """Totales del reporte en una sola consulta agregada."""
+    return qs.order_by().aggregate(
+        productos=Count('CodigoProducto'),
+        criticos=Count('CodigoProducto', filter=Q(EstadoStock='critico')),
+        unidades_total=Sum('sugerido'),
+        costo_total=Sum('costo_estimado'),
+    )
+
+
+def filas_reposicion(qs):
+    """Filas del reporte leídas por bloques (sin instanciar modelos)."""
+    columnas = qs.values_list(
+        'CodigoProducto', 'Producto', 'Marca', 'Modelo', 'Ubicacion', 'EstadoStock',
+        'Cantidad', 'MinimoAdmisible', 'MaximoAdmisible', 'sugerido', 'costo_estimado',
+    )
+    for fila in columnas.iterator(chunk_size=TAMANO_BLOQUE_REPOSICION):
+        *datos, sugerido, costo = fila
+        yield [*datos, round(sugerido, 2), round(costo or 0)]
+
+
+def stream_csv_reposicion(qs):
+    return stream_csv(COLUMNAS_REPOSICION, filas_reposicion(qs))
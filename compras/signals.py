@@ -0,0 +1,52 @@
+# compras/signals.py - SEÑALES DEL MÓDULO COMPRAS
+
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Inventario, StockMovement
+from .busqueda import cache_autocompletado
+from .valoracion import ajustar_apertura, ajustar_precios_productos, registrar_movimientos, trasladar_producto
+
+
+# ==========================================================
+# INVALIDACIÓN DE LA CACHÉ DEL AUTOCOMPLETADO
+# ==========================================================
+@receiver(post_save, sender=Inventario, dispatch_uid='compras_cache_autocompletado_inventario')
+@receiver(post_delete, sender=Inventario, dispatch_uid='compras_cache_autocompletado_inventario_del')
+@receiver(post_save, sender=StockMovement, dispatch_uid='compras_cache_autocompletado_movimiento')
+def invalidar_cache_autocompletado(sender, **kwargs):
+    """El stock mostrado en el autocompletado cambia con cada guardado o movimiento."""
+    cache_autocompletado.invalidar()
+
+
+# ==========================================================
+# VALORACIÓN INCREMENTAL POR UBICACIÓN (compras/valoracion.py)
+# ==========================================================
+@receiver(post_save, sender=StockMovement, dispatch_uid='compras_valoracion_movimiento')
+def valorar_movimiento(sender, instance, created, raw=False, **kwargs):
+    """Los bulk_create de movimientos llaman a registrar_movimientos a mano."""
+    if created and not raw:
+        registrar_movimientos([instance])
+
+
+@receiver(post_save, sender=Inventario, dispatch_uid='compras_valoracion_inventario')
+def valorar_inventario(sender, instance, created, raw=False, **kwargs):
+    """
+    Stock de apertura de un producto nuevo; cambio de PrecioGS (revaloriza en
+    la ubicación anterior) y traslado del valor al cambiar la Ubicacion.
+    """
+    if raw:
+        return
+    if created:
+        ajustar_apertura(instance)
+    elif hasattr(instance, '_ubicacion_original'):
+        ajustar_precios_productos([instance])
+        if instance._ubicacion_original != instance.Ubicacion:
+            trasladar_producto(instance, instance._ubicacion_original, instance.Ubicacion)
+    instance._guardar_originales()
+
+
+@receiver(post_delete, sender=Inventario, dispatch_uid='compras_valoracion_inventario_del')
+def desvalorar_inventario(sender, instance, **kwargs):
+    """Solo se pueden borrar productos sin movimientos (PROTECT): su valor es el de apertura."""
+    ajustar_apertura(instance, signo=-1)
@@ -1,3 +1,239 @@
+import os
+import shutil
+import tempfile
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from . import ingesta
+from .importacion import importar_inventario
+from .models import Factura, Inventario, Proveedor, SnapshotValoracion, StockMovement, TrabajoFactura
+from .movimientos import aplicar_movimientos_lote
+from .valoracion import reconstruir_valoracion, tomar_snapshot, valoracion_actual, valoracion_al
+
+
+# ==========================================================
+# VALORACIÓN INCREMENTAL (compras/valoracion.py)
+# ==========================================================
+
+class ValoracionTestCase(TestCase):
+    """
+    Los acumulados que se mantienen en cada camino de escritura deben dar lo
+    mismo que recalcularlos desde cero, y la valoración a una fecha pasada lo
+    mismo que el snapshot tomado ese día.
+    """
+
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        self.usuario = User.objects.create_user('compras', password='clave')
+        self.client.force_login(self.usuario)
+
+    def _producto(self, codigo, cantidad, precio, ubicacion='D1'):
+        return Inventario.objects.create(
+            CodigoProducto=codigo, Producto=f'Producto {codigo}', Cantidad=cantidad, PrecioGS=precio, Ubicacion=ubicacion,
+        )
+
+    def _csv(self, texto):
+        ruta = os.path.join(self.directorio, f'inventario_{len(os.listdir(self.directorio))}.csv')
+        with open(ruta, 'w', encoding='utf-8') as archivo:
+            archivo.write(texto)
+        return ruta
+
+    def assertValoracionIgual(self, obtenida, esperada):
+        # Una ubicación vaciada conserva su fila de acumulados en cero
+        obtenida = {ubicacion: fila for ubicacion, fila in obtenida.items() if fila[0] or fila[1]}
+        self.assertEqual(set(obtenida), set(esperada))
+        for ubicacion, (cantidad, valor) in esperada.items():
+            self.assertAlmostEqual(obtenida[ubicacion][0], cantidad, places=6, msg=ubicacion)
+            self.assertEqual(Decimal(str(obtenida[ubicacion][1])).quantize(Decimal('0.01')),
+                             Decimal(str(valor)).quantize(Decimal('0.01')), msg=ubicacion)
+
+    def assertAcumuladosConsistentes(self):
+        """valoracion_actual() igual a reconstruir_valoracion(), sin que la reconstrucción registre ajustes."""
+        incremental = valoracion_actual()
+        reconstruir_valoracion()
+        self.assertValoracionIgual(incremental, valoracion_actual())
+
+    # ---------- Caminos de escritura ----------
+
+    def test_alta_traslado_y_precio_por_save(self):
+        producto = self._producto('A1', 10, 100)
+        self._producto('A2', 4, 50, ubicacion='D2')
+        self.assertValoracionIgual(valoracion_actual(), {'D1': (10, 1000), 'D2': (4, 200)})
+
+        producto = Inventario.objects.get(pk='A1')
+        producto.PrecioGS = 150
+        producto.Ubicacion = 'D3'
+        producto.save()
+        self.assertValoracionIgual(valoracion_actual(), {'D3': (10, 1500), 'D2': (4, 200)})
+        self.assertAcumuladosConsistentes()
+
+    def test_movimiento_individual(self):
+        self._producto('A1', 10, 100)
+        respuesta = self.client.post(reverse('compras:ingreso_stock'), {
+            'codigo_producto': 'A1', 'cantidad': '5', 'precio_unitario_gs': '120',
+            'precio_unitario_usd': '0', 'tasa_cambio': '1', 'costo_total_gs': '600',
+        })
+        self.assertEqual(respuesta.status_code, 302)
+        self.client.post(reverse('compras:egreso_stock'), {'codigo_producto': 'A1', 'cantidad': '3'})
+
+        self.assertEqual(StockMovement.objects.count(), 2)
+        self.assertAcumuladosConsistentes()
+
+    def test_movimientos_en_lote(self):
+        self._producto('A1', 10, 100)
+        self._producto('A2', 5, 40, ubicacion='D2')
+        resultado = aplicar_movimientos_lote([
+            {'codigo_producto': 'A1', 'cantidad': 4, 'precio_unitario_gs': 130},
+            {'codigo_producto': 'A2', 'cantidad': 1, 'precio_unitario_gs': 40},
+        ], 'ingreso')
+        self.assertTrue(resultado['confirmado'])
+        aplicar_movimientos_lote([{'codigo_producto': 'A1', 'cantidad': 6}], 'egreso')
+
+        self.assertAcumuladosConsistentes()
+
+    def test_factura(self):
+        self._producto('A1', 10, 100)
+        proveedor = Proveedor.objects.create(ruc='80000001-1', nombre='Proveedor')
+        factura = Factura.objects.create(
+            numero_factura='001-001-0000001', proveedor=proveedor, ruc_proveedor=proveedor.ruc,
+            fecha_emision=timezone.localdate(), monto_total=465, pdf_original='facturas/prueba.pdf', usuario=self.usuario,
+        )
+        with mock.patch('builtins.print'):
+            self.client.post(reverse('compras:guardar_factura'), {
+                'factura_id': factura.id,
+                'producto_id_0': 'A1', 'cantidad_0': '3', 'precio_unitario_0': '90',
+                'producto_id_1': 'A1', 'cantidad_1': '2', 'precio_unitario_1': '95',
+            })
+
+        self.assertEqual(Inventario.objects.get(pk='A1').Cantidad, 15)
+        self.assertAcumuladosConsistentes()
+
+    def test_importacion(self):
+        importar_inventario(self._csv(
+            'CodigoProducto,Producto,Cantidad,PrecioGS,Ubicacion\nA1,Tornillo,10,100,E1\nA2,Tuerca,5,50,E1\n'
+        ))
+        self.assertAcumuladosConsistentes()
+        # Cantidad, precio y ubicación cambian en la misma fila; A2 solo cambia de precio
+        importar_inventario(self._csv('CodigoProducto,Cantidad,PrecioGS,Ubicacion\nA1,7,200,E2\nA2,,60,\n'))
+        self.assertAcumuladosConsistentes()
+
+    def test_importacion_no_cambia_el_pasado(self):
+        """Con la tabla vacía ayer, importar y reimportar hoy no modifica la valoración de ayer."""
+        importar_inventario(self._csv('CodigoProducto,Producto,Cantidad,PrecioGS,Ubicacion\nA1,Tornillo,10,100,E1\nA2,Tuerca,5,50,E1\n'))
+        importar_inventario(self._csv('CodigoProducto,Cantidad\nA1,7\n'))
+
+        self.assertEqual(valoracion_al(timezone.localdate() - timedelta(days=1)), {})
+
+    # ---------- Valoración a una fecha pasada ----------
+
+    def _en_dia(self, dias_atras):
+        """Hace que timezone.now() sea el mediodía de hace `dias_atras` días."""
+        instante = timezone.make_aware(datetime.combine(timezone.localdate() - timedelta(days=dias_atras), time(12)))
+        return mock.patch('django.utils.timezone.now', return_value=instante)
+
+    def test_valoracion_al_igual_al_snapshot_del_dia(self):
+        hoy = timezone.localdate()
+        esperado = {}
+
+        with self._en_dia(3):
+            self._producto('A1', 10, 100)
+            self._producto('A2', 8, 25, ubicacion='D2')
+            tomar_snapshot(hoy - timedelta(days=3))
+        with self._en_dia(2):
+            aplicar_movimientos_lote([{'codigo_producto': 'A1', 'cantidad': 5, 'precio_unitario_gs': 110}], 'ingreso')
+            producto = Inventario.objects.get(pk='A2')
+            producto.Ubicacion = 'D3'
+            producto.save()
+            tomar_snapshot(hoy - timedelta(days=2))
+        with self._en_dia(1):
+            importar_inventario(self._csv('CodigoProducto,Producto,Cantidad,PrecioGS,Ubicacion\nA1,,12,140,D2\nA3,Nuevo,3,10,D1\n'))
+            aplicar_movimientos_lote([{'codigo_producto': 'A2', 'cantidad': 2}], 'egreso')
+            tomar_snapshot(hoy - timedelta(days=1))
+        aplicar_movimientos_lote([{'codigo_producto': 'A3', 'cantidad': 4, 'precio_unitario_gs': 12}], 'ingreso')
+        self._producto('A4', 1, 1000)
+
+        for dias in (1, 2, 3):
+            fecha = hoy - timedelta(days=dias)
+            esperado[fecha] = {
+                ubicacion: (cantidad, valor)
+                for ubicacion, cantidad, valor in SnapshotValoracion.objects.filter(fecha=fecha).values_list(
+                    'ubicacion', 'cantidad', 'valor_gs'
+                )
+            }
+        self.assertAcumuladosConsistentes()
+
+        # Desde el acumulado actual (sin snapshots)
+        SnapshotValoracion.objects.all().delete()
+        for fecha, filas in esperado.items():
+            self.assertValoracionIgual(valoracion_al(fecha), filas)
+
+        # Hacia adelante desde un snapshot tomado después (reconstruido) y hacia atrás desde el de ayer
+        tomar_snapshot(hoy - timedelta(days=3))
+        self.assertValoracionIgual(valoracion_al(hoy - timedelta(days=3)), esperado[hoy - timedelta(days=3)])
+        self.assertValoracionIgual(valoracion_al(hoy - timedelta(days=2)), esperado[hoy - timedelta(days=2)])
+        SnapshotValoracion.objects.all().delete()
+        tomar_snapshot(hoy - timedelta(days=1))
+        self.assertValoracionIgual(valoracion_al(hoy - timedelta(days=2)), esperado[hoy - timedelta(days=2)])
+
+
+# ==========================================================
+# COLA DE EXTRACCIÓN DE FACTURAS (compras/ingesta.py)
+# ==========================================================
+
+class ColaFacturasTestCase(TestCase):
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('compras', password='clave')
+        self.trabajos = [
+            TrabajoFactura.objects.create(
+                archivo=f'facturas/originales/{n}.pdf', nombre_original=f'{n}.pdf', usuario=self.usuario,
+            )
+            for n in range(3)
+        ]
+
+    def test_toma_en_orden_de_llegada(self):
+        tomados = [ingesta.tomar_siguiente_trabajo() for _ in range(3)]
+
+        self.assertEqual([t.id for t in tomados], [t.id for t in self.trabajos])
+        self.assertTrue(all(t.estado == 'procesando' and t.intentos == 1 and t.fecha_inicio for t in tomados))
+        self.assertIsNone(ingesta.tomar_siguiente_trabajo())
+
+    def test_trabajo_tomado_por_otro_worker(self):
+        """Si otro worker toma el trabajo entre el SELECT y el UPDATE, se pasa al siguiente."""
+        filtrar = TrabajoFactura.objects.filter
+        primero = self.trabajos[0]
+
+        def filtrar_con_carrera(*args, **kwargs):
+            if kwargs == {'id': primero.id, 'estado': 'pendiente'}:
+                filtrar(id=primero.id).update(estado='procesando', intentos=1)
+            return filtrar(*args, **kwargs)
+
+        with mock.patch.object(TrabajoFactura.objects, 'filter', side_effect=filtrar_con_carrera):
+            tomado = ingesta.tomar_siguiente_trabajo()
+
+        self.assertEqual(tomado.id, self.trabajos[1].id)
+        primero.refresh_from_db()
+        self.assertEqual(primero.intentos, 1)
+
+    def test_liberar_trabajos_colgados(self):
+        for _ in range(3):
+            ingesta.tomar_siguiente_trabajo()
+        viejo = timezone.now() - timedelta(minutes=ingesta.MINUTOS_TRABAJO_COLGADO + 1)
+        colgado, agotado, reciente = self.trabajos
+        TrabajoFactura.objects.filter(id=colgado.id).update(fecha_inicio=viejo)
+        TrabajoFactura.objects.filter(id=agotado.id).update(fecha_inicio=viejo, intentos=ingesta.MAX_INTENTOS)
+
+        self.assertEqual(ingesta.liberar_trabajos_colgados(), (1, 1))
+        estados = dict(TrabajoFactura.objects.values_list('id', 'estado'))
+        self.assertEqual(estados, {colgado.id: 'pendiente', agotado.id: 'error', reciente.id: 'procesando'})
 
-# Create your tests here.
+        # El reencolado se vuelve a tomar y cuenta el intento
+        tomado = ingesta.tomar_siguiente_trabajo()
+        self.assertEqual((tomado.id, tomado.intentos), (colgado.id, 2))
@@ -12,20 +12,27 @@ urlpatterns = [
     
     # 2. Vistas de Inventario y Depósito
     path('deposito/', views.deposito_view, name='deposito'), 
+    path('api/deposito/', views.deposito_api, name='deposito_api'),
     
     # 3. Detalle de Producto
     path('detalle/<str:pk>/', views.detalle_producto_view, name='detalle_producto'),
+    path('detalle/<str:pk>/movimientos/', views.historial_movimientos_api, name='historial_movimientos'),
+    path('detalle/<str:pk>/movimientos/agregados/', views.agregados_movimientos_api, name='agregados_movimientos'),
 
     # 4. Dashboard Específico del Depósito
     path('deposito_dashboard/', views.deposito_dashboard_view, name='deposito_dashboard'), 
+    path('deposito/reposicion/', views.reposicion_view, name='reposicion'),
+    path('deposito/valoracion/', views.valoracion_view, name='valoracion'),
     
     # 5. Vistas de Movimiento de Stock
     path('stock/ingreso/', views.ingreso_stock_view, name='ingreso_stock'),
     path('stock/egreso/', views.egreso_stock_view, name='egreso_stock'),
+    path('stock/lote/', views.movimiento_stock_lote, name='movimiento_stock_lote'),
     
     # 6. Vistas de Adquisiciones y Facturación
     path('facturas/', views.facturas_view, name='facturas'),
     path('facturas/guardar/', views.guardar_factura, name='guardar_factura'),
+    path('facturas/trabajos/<int:trabajo_id>/', views.estado_trabajo_factura, name='estado_trabajo_factura'),
     path('facturas/manual/', views.cargar_factura_manual, name='cargar_factura_manual'),  # ✅ RUTA CORREGIDA
     path('facturas/<int:factura_id>/pdf/ver/', views.ver_factura_pdf, name='ver_factura_pdf'),
     path('facturas/<int:factura_id>/pdf/descargar/', views.descargar_factura_pdf, name='descargar_factura_pdf'),
@@ -44,6 +51,7 @@ urlpatterns = [
     
     # 10. APIs AJAX
     path('api/buscar/', views.search_products_ajax, name='search_products_ajax'),
+    path('api/buscar/cache/', views.search_products_cache_stats, name='search_products_cache_stats'),
     path('api/detalle-ajax/', views.get_product_details_ajax, name='get_product_details_ajax'),
     path('editar-producto/<str:pk>/', views.editar_producto_view, name='editar_producto'),
 ]
\ No newline at end of file
@@ -185,4 +185,28 @@ def validar_pdf(archivo):
         with pdfplumber.open(archivo) as pdf:
             return len(pdf.pages) > 0
     except:
-        return False
\ No newline at end of file
+        return False
+
+# ==========================================================
+# PAGINACIÓN POR CURSOR (KEYSET)
+# ==========================================================
+
+def paginar_por_cursor(queryset, campo, cursor=None, limite=50):
+    """
+    Pagina un queryset por keyset sobre un campo único y ordenable.
+    En lugar de OFFSET usa `campo > cursor`, así cada bloque cuesta lo mismo
+    sin importar cuántas filas haya antes.
+
+    Retorna (items, siguiente_cursor). siguiente_cursor es None si no hay más.
+    """
+    qs = queryset.order_by(campo)
+    if cursor:
+        qs = qs.filter(**{f'{campo}__gt': cursor})
+
+    # Se pide una fila extra solo para saber si existe un bloque siguiente
+    items = list(qs[:limite + 1])
+    hay_mas = len(items) > limite
+    items = items[:limite]
+
+    siguiente_cursor = getattr(items[-1], campo) if hay_mas else None
+    return items, siguiente_cursor
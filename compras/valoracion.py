@@ -0,0 +1,511 @@
+# compras/valoracion.py - VALORACIÓN DE INVENTARIO INCREMENTAL Y SNAPSHOTS
+
+"""
+Valoración del stock según el costo registrado en cada StockMovement
+(costo_total; si falta, cantidad x costo_unitario; si tampoco hay, como en
+los egresos, cantidad x PrecioGS del producto):
+
+    ENTRADA suma, SALIDA resta, AJUSTE suma o resta según el signo de la cantidad.
+
+1. Acumulados por ubicación (ValoracionUbicacion): cada movimiento suma su
+   efecto a la fila de la ubicación del producto con un UPDATE ... SET
+   valor = valor + x, sin recorrer la tabla. Los caminos en bloque
+   (bulk_create de movimientos) llaman a registrar_movimientos a mano; el
+   resto llega por la señal post_save de StockMovement. El total general es
+   la suma de las filas (una por ubicación).
+
+2. Ajustes (AjusteValoracion): lo que cambia los acumulados sin ser un
+   movimiento (alta o baja de un producto con stock de apertura, traslado
+   de ubicación, cambio de PrecioGS, realineación de reconstruir_valoracion)
+   queda registrado con su fecha, para poder deshacerlo al mirar hacia atrás.
+
+3. Snapshots diarios (SnapshotValoracion): la valoración al cierre de una
+   fecha. Para consultar una fecha pasada se parte del snapshot o del
+   acumulado más cercano y solo se aplican los movimientos y ajustes entre
+   ambos. La tasa de cambio del snapshot es la última registrada en un
+   ingreso hasta esa fecha, y con ella se informa el valor en USD. Los
+   snapshots los toma manage.py snapshot_valoracion, programado una vez por
+   día (ver start_server2.vbs).
+
+El stock que no tiene movimientos que lo expliquen (p. ej. la carga inicial
+desde Excel) entra al reconstruir con su Cantidad x PrecioGS como saldo de
+apertura del producto. Ese saldo y los movimientos sin costo se valoran al
+PrecioGS vigente, así que cada camino que cambia el precio (save(), lote,
+factura, importación) registra la diferencia con ajustar_precios y los
+acumulados siguen iguales a reconstruir_valoracion. Si algo los desalinea
+igual (SQL a mano), reconstruir_valoracion (o snapshot_valoracion
+--reconstruir) los realinea y la diferencia queda como ajuste del día en que
+se reconstruyó (las fechas anteriores conservan su valor).
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case, Count, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Q, Sum, Value, When,
+)
+from django.db.models.functions import Abs, Cast, Coalesce, NullIf
+from django.utils import timezone
+
+from .models import AjusteValoracion, Inventario, SnapshotValoracion, StockMovement, ValoracionUbicacion
+
+SIN_UBICACION = ''
+CENTAVOS = Decimal('0.01')
+
+_DECIMAL = DecimalField(max_digits=18, decimal_places=2)
+_CANTIDAD_DECIMAL = DecimalField(max_digits=18, decimal_places=4)
+
+
+# ==========================================================
+# 1. EFECTO DE UN MOVIMIENTO (EN PYTHON Y EN SQL)
+# ==========================================================
+
+def _resta(tipo, cantidad):
+    return tipo == 'SALIDA' or (tipo == 'AJUSTE' and cantidad < 0)
+
+
+def efecto_movimiento(movimiento):
+    """(cantidad, valor_gs) con signo que el movimiento aporta a la valoración."""
+    cantidad = movimiento.cantidad_movida or 0
+    costo = abs(Decimal(str(movimiento.costo_total or 0))).quantize(CENTAVOS)
+    if not costo:
+        costo = abs(Decimal(str(cantidad)) * Decimal(str(movimiento.costo_unitario or 0)).quantize(CENTAVOS))
+    if not costo:
+        # Sin costo registrado (egresos, ajustes): al precio actual del producto
+        costo = abs(Decimal(str(cantidad)) * Decimal(str(movimiento.producto.PrecioGS or 0))).quantize(CENTAVOS)
+
+    if _resta(movimiento.tipo_movimiento, cantidad):
+        return -abs(cantidad), -costo
+    return abs(cantidad), costo
+
+
+def _expresiones_efecto():
+    """Las mismas reglas que efecto_movimiento, como expresiones para agregar en la base."""
+    resta = Q(tipo_movimiento='SALIDA') | Q(tipo_movimiento='AJUSTE', cantidad_movida__lt=0)
+    cantidad_decimal = Cast('cantidad_movida', _CANTIDAD_DECIMAL)
+    cero = Value(Decimal('0'))
+    costo = Abs(Coalesce(
+        NullIf(F('costo_total'), cero),
+        NullIf(ExpressionWrapper(cantidad_decimal * F('costo_unitario'), output_field=_DECIMAL), cero),
+        ExpressionWrapper(cantidad_decimal * Cast('producto__PrecioGS', _DECIMAL), output_field=_DECIMAL),
+        output_field=_DECIMAL,
+    ))
+    cantidad = Abs(F('cantidad_movida'))
+    efecto_cantidad = Case(When(resta, then=-cantidad), default=cantidad)
+    efecto_valor = Case(
+        When(resta, then=ExpressionWrapper(Value(Decimal('0')) - costo, output_field=_DECIMAL)),
+        default=costo,
+        output_field=_DECIMAL,
+    )
+    return efecto_cantidad, efecto_valor
+
+
+def _ubicacion_movimiento(movimiento):
+    if movimiento.ubicacion is not None:
+        return movimiento.ubicacion
+    return movimiento.producto.Ubicacion or SIN_UBICACION
+
+
+def efectos_por_ubicacion(desde=None, hasta=None, modelo_movimiento=StockMovement):
+    """
+    {ubicacion: (cantidad, valor_gs)} de los movimientos con fecha en [desde, hasta),
+    agrupados en la base por la ubicación del producto al momento de cada
+    movimiento (la actual si el movimiento no la tiene registrada).
+    """
+    efecto_cantidad, efecto_valor = _expresiones_efecto()
+    qs = modelo_movimiento.objects.all()
+    if desde is not None:
+        qs = qs.filter(fecha_movimiento__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(fecha_movimiento__lt=hasta)
+
+    filas = (
+        qs.order_by()
+        .values_list(Coalesce('ubicacion', 'producto__Ubicacion'))
+        .annotate(cantidad=Sum(efecto_cantidad), valor=Sum(efecto_valor))
+    )
+    return {
+        ubicacion or SIN_UBICACION: (cantidad or 0.0, Decimal(str(valor or 0)))
+        for ubicacion, cantidad, valor in filas
+    }
+
+
+# ==========================================================
+# 2. ACUMULADOS POR UBICACIÓN (INCREMENTALES)
+# ==========================================================
+
+def _aplicar_deltas(deltas):
+    """deltas: {ubicacion: [cantidad, valor, movimientos]} sumados con F() sobre cada fila."""
+    if not deltas:
+        return
+    ahora = timezone.now()
+    ValoracionUbicacion.objects.bulk_create(
+        [ValoracionUbicacion(ubicacion=ubicacion) for ubicacion in deltas],
+        ignore_conflicts=True,
+    )
+    # Un solo UPDATE para todas las ubicaciones tocadas (una factura reparte
+    # productos entre muchas): campo = campo + CASE ubicacion WHEN ... END
+    def _suma(campo, indice, output_field):
+        return F(campo) + Case(
+            *[When(ubicacion=ubicacion, then=Value(delta[indice])) for ubicacion, delta in deltas.items()],
+            default=Value(0), output_field=output_field,
+        )
+
+    ValoracionUbicacion.objects.filter(ubicacion__in=list(deltas)).update(
+        cantidad=_suma('cantidad', 0, FloatField()),
+        valor_gs=_suma('valor_gs', 1, _DECIMAL),
+        movimientos=_suma('movimientos', 2, IntegerField()),
+        fecha_actualizacion=ahora,
+    )
+
+
+def registrar_movimientos(movimientos):
+    """
+    Suma el efecto de movimientos recién creados a los acumulados de su ubicación.
+    Llamar dentro de la misma transacción que los crea. Los productos deben
+    venir cargados en movimiento.producto (lo están en todos los caminos de la app).
+    """
+    deltas = defaultdict(lambda: [0.0, Decimal('0'), 0])
+    for movimiento in movimientos:
+        cantidad, valor = efecto_movimiento(movimiento)
+        delta = deltas[_ubicacion_movimiento(movimiento)]
+        delta[0] += cantidad
+        delta[1] += valor
+        delta[2] += 1
+    _aplicar_deltas(deltas)
+
+
+def efectos_por_producto(codigos=None, modelo_movimiento=StockMovement):
+    """{codigo: (cantidad, valor_gs, movimientos)} de los movimientos de cada producto (una consulta agrupada)."""
+    efecto_cantidad, efecto_valor = _expresiones_efecto()
+    qs = modelo_movimiento.objects.all()
+    if codigos is not None:
+        qs = qs.filter(producto_id__in=list(codigos))
+    return {
+        codigo: (cantidad or 0.0, Decimal(str(valor or 0)), movimientos)
+        for codigo, cantidad, valor, movimientos in (
+            qs.order_by()
+            .values_list('producto_id')
+            .annotate(cantidad=Sum(efecto_cantidad), valor=Sum(efecto_valor), movimientos=Count('id'))
+        )
+    }
+
+
+def _valor_con_apertura(efectos, cantidad, precio):
+    """Efecto de los movimientos + el stock que no explican (apertura) a `precio`."""
+    cantidad_mov, valor_mov, _ = efectos
+    apertura = (cantidad or 0) - cantidad_mov
+    return valor_mov + (Decimal(str(apertura)) * Decimal(str(precio or 0))).quantize(CENTAVOS)
+
+
+def valorar_productos(productos):
+    """
+    {codigo: valor} de productos dados como (codigo, cantidad, precio), con las
+    mismas reglas que reconstruir_valoracion. Los movimientos sin costo se
+    valoran al PrecioGS guardado en la base al momento de llamar.
+    """
+    productos = list(productos)
+    efectos = efectos_por_producto(codigo for codigo, _, _ in productos)
+    sin_movimientos = (0.0, Decimal('0'), 0)
+    return {
+        codigo: _valor_con_apertura(efectos.get(codigo, sin_movimientos), cantidad, precio)
+        for codigo, cantidad, precio in productos
+    }
+
+
+def _registrar_ajustes(deltas, motivo, modelo_ajuste=AjusteValoracion, fecha=None):
+    """Guarda con fecha los deltas {ubicacion: [cantidad, valor, ...]} que no vienen de movimientos."""
+    fecha = fecha or timezone.now()
+    modelo_ajuste.objects.bulk_create([
+        modelo_ajuste(
+            fecha=fecha, ubicacion=ubicacion, cantidad=delta[0],
+            valor_gs=Decimal(str(delta[1])).quantize(CENTAVOS), motivo=motivo,
+        )
+        for ubicacion, delta in deltas.items()
+        if delta[0] or delta[1]
+    ])
+
+
+def ajustar_acumulados(deltas, motivo):
+    """Aplica a los acumulados deltas {ubicacion: [cantidad, valor, 0]} que no vienen de movimientos y los registra."""
+    _aplicar_deltas(deltas)
+    _registrar_ajustes(deltas, motivo)
+
+
+def _cantidades_a_precio(codigos):
+    """{codigo: (cantidad de sus movimientos, cantidad de los que no tienen costo)} con signo."""
+    efecto_cantidad, _ = _expresiones_efecto()
+    sin_costo = (Q(costo_total__isnull=True) | Q(costo_total=0)) & (
+        Q(costo_unitario__isnull=True) | Q(costo_unitario=0) | Q(cantidad_movida=0)
+    )
+    filas = (
+        StockMovement.objects.filter(producto_id__in=list(codigos)).order_by()
+        .values_list('producto_id')
+        .annotate(
+            cantidad=Sum(efecto_cantidad),
+            sin_costo=Sum(Case(When(sin_costo, then=efecto_cantidad), default=Value(0.0), output_field=FloatField())),
+        )
+    )
+    return {codigo: (cantidad or 0.0, sin_costo or 0.0) for codigo, cantidad, sin_costo in filas}
+
+
+def ajustar_precios(cambios):
+    """
+    Revaloriza como ajuste 'precio' los productos que cambian de PrecioGS:
+    el stock que no explican los movimientos y los movimientos sin costo se
+    valoran a PrecioGS (como en reconstruir_valoracion). `cambios` son
+    (codigo, ubicacion, cantidad, precio_anterior, precio_nuevo) con la
+    Cantidad anterior al cambio; llamar antes de crear los movimientos que lo
+    acompañan.
+    """
+    cambios = [cambio for cambio in cambios if cambio[3] != cambio[4]]
+    if not cambios:
+        return
+    cantidades = _cantidades_a_precio(codigo for codigo, *_ in cambios)
+
+    deltas = defaultdict(lambda: [0.0, Decimal('0'), 0])
+    for codigo, ubicacion, cantidad, anterior, nuevo in cambios:
+        cantidad_mov, sin_costo = cantidades.get(codigo, (0.0, 0.0))
+        apertura = Decimal(str((cantidad or 0) - cantidad_mov))
+        anterior, nuevo = Decimal(str(anterior or 0)), Decimal(str(nuevo or 0))
+        deltas[ubicacion or SIN_UBICACION][1] += (
+            (apertura * nuevo).quantize(CENTAVOS) - (apertura * anterior).quantize(CENTAVOS)
+            + (Decimal(str(sin_costo)) * (nuevo - anterior)).quantize(CENTAVOS)
+        )
+    ajustar_acumulados({ubicacion: delta for ubicacion, delta in deltas.items() if delta[1]}, 'precio')
+
+
+def ajustar_precios_productos(productos):
+    """ajustar_precios para productos leídos de la base (Inventario.from_db guarda lo leído) y modificados en memoria."""
+    ajustar_precios(
+        (p.CodigoProducto, p._ubicacion_original, p._cantidad_original, p._precio_original, p.PrecioGS)
+        for p in productos
+        if hasattr(p, '_precio_original')
+    )
+
+
+def trasladar_producto(producto, ubicacion_anterior, ubicacion_nueva):
+    """Mueve el valor del producto entre los acumulados cuando cambia su Ubicacion."""
+    cantidad = producto.Cantidad or 0
+    valor = valorar_productos([(producto.pk, cantidad, producto.PrecioGS)])[producto.pk]
+    deltas = {
+        ubicacion_anterior or SIN_UBICACION: [-cantidad, -valor, 0],
+        ubicacion_nueva or SIN_UBICACION: [cantidad, valor, 0],
+    }
+    ajustar_acumulados(deltas, 'traslado')
+
+
+def ajustar_apertura(producto, signo=1):
+    """Alta (signo 1) o baja (signo -1) de un producto con stock que no viene de movimientos."""
+    cantidad = producto.Cantidad or 0
+    if not cantidad:
+        return
+    valor = (Decimal(str(cantidad)) * Decimal(str(producto.PrecioGS or 0))).quantize(CENTAVOS)
+    ajustar_acumulados({producto.Ubicacion or SIN_UBICACION: [signo * cantidad, signo * valor, 0]}, 'apertura')
+
+
+def reconstruir_valoracion(modelo_inventario=Inventario, modelo_movimiento=StockMovement,
+                           modelo_valoracion=ValoracionUbicacion, modelo_ajuste=AjusteValoracion):
+    """
+    Recalcula los acumulados desde cero: una consulta agrupada por producto
+    sobre los movimientos y una pasada por el catálogo. Para la carga inicial,
+    después de cargas masivas por fuera de la app, o para corregir desvíos.
+    La diferencia con los acumulados anteriores se registra como ajuste de
+    ahora (salvo en la carga inicial, que es el punto de partida).
+    Recibe los modelos para poder usarse desde una migración (modelo_ajuste=None
+    no registra ajustes).
+    """
+    por_producto = efectos_por_producto(modelo_movimiento=modelo_movimiento)
+
+    totales = defaultdict(lambda: [0.0, Decimal('0'), 0])
+    productos = modelo_inventario.objects.values_list('CodigoProducto', 'Ubicacion', 'Cantidad', 'PrecioGS')
+    for codigo, ubicacion, cantidad, precio in productos.iterator(chunk_size=5000):
+        efectos = por_producto.get(codigo, (0.0, Decimal('0'), 0))
+        total = totales[ubicacion or SIN_UBICACION]
+        total[0] += cantidad or 0
+        total[1] += _valor_con_apertura(efectos, cantidad, precio)
+        total[2] += efectos[2]
+
+    ahora = timezone.now()
+    with transaction.atomic():
+        anteriores = {
+            ubicacion: (cantidad, valor)
+            for ubicacion, cantidad, valor in modelo_valoracion.objects.values_list('ubicacion', 'cantidad', 'valor_gs')
+        }
+        if modelo_ajuste is not None and anteriores:
+            diferencias = {}
+            for ubicacion in set(anteriores) | set(totales):
+                cantidad, valor, _ = totales.get(ubicacion, (0.0, Decimal('0'), 0))
+                cantidad_anterior, valor_anterior = anteriores.get(ubicacion, (0.0, Decimal('0')))
+                diferencias[ubicacion] = [
+                    cantidad - cantidad_anterior,
+                    valor.quantize(CENTAVOS) - Decimal(str(valor_anterior)),
+                ]
+            _registrar_ajustes(diferencias, 'reconstruccion', modelo_ajuste, ahora)
+        modelo_valoracion.objects.all().delete()
+        modelo_valoracion.objects.bulk_create([
+            modelo_valoracion(
+                ubicacion=ubicacion, cantidad=cantidad, valor_gs=valor.quantize(CENTAVOS),
+                movimientos=movimientos, fecha_actualizacion=ahora,
+            )
+            for ubicacion, (cantidad, valor, movimientos) in totales.items()
+        ])
+    return len(totales)
+
+
+def valoracion_actual():
+    """{ubicacion: (cantidad, valor_gs)} de los acumulados vigentes."""
+    return {
+        ubicacion: (cantidad, valor)
+        for ubicacion, cantidad, valor in ValoracionUbicacion.objects.values_list('ubicacion', 'cantidad', 'valor_gs')
+    }
+
+
+# ==========================================================
+# 3. VALORACIÓN A UNA FECHA Y SNAPSHOTS
+# ==========================================================
+
+def fin_del_dia(fecha):
+    """Primer instante del día siguiente (límite exclusivo del cierre de `fecha`)."""
+    return timezone.make_aware(datetime.combine(fecha + timedelta(days=1), time.min))
+
+
+def _combinar(base, efectos, signo):
+    resultado = dict(base)
+    for ubicacion, (cantidad, valor) in efectos.items():
+        cantidad_base, valor_base = resultado.get(ubicacion, (0.0, Decimal('0')))
+        resultado[ubicacion] = (cantidad_base + signo * cantidad, valor_base + signo * valor)
+    # Ubicaciones que no existían todavía (o ya vaciadas) no se listan
+    return {ubicacion: fila for ubicacion, fila in resultado.items() if fila[0] or fila[1]}
+
+
+def ajustes_por_ubicacion(desde=None, hasta=None):
+    """{ubicacion: (cantidad, valor_gs)} de los AjusteValoracion con fecha en [desde, hasta)."""
+    qs = AjusteValoracion.objects.all()
+    if desde is not None:
+        qs = qs.filter(fecha__gte=desde)
+    if hasta is not None:
+        qs = qs.filter(fecha__lt=hasta)
+    filas = qs.order_by().values_list('ubicacion').annotate(cantidad=Sum('cantidad'), valor=Sum('valor_gs'))
+    return {ubicacion: (cantidad or 0.0, Decimal(str(valor or 0))) for ubicacion, cantidad, valor in filas}
+
+
+def cambios_por_ubicacion(desde=None, hasta=None):
+    """Movimientos más ajustes en [desde, hasta): todo lo que cambió los acumulados en el intervalo."""
+    return _combinar(efectos_por_ubicacion(desde, hasta), ajustes_por_ubicacion(desde, hasta), 1)
+
+
+def _filas_snapshot(fecha):
+    return {
+        ubicacion: (cantidad, valor)
+        for ubicacion, cantidad, valor in SnapshotValoracion.objects.filter(fecha=fecha).values_list(
+            'ubicacion', 'cantidad', 'valor_gs'
+        )
+    }
+
+
+def valoracion_al(fecha):
+    """
+    {ubicacion: (cantidad, valor_gs)} al cierre de `fecha`. Parte del punto
+    conocido más cercano (snapshot anterior, snapshot posterior o el acumulado
+    actual) y aplica los movimientos y ajustes del intervalo: un producto dado
+    de alta, trasladado o revalorizado después de `fecha` no aparece antes.
+    Cada movimiento cuenta en la ubicación que tenía el producto al moverse.
+    """
+    hoy = timezone.localdate()
+    if fecha >= hoy:
+        return valoracion_actual()
+
+    exacto = _filas_snapshot(fecha)
+    if exacto:
+        return exacto
+
+    anterior = SnapshotValoracion.objects.filter(fecha__lt=fecha).order_by('-fecha').values_list('fecha', flat=True).first()
+    posterior = SnapshotValoracion.objects.filter(fecha__gt=fecha).order_by('fecha').values_list('fecha', flat=True).first()
+
+    candidatos = [((hoy - fecha).days, 'actual', None)]
+    if anterior:
+        candidatos.append(((fecha - anterior).days, 'anterior', anterior))
+    if posterior:
+        candidatos.append(((posterior - fecha).days, 'posterior', posterior))
+    _, origen, fecha_base = min(candidatos)
+
+    if origen == 'anterior':
+        efectos = cambios_por_ubicacion(desde=fin_del_dia(fecha_base), hasta=fin_del_dia(fecha))
+        return _combinar(_filas_snapshot(fecha_base), efectos, 1)
+    if origen == 'posterior':
+        efectos = cambios_por_ubicacion(desde=fin_del_dia(fecha), hasta=fin_del_dia(fecha_base))
+        return _combinar(_filas_snapshot(fecha_base), efectos, -1)
+    # Desde el acumulado actual se descuenta todo lo posterior al cierre
+    return _combinar(valoracion_actual(), cambios_por_ubicacion(desde=fin_del_dia(fecha)), -1)
+
+
+def tasa_cambio_al(fecha):
+    """Última tasa GS/USD registrada en un ingreso hasta el cierre de `fecha` (None si no hay)."""
+    return (
+        StockMovement.objects
+        .filter(fecha_movimiento__lt=fin_del_dia(fecha), tasa_cambio__gt=1)
+        .order_by('-fecha_movimiento')
+        .values_list('tasa_cambio', flat=True)
+        .first()
+    )
+
+
+def tomar_snapshot(fecha=None):
+    """
+    Guarda (o reemplaza) el snapshot al cierre de `fecha` (hoy por defecto:
+    si se toma antes de terminar el día, queda con los movimientos hasta ahora
+    y se reemplaza en la próxima toma). Retorna la cantidad de ubicaciones.
+    """
+    fecha = fecha or timezone.localdate()
+    # Las ubicaciones vaciadas conservan su acumulado en cero; no se guardan,
+    # igual que valoracion_al() no las lista para días pasados
+    filas = {ubicacion: fila for ubicacion, fila in valoracion_al(fecha).items() if fila[0] or fila[1]}
+    tasa = tasa_cambio_al(fecha)
+
+    snapshots = []
+    for ubicacion, (cantidad, valor) in filas.items():
+        valor = Decimal(str(valor)).quantize(CENTAVOS)
+        snapshots.append(SnapshotValoracion(
+            fecha=fecha,
+            ubicacion=ubicacion,
+            cantidad=cantidad,
+            valor_gs=valor,
+            tasa_cambio=tasa,
+            valor_usd=(valor / tasa).quantize(CENTAVOS) if tasa else None,
+        ))
+
+    with transaction.atomic():
+        SnapshotValoracion.objects.filter(fecha=fecha).exclude(ubicacion__in=filas.keys()).delete()
+        SnapshotValoracion.objects.bulk_create(
+            snapshots,
+            update_conflicts=True,
+            unique_fields=['fecha', 'ubicacion'],
+            update_fields=['cantidad', 'valor_gs', 'tasa_cambio', 'valor_usd', 'fecha_creacion'],
+        )
+    return len(snapshots)
+
+
+def resumen_valoracion(filas, tasa=None):
+    """Filas ordenadas por valor con su porcentaje, y el total general (para la vista)."""
+    total_cantidad = sum(cantidad for cantidad, _ in filas.values())
+    total_valor = sum((Decimal(str(valor)) for _, valor in filas.values()), Decimal('0'))
+    detalle = [
+        {
+            'ubicacion': ubicacion or 'Sin ubicación',
+            'cantidad': cantidad,
+            'valor_gs': Decimal(str(valor)),
+            'porcentaje': float(Decimal(str(valor)) / total_valor * 100) if total_valor else 0.0,
+        }
+        for ubicacion, (cantidad, valor) in filas.items()
+    ]
+    detalle.sort(key=lambda fila: fila['valor_gs'], reverse=True)
+    return {
+        'ubicaciones': detalle,
+        'total_cantidad': total_cantidad,
+        'total_valor_gs': total_valor,
+        'tasa_cambio': tasa,
+        'total_valor_usd': (total_valor / tasa).quantize(CENTAVOS) if tasa else None,
+    }
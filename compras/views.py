@@ -3,23 +3,38 @@ from io import BytesIO
 from django.core.files.base import ContentFile
 import re
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, Http404, JsonResponse, FileResponse
-from django.db.models import Q, F, Max
+from django.http import HttpResponse, Http404, JsonResponse, FileResponse, StreamingHttpResponse
+from django.db.models import Max
 from django.db import transaction 
 from django.contrib import messages 
-from decimal import Decimal
+from decimal import Decimal, InvalidOperation
 from django.utils import timezone
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.core.files.base import ContentFile
+from django.template.loader import render_to_string
+from django.urls import reverse
 import json
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import urlencode
+from django.utils.dateparse import parse_date
 
 # MODELOS
-from .models import Inventario, StockMovement, Factura, FacturaProducto, Proveedor
+from .models import Inventario, StockMovement, Factura, FacturaProducto, Proveedor, TrabajoFactura, SnapshotValoracion
 
 # UTILIDADES
-from .utils import extraer_datos_pdf, generar_pdf_registro_factura
+from .utils import generar_pdf_registro_factura, paginar_por_cursor
+from .busqueda import filtro_busqueda, buscar_productos, cache_autocompletado, normalizar_consulta
+from .movimientos import aplicar_movimientos_lote, leer_lineas_csv, LoteInvalido
+from .ingesta import encolar_factura
+from .valoracion import (
+    ajustar_precios_productos, registrar_movimientos, resumen_valoracion, tasa_cambio_al, valoracion_al,
+)
+from .reposicion import resumen_estados, stream_csv_reposicion, sugerencias_reposicion, totales_reposicion
+from .historial import (
+    AGRUPACIONES, PAGINA_HISTORIAL, CursorInvalido, agregados_movimientos, movimiento_a_dict, pagina_movimientos,
+)
+from mi_proyecto.cache import invalidar_modelos
 # IMPORTACIÓN DE MODELOS EXISTENTES
 from .models import Inventario, StockMovement
 from .models import Proveedor
@@ -29,7 +44,7 @@ from .models import Factura, FacturaProducto
 
 
 # IMPORTACIÓN DE UTILIDADES
-from .utils import extraer_datos_pdf, generar_pdf_registro_factura
+from .utils import generar_pdf_registro_factura
 
 # ==========================================================
 # ⚠️ IMPORTANTE: Todas las vistas existentes quedan igual
@@ -44,17 +59,23 @@ def compras_dashboard(request):
     return render(request, 'compras/compras_dashboard.html', {})
 
 # ==========================================================
-# 2. VISTA DE INVENTARIO Y DEPÓSITO (SIN CAMBIOS)
+# 2. VISTA DE INVENTARIO Y DEPÓSITO (PAGINADA POR CURSOR)
 # ==========================================================
-def deposito_view(request):
-    """Maneja la vista de Inventario y Depósito con filtros."""
-    
-    inventario_qs = Inventario.objects.all() 
+TAMANO_PAGINA_DEPOSITO = 50
+TAMANO_PAGINA_DEPOSITO_MAX = 200
+
+# Columnas que realmente usa el listado (evita traer Descripcion)
+CAMPOS_LISTADO_DEPOSITO = (
+    'CodigoProducto', 'Producto', 'Marca', 'Modelo', 'Cantidad',
+    'Ubicacion', 'MinimoAdmisible', 'PrecioGS', 'PrecioUSD', 'EstadoStock',
+)
+
+
+def filtrar_inventario(request):
+    """Aplica los filtros GET del depósito. Retorna (queryset, filtros)."""
     
-    # 1. Obtener ubicaciones únicas
-    ubicaciones_list = Inventario.objects.exclude(Ubicacion__isnull=True).values_list('Ubicacion', flat=True).distinct().order_by('Ubicacion')
+    inventario_qs = Inventario.objects.only(*CAMPOS_LISTADO_DEPOSITO)
 
-    # 2. Manejo de filtros de la solicitud GET
     search_query = request.GET.get('search')
     exact_code_query = request.GET.get('exact_code') 
     ubicacion_query = request.GET.get('ubicacion')
@@ -63,57 +84,206 @@ def deposito_view(request):
     if exact_code_query:
         inventario_qs = inventario_qs.filter(CodigoProducto=exact_code_query)
     elif search_query:
-        inventario_qs = inventario_qs.filter(
-            Q(Producto__icontains=search_query) |
-            Q(CodigoProducto__icontains=search_query) |
-            Q(Marca__icontains=search_query) |
-            Q(Modelo__icontains=search_query)
-        )
+        inventario_qs = inventario_qs.filter(filtro_busqueda(search_query))
     if ubicacion_query:
         inventario_qs = inventario_qs.filter(Ubicacion=ubicacion_query)
-    if estado_query:
-        if estado_query == 'critico':
-            inventario_qs = inventario_qs.filter(Cantidad__lte=F('MinimoAdmisible'))
-        elif estado_query == 'bajo':
-            inventario_qs = inventario_qs.filter(
-                Cantidad__gt=F('MinimoAdmisible'), 
-                Cantidad__lte=F('MinimoAdmisible') + 10
-            )
-        elif estado_query == 'optimo':
-            inventario_qs = inventario_qs.filter(Cantidad__gt=F('MinimoAdmisible') + 10)
+    if estado_query in ('critico', 'bajo', 'optimo'):
+        # Columna mantenida en Inventario.recalcular_totales (índice EstadoStock, CodigoProducto)
+        inventario_qs = inventario_qs.filter(EstadoStock=estado_query)
 
-    context = {
-        'inventario_list': inventario_qs,
-        'ubicaciones_list': ubicaciones_list,
+    filtros = {
         'search_query': search_query,
         'ubicacion_query': ubicacion_query,
         'estado_query': estado_query,
         'exact_code_query': exact_code_query,
     }
+    return inventario_qs, filtros
+
+
+def paginar_inventario(request, inventario_qs):
+    """
+    Devuelve un bloque del inventario ordenado por CodigoProducto a partir
+    del cursor GET, junto con los enlaces al bloque siguiente.
+    """
+    try:
+        limite = int(request.GET.get('limite', TAMANO_PAGINA_DEPOSITO))
+    except ValueError:
+        limite = TAMANO_PAGINA_DEPOSITO
+    limite = max(1, min(limite, TAMANO_PAGINA_DEPOSITO_MAX))
+
+    cursor = request.GET.get('cursor') or None
+    inventario_list, siguiente_cursor = paginar_por_cursor(
+        inventario_qs, 'CodigoProducto', cursor=cursor, limite=limite
+    )
+
+    siguiente_querystring = ''
+    siguiente_api_url = None
+    if siguiente_cursor is not None:
+        params = request.GET.copy()
+        params['cursor'] = siguiente_cursor
+        siguiente_querystring = params.urlencode()
+        siguiente_api_url = f"{reverse('compras:deposito_api')}?{siguiente_querystring}"
+
+    return {
+        'inventario_list': inventario_list,
+        'cursor_actual': cursor,
+        'siguiente_cursor': siguiente_cursor,
+        'siguiente_querystring': siguiente_querystring,
+        'siguiente_api_url': siguiente_api_url,
+    }
+
+
+def deposito_view(request):
+    """Maneja la vista de Inventario y Depósito con filtros (primer bloque o el del cursor)."""
+    
+    inventario_qs, filtros = filtrar_inventario(request)
+    
+    # Obtener ubicaciones únicas
+    ubicaciones_list = Inventario.objects.exclude(Ubicacion__isnull=True).values_list('Ubicacion', flat=True).distinct().order_by('Ubicacion')
+
+    context = {
+        'ubicaciones_list': ubicaciones_list,
+        **filtros,
+        **paginar_inventario(request, inventario_qs),
+    }
 
     return render(request, 'compras/deposito.html', context)
 
+
+@require_http_methods(["GET"])
+def deposito_api(request):
+    """
+    Variante JSON de deposito_view para scroll incremental.
+    Devuelve los datos del bloque y las filas/tarjetas ya renderizadas.
+    """
+    inventario_qs, filtros = filtrar_inventario(request)
+    pagina = paginar_inventario(request, inventario_qs)
+    inventario_list = pagina['inventario_list']
+
+    items = [
+        {
+            'codigo': item.CodigoProducto,
+            'producto': item.Producto,
+            'marca': item.Marca,
+            'modelo': item.Modelo,
+            'cantidad': item.Cantidad,
+            'minimo': item.MinimoAdmisible,
+            'ubicacion': item.Ubicacion,
+            'precio_gs': item.PrecioGS,
+            'precio_usd': item.PrecioUSD,
+            'url': reverse('compras:detalle_producto', kwargs={'pk': item.CodigoProducto}),
+        }
+        for item in inventario_list
+    ]
+
+    fragmento = {'inventario_list': inventario_list}
+    data = {
+        'items': items,
+        'siguiente_cursor': pagina['siguiente_cursor'],
+        'siguiente_querystring': pagina['siguiente_querystring'],
+        'siguiente_api_url': pagina['siguiente_api_url'],
+        'html_filas': render_to_string('compras/includes/inventario_filas.html', fragmento, request=request),
+        'html_tarjetas': render_to_string('compras/includes/inventario_tarjetas.html', fragmento, request=request),
+    }
+    return JsonResponse(data)
+
 # ==========================================================
-# 3. VISTA DE DETALLE DE PRODUCTO (SIN CAMBIOS)
+# 3. VISTA DE DETALLE DE PRODUCTO E HISTORIAL DE MOVIMIENTOS
 # ==========================================================
+def leer_agregacion(request):
+    """agrupar (dia|semana|mes), desde y hasta del GET; None en las fechas si no vienen o no se entienden."""
+    agrupar = request.GET.get('agrupar', 'mes')
+    if agrupar not in AGRUPACIONES:
+        agrupar = 'mes'
+    fechas = []
+    for nombre in ('desde', 'hasta'):
+        try:
+            fechas.append(parse_date(request.GET.get(nombre) or ''))
+        except ValueError:
+            fechas.append(None)
+    return agrupar, *fechas
+
+
 def detalle_producto_view(request, pk):
-    """Muestra el detalle y movimientos de un producto específico."""
+    """Muestra el detalle, el primer bloque de movimientos y los totales por período de un producto."""
     
     producto = get_object_or_404(Inventario, CodigoProducto=pk)
-    
-    try:
-        movimientos = StockMovement.objects.filter(producto=producto).order_by('-fecha_movimiento')[:20]
-    except Exception as e:
-        print(f"Advertencia: No se pudieron obtener movimientos de stock para {pk}. {e}")
-        movimientos = []
+    agrupar, desde, hasta = leer_agregacion(request)
+
+    movimientos, siguiente_cursor = pagina_movimientos(producto)
+    agregados, inicio, fin = agregados_movimientos(producto, agrupar, desde, hasta)
+
+    siguiente_api_url = None
+    if siguiente_cursor is not None:
+        siguiente_api_url = reverse('compras:historial_movimientos', kwargs={'pk': pk}) + '?' + urlencode({'cursor': siguiente_cursor})
 
     context = {
         'producto': producto,
         'movimientos': movimientos,
+        'siguiente_api_url': siguiente_api_url,
+        'agregados': agregados,
+        'agrupar': agrupar,
+        'agregados_desde': timezone.localtime(inicio).date(),
+        'agregados_hasta': (timezone.localtime(fin) - timedelta(days=1)).date(),
     }
     
     return render(request, 'compras/detalle_producto.html', context)
 
+
+@require_http_methods(["GET"])
+def historial_movimientos_api(request, pk):
+    """
+    Historial paginado por cursor (fecha_movimiento, id) de un producto.
+    Devuelve los datos del bloque y las filas ya renderizadas para la tabla del detalle.
+    """
+    producto = get_object_or_404(Inventario, CodigoProducto=pk)
+    try:
+        limite = int(request.GET.get('limite', PAGINA_HISTORIAL))
+    except ValueError:
+        limite = PAGINA_HISTORIAL
+
+    try:
+        movimientos, siguiente_cursor = pagina_movimientos(producto, request.GET.get('cursor') or None, limite)
+    except CursorInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    siguiente_api_url = None
+    if siguiente_cursor is not None:
+        params = request.GET.copy()
+        params['cursor'] = siguiente_cursor
+        siguiente_api_url = f"{request.path}?{params.urlencode()}"
+
+    return JsonResponse({
+        'producto': producto.CodigoProducto,
+        'items': [movimiento_a_dict(m) for m in movimientos],
+        'siguiente_cursor': siguiente_cursor,
+        'siguiente_api_url': siguiente_api_url,
+        'html_filas': render_to_string('compras/includes/movimiento_filas.html', {'movimientos': movimientos}, request=request),
+    })
+
+
+@require_http_methods(["GET"])
+def agregados_movimientos_api(request, pk):
+    """Cantidades y costos de ENTRADA/SALIDA/AJUSTE por día, semana o mes (?agrupar=, ?desde=, ?hasta=)."""
+    producto = get_object_or_404(Inventario, CodigoProducto=pk)
+    agrupar, desde, hasta = leer_agregacion(request)
+    agregados, inicio, fin = agregados_movimientos(producto, agrupar, desde, hasta)
+
+    periodos = []
+    for fila in agregados:
+        periodo = {'periodo': fila['periodo'].isoformat(), 'neto': fila['neto']}
+        for tipo in ('entrada', 'salida', 'ajuste'):
+            periodo[tipo] = {**fila[tipo], 'costo': str(fila[tipo]['costo'])}
+        periodos.append(periodo)
+
+    return JsonResponse({
+        'producto': producto.CodigoProducto,
+        'agrupar': agrupar,
+        'desde': timezone.localtime(inicio).date().isoformat(),
+        'hasta': (timezone.localtime(fin) - timedelta(days=1)).date().isoformat(),
+        'periodos': periodos,
+    })
+
 # ==========================================================
 # 4. VISTAS DE MOVIMIENTO DE STOCK (SIN CAMBIOS)
 # ==========================================================
@@ -126,17 +296,21 @@ def search_products_ajax(request):
         if len(query) < 3:
             return JsonResponse([], safe=False)
 
-        productos_encontrados = Inventario.objects.filter(
-            Q(CodigoProducto__icontains=query) | Q(Producto__icontains=query)
-        ).values(
-            'CodigoProducto',
-            'Producto',
-            'Marca', 
-            'Modelo', 
-            'Cantidad', 
-        )[:15] 
-
-        data = []
+        # Primero la caché de prefijos (se invalida al mover stock)
+        clave = normalizar_consulta(query)
+        data = cache_autocompletado.obtener(clave)
+        if data is not None:
+            return JsonResponse(data, safe=False)
+
+        # Búsqueda indexada y ordenada por relevancia (ver compras/busqueda.py)
+        limite = 15
+        productos_encontrados = buscar_productos(
+            query,
+            campos=('CodigoProducto', 'Producto', 'Marca', 'Modelo', 'Cantidad'),
+            limite=limite,
+        )
+
+        filas = []
         for p in productos_encontrados:
             stock_display = Decimal(p['Cantidad']).quantize(Decimal('0.01')) if p['Cantidad'] is not None else Decimal('0.00')
             marca = p['Marca'] or 'S/M'
@@ -146,15 +320,29 @@ def search_products_ajax(request):
                 'label': f"[{p['CodigoProducto']}] {p['Producto']} (Stock: {stock_display} | Marca: {marca})",
                 'codigo': p['CodigoProducto'],
                 'nombre': p['Producto'],
-                'stock': stock_display,
+                'stock': str(stock_display),
                 'unidad': p['Modelo'] or 'N/A',
             }
-            data.append(item)
+            texto_buscable = ' '.join(
+                (p[campo] or '') for campo in ('CodigoProducto', 'Producto', 'Marca', 'Modelo')
+            ).lower()
+            filas.append((texto_buscable, item))
 
-        return JsonResponse(data, safe=False)
+        cache_autocompletado.guardar(clave, filas, completo=len(filas) < limite)
+
+        return JsonResponse([item for _, item in filas], safe=False)
     
     raise Http404
 
+
+@login_required
+@require_http_methods(["GET"])
+def search_products_cache_stats(request):
+    """Contadores de la caché del autocompletado (solo staff), para dimensionarla."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Acceso restringido'}, status=403)
+    return JsonResponse(cache_autocompletado.estadisticas())
+
 @require_http_methods(["GET"])
 def get_product_details_ajax(request):
     """Devuelve los detalles de un producto por su código (SKU)."""
@@ -303,13 +491,100 @@ def egreso_stock_view(request):
     
     return render(request, 'compras/egreso_stock.html', {})
 
+@login_required
+@require_http_methods(["POST"])
+def movimiento_stock_lote(request):
+    """
+    API de ingreso/egreso en lote (pallets con muchas líneas) en una sola transacción.
+
+    Acepta:
+    - JSON: {"tipo": "ingreso"|"egreso", "todo_o_nada": false, "lineas": [{...}, ...]}
+    - CSV: archivo 'archivo' (multipart) o cuerpo text/csv, con 'tipo' por GET/POST.
+      Columnas: ver compras.movimientos.COLUMNAS_CSV.
+    Devuelve el resultado de cada línea.
+    """
+    try:
+        if request.content_type == 'application/json':
+            payload = json.loads(request.body or b'{}')
+            if not isinstance(payload, dict):
+                # Un JSON válido pero que no es un objeto ([...], "x", 3)
+                raise ValueError('Se esperaba un objeto JSON')
+            tipo = payload.get('tipo')
+            todo_o_nada = bool(payload.get('todo_o_nada', False))
+            lineas = payload.get('lineas')
+        else:
+            tipo = request.POST.get('tipo') or request.GET.get('tipo')
+            todo_o_nada = (request.POST.get('todo_o_nada') or request.GET.get('todo_o_nada')) in ('1', 'true', 'on')
+            if 'archivo' in request.FILES:
+                texto_csv = request.FILES['archivo'].read().decode('utf-8-sig')
+            else:
+                texto_csv = request.body.decode('utf-8-sig')
+            lineas = leer_lineas_csv(texto_csv)
+
+        resultado = aplicar_movimientos_lote(lineas, tipo, todo_o_nada=todo_o_nada)
+
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'No se pudo leer el lote (JSON/CSV mal formado).'}, status=400)
+    except LoteInvalido as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    status = 200 if resultado['confirmado'] else 422
+    return JsonResponse(resultado, status=status)
+
 # ==========================================================
 # 6. OTRAS VISTAS EXISTENTES (SIN CAMBIOS)
 # ==========================================================
 
 def deposito_dashboard_view(request):
-    """Dashboard específico del depósito."""
-    return render(request, 'compras/deposito_dashboard.html')
+    """Dashboard específico del depósito, con el conteo de productos en alerta."""
+    return render(request, 'compras/deposito_dashboard.html', {'estados_stock': resumen_estados()})
+
+
+def reposicion_view(request):
+    """
+    Sugerencias de reposición (MaximoAdmisible - Cantidad) de los productos en
+    estado crítico o bajo. ?formato=csv descarga el reporte completo en streaming.
+    """
+    ubicacion = request.GET.get('ubicacion') or None
+    sugerencias = sugerencias_reposicion(ubicacion=ubicacion)
+
+    if request.GET.get('formato') == 'csv':
+        response = StreamingHttpResponse(stream_csv_reposicion(sugerencias), content_type='text/csv')
+        nombre = f'reposicion_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv'
+        response['Content-Disposition'] = f'attachment; filename="{nombre}"'
+        return response
+
+    limite = TAMANO_PAGINA_DEPOSITO_MAX
+    context = {
+        'sugerencias': sugerencias[:limite],
+        'limite': limite,
+        'totales': totales_reposicion(sugerencias),
+        'estados_stock': resumen_estados(),
+        'ubicacion_query': ubicacion,
+        'ubicaciones_list': Inventario.objects.exclude(Ubicacion__isnull=True).values_list('Ubicacion', flat=True).distinct().order_by('Ubicacion'),
+    }
+    return render(request, 'compras/reposicion.html', context)
+
+
+def valoracion_view(request):
+    """
+    Valoración del inventario por ubicación y total, hoy o al cierre de una
+    fecha pasada (?fecha=AAAA-MM-DD), desde los acumulados y snapshots de compras/valoracion.py.
+    """
+    hoy = timezone.localdate()
+    try:
+        fecha = parse_date(request.GET.get('fecha') or '') or hoy
+    except ValueError:
+        fecha = hoy
+    fecha = min(fecha, hoy)
+
+    context = {
+        'fecha': fecha,
+        'es_hoy': fecha == hoy,
+        **resumen_valoracion(valoracion_al(fecha), tasa_cambio_al(fecha)),
+        'snapshots_recientes': SnapshotValoracion.objects.values_list('fecha', flat=True).distinct().order_by('-fecha')[:12],
+    }
+    return render(request, 'compras/valoracion.html', context)
 
 def importaciones_view(request):
     """Gestión de importaciones y seguimientos de pedidos internacionales."""
@@ -331,8 +606,8 @@ def locales_view(request):
 def facturas_view(request):
     """
     Vista principal para gestión de facturas - VERSIÓN SIMPLIFICADA.
-    1. Carga el PDF y extrae número de factura + RUC
-    2. Busca el proveedor en BD, SI NO EXISTE LO CREA AUTOMÁTICAMENTE
+    1. Carga el PDF y lo encola; el worker extrae número de factura + RUC
+    2. El worker busca el proveedor en BD, SI NO EXISTE LO CREA AUTOMÁTICAMENTE
     3. Carga datos del proveedor para editar si es necesario
     4. Usuario selecciona productos manualmente
     """
@@ -344,116 +619,54 @@ def facturas_view(request):
         'proveedor_datos': None,  # NUEVO: datos para formulario
         'latest_pdf_url': None,
         'latest_pdf_filename': None,
+        'trabajo_en_curso': None,
+        'trabajo_estado_url': None,
         'facturas_list': Factura.objects.all().order_by('-fecha_emision')[:10],
         'productos_disponibles': Inventario.objects.all().order_by('Producto'),
     }
 
     if request.method == 'POST' and 'factura_file' in request.FILES:
         archivo_pdf = request.FILES['factura_file']
-        
-        print("\n" + "="*80)
-        print("ARCHIVO RECIBIDO EN VISTA")
-        print(f"Nombre: {archivo_pdf.name}")
-        print(f"Tamaño: {archivo_pdf.size} bytes")
-        print("="*80)
+        es_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
         
         # Validar que sea PDF
         if not archivo_pdf.name.lower().endswith('.pdf'):
+            if es_ajax:
+                return JsonResponse({'status': 'error', 'message': 'Solo se permiten archivos PDF'}, status=400)
             messages.error(request, '❌ Solo se permiten archivos PDF')
             return render(request, 'compras/facturas.html', context)
 
-        try:
-            # EXTRACCIÓN SIMPLIFICADA
-            print("\n📄 Extrayendo datos básicos del PDF...")
-            datos_extraidos = extraer_datos_pdf(archivo_pdf)
-            
-            print(f"\n✅ Resultado:")
-            print(f"   Status: {datos_extraidos.get('extraction_status')}")
-            print(f"   Número Factura: {datos_extraidos.get('numero_factura')}")
-            print(f"   RUC Proveedor: {datos_extraidos.get('ruc_proveedor')}")
-            
-            # Validar extracción
-            if datos_extraidos.get('extraction_status') == 'FALLO':
-                messages.error(request, '❌ No se pudieron extraer datos del PDF. Verifica que sea una factura válida.')
-                return render(request, 'compras/facturas.html', context)
-            
-            numero_factura = datos_extraidos.get('numero_factura')
-            ruc_proveedor = datos_extraidos.get('ruc_proveedor')
-            
-            if numero_factura == 'N/A' or ruc_proveedor == 'N/A':
-                messages.error(request, '❌ No se encontró el número de factura o RUC del proveedor. Verifica el PDF.')
-                return render(request, 'compras/facturas.html', context)
-            
-            # ============ BUSCAR O CREAR PROVEEDOR ============
-            print(f"\n🔍 Buscando proveedor con RUC: {ruc_proveedor}")
-            
-            proveedor, created = Proveedor.objects.get_or_create(
-                ruc=ruc_proveedor,
-                defaults={
-                    'nombre': f'Proveedor {ruc_proveedor}',
-                    'activo': True
-                }
-            )
-            
-            if created:
-                print(f"✅ Proveedor CREADO automáticamente: {proveedor.nombre}")
-                messages.info(request, f'ℹ️ Se creó un nuevo proveedor con RUC {ruc_proveedor}. Puedes editar sus datos ahora.')
-            else:
-                print(f"✅ Proveedor encontrado: {proveedor.nombre}")
-            
-            context['proveedor_encontrado'] = proveedor
-            
-            # NUEVO: Preparar datos del proveedor para el formulario editable
-            context['proveedor_datos'] = {
-                'ruc': proveedor.ruc,
-                'nombre': proveedor.nombre,
-                'email': proveedor.email or '',
-                'telefono': proveedor.telefono or '',
-                'direccion': proveedor.direccion or '',
-                'contacto': proveedor.contacto or '',
-            }
-            
-            # Crear o actualizar factura
-            factura, created = Factura.objects.get_or_create(
-                numero_factura=numero_factura,
-                defaults={
-                    'proveedor': proveedor,
-                    'ruc_proveedor': ruc_proveedor,
-                    'fecha_emision': timezone.now().date(),
-                    'monto_total': Decimal('0'),
-                    'pdf_original': archivo_pdf,
-                    'usuario': request.user,
-                    'estado': 'pendiente'
-                }
-            )
-            
-            if not created:
-                # Actualizar si ya existe
-                if factura.estado == 'procesada':
-                    messages.warning(request, f'⚠️ La factura {numero_factura} ya fue procesada.')
-                    return render(request, 'compras/facturas.html', context)
-                
-                factura.proveedor = proveedor
-                factura.pdf_original = archivo_pdf
-                factura.save()
-                print(f"✅ Factura actualizada: {factura.id}")
-            else:
-                print(f"✅ Factura creada: {factura.id}")
-            
-            # Guardar en sesión
-            request.session['factura_actual_id'] = factura.id
-            context['factura_datos_basicos'] = datos_extraidos
-            context['latest_pdf_url'] = factura.pdf_original.url
-            context['latest_pdf_filename'] = archivo_pdf.name
-            
-            messages.success(request, f'✅ Factura {numero_factura} cargada. Revisa los datos del proveedor y selecciona los productos.')
-                
-        except Exception as e:
-            print(f"\n❌ ERROR CRÍTICO: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            messages.error(request, f'❌ Error: {str(e)[:100]}')
-            return render(request, 'compras/facturas.html', context)
+        # La extracción corre en el worker (manage.py procesar_facturas):
+        # la petición solo guarda el PDF y responde con el id del trabajo
+        trabajo = encolar_factura(archivo_pdf, request.user)
+        request.session['trabajo_factura_id'] = trabajo.id
+        request.session.pop('factura_actual_id', None)
+
+        if es_ajax:
+            return JsonResponse({
+                'status': 'ok',
+                'trabajo_id': trabajo.id,
+                'estado': trabajo.estado,
+                'estado_url': reverse('compras:estado_trabajo_factura', args=[trabajo.id]),
+            }, status=202)
+
+        messages.info(request, f'⏳ {archivo_pdf.name} recibido. Extrayendo Nro. de Factura y RUC...')
+        return redirect('compras:facturas')
+
+    # Trabajo de extracción en curso (o terminado mientras no se consultaba)
+    if 'trabajo_factura_id' in request.session:
+        trabajo = TrabajoFactura.objects.filter(
+            id=request.session['trabajo_factura_id'], usuario=request.user
+        ).first()
+        if trabajo is None:
+            request.session.pop('trabajo_factura_id', None)
+        elif trabajo.terminado:
+            consumir_trabajo_factura(request, trabajo)
+            # Mostrar los mensajes recién agregados en esta misma respuesta
+            return redirect('compras:facturas')
+        else:
+            context['trabajo_en_curso'] = trabajo
+            context['trabajo_estado_url'] = reverse('compras:estado_trabajo_factura', args=[trabajo.id])
 
     # Recuperar de sesión si existe
     if 'factura_actual_id' in request.session:
@@ -484,6 +697,79 @@ def facturas_view(request):
     return render(request, 'compras/facturas.html', context)
 
 
+def consumir_trabajo_factura(request, trabajo):
+    """
+    Traslada a la sesión el resultado de un trabajo terminado: si se extrajo,
+    deja la factura lista para cargar productos; si falló, informa el error.
+    """
+    request.session.pop('trabajo_factura_id', None)
+
+    if trabajo.estado == 'extraida' and trabajo.factura_id:
+        request.session['factura_actual_id'] = trabajo.factura_id
+        numero_factura = trabajo.factura.numero_factura
+        if trabajo.proveedor_creado:
+            messages.info(request, f'ℹ️ Se creó un nuevo proveedor con RUC {trabajo.factura.ruc_proveedor}. Puedes editar sus datos ahora.')
+        messages.success(request, f'✅ Factura {numero_factura} cargada. Revisa los datos del proveedor y selecciona los productos.')
+    else:
+        messages.error(request, f'❌ {trabajo.mensaje or "No se pudieron extraer datos del PDF."}')
+
+
+@login_required
+def estado_trabajo_factura(request, trabajo_id):
+    """
+    Estado de un trabajo de extracción (JSON), consultado periódicamente por la
+    página de facturas. Al terminar, el resultado pasa a la sesión y la página se recarga.
+    """
+    trabajo = get_object_or_404(
+        TrabajoFactura.objects.select_related('factura'), id=trabajo_id, usuario=request.user
+    )
+
+    data = {
+        'trabajo_id': trabajo.id,
+        'estado': trabajo.estado,
+        'estado_display': trabajo.get_estado_display(),
+        'terminado': trabajo.terminado,
+        'mensaje': trabajo.mensaje,
+        'factura_id': trabajo.factura_id,
+        'numero_factura': trabajo.factura.numero_factura if trabajo.factura else None,
+    }
+
+    if trabajo.terminado and request.session.get('trabajo_factura_id') == trabajo.id:
+        consumir_trabajo_factura(request, trabajo)
+
+    return JsonResponse(data)
+
+
+def leer_lineas_factura(post):
+    """
+    Lee las filas producto_id_N / cantidad_N / precio_unitario_N del formulario,
+    sin importar cuántas sean ni si hay huecos en la numeración.
+    Omite filas vacías, con cantidad <= 0 o con números inválidos.
+    """
+    indices = sorted(
+        int(m.group(1)) for m in (re.fullmatch(r'producto_id_(\d+)', clave) for clave in post.keys()) if m
+    )
+    
+    lineas = []
+    for indice in indices:
+        codigo_producto = post.get(f'producto_id_{indice}')
+        if not codigo_producto:
+            continue
+        try:
+            cantidad = Decimal(str(post.get(f'cantidad_{indice}', '0')))
+            precio_unitario = Decimal(str(post.get(f'precio_unitario_{indice}', '0')))
+        except (InvalidOperation, ValueError):
+            continue
+        if cantidad <= 0:
+            continue
+        lineas.append({
+            'codigo': codigo_producto,
+            'cantidad': cantidad,
+            'precio_unitario': precio_unitario,
+        })
+    return lineas
+
+
 @login_required
 @require_http_methods(["POST"])
 @transaction.atomic
@@ -532,73 +818,86 @@ def guardar_factura(request):
         else:
             print("⚠️ No se proporcionó nombre del proveedor\n")
         
+        # ============ LÍNEAS DE LA FACTURA (SIN LÍMITE DE FILAS) ============
+        lineas = leer_lineas_factura(request.POST)
         items_procesados = []
         monto_total = Decimal('0')
         
-        # Iterar sobre los productos seleccionados en el formulario
-        contador = 1
-        while True:
-            codigo_producto = request.POST.get(f'producto_id_{contador}')
-            cantidad_str = request.POST.get(f'cantidad_{contador}', '0')
-            precio_unitario_str = request.POST.get(f'precio_unitario_{contador}', '0')
-            
-            if not codigo_producto:
-                contador += 1
-                if contador > 50:
-                    break
-                continue
-            
-            try:
-                cantidad = Decimal(str(cantidad_str))
-                precio_unitario = Decimal(str(precio_unitario_str))
-            except:
-                contador += 1
-                continue
-            
-            if cantidad <= 0:
-                contador += 1
-                continue
-            
-            # Obtener producto del inventario
-            producto = Inventario.objects.select_for_update().get(CodigoProducto=codigo_producto)
+        if lineas:
+            # 1. Un único SELECT ... FOR UPDATE para todos los SKUs de la factura
+            codigos = sorted({linea['codigo'] for linea in lineas})
+            productos = {
+                p.CodigoProducto: p
+                for p in Inventario.objects.select_for_update().filter(CodigoProducto__in=codigos).order_by('CodigoProducto')
+            }
+            faltantes = [c for c in codigos if c not in productos]
+            if faltantes:
+                transaction.set_rollback(True)
+                messages.error(request, f'❌ Producto no encontrado: {", ".join(faltantes)}')
+                return redirect('compras:facturas')
             
-            # 1. Crear detalle de factura
-            FacturaProducto.objects.create(
-                factura=factura,
-                producto=producto,
-                cantidad=cantidad,
-                precio_unitario=precio_unitario
-            )
+            ahora = timezone.now()
+            detalles = []
+            movimientos = []
             
-            # 2. Actualizar Inventario
-            producto.Cantidad += float(cantidad)
-            producto.PrecioGS = float(precio_unitario)
-            producto.FechaUltimoMovimiento = timezone.now()
-            producto.save()
+            for linea in lineas:
+                producto = productos[linea['codigo']]
+                cantidad = linea['cantidad']
+                precio_unitario = linea['precio_unitario']
+                
+                # Detalle de factura
+                detalle = FacturaProducto(
+                    factura=factura,
+                    producto=producto,
+                    cantidad=float(cantidad),
+                    precio_unitario=precio_unitario
+                )
+                detalle.calcular_subtotal()
+                detalles.append(detalle)
+                
+                # Inventario (se acumula si el SKU se repite en varias líneas)
+                producto.Cantidad += float(cantidad)
+                producto.PrecioGS = float(precio_unitario)
+                producto.FechaUltimoMovimiento = ahora
+                
+                # Movimiento de Stock
+                costo_total = cantidad * precio_unitario
+                movimientos.append(StockMovement(
+                    producto=producto,
+                    tipo_movimiento='ENTRADA',
+                    cantidad_movida=float(cantidad),
+                    costo_unitario=precio_unitario,
+                    costo_total=costo_total,
+                    referencia=f"FAC {factura.numero_factura}",
+                    motivo=f"Compra a {factura.proveedor.nombre}",
+                    fecha_movimiento=ahora,
+                    ubicacion=producto.Ubicacion or '',
+                ))
+                
+                # Acumular para total
+                monto_total += costo_total
+                
+                items_procesados.append({
+                    'codigo': producto.CodigoProducto,
+                    'producto': producto.Producto,
+                    'cantidad': float(cantidad),
+                    'precio': float(precio_unitario),
+                })
             
-            # 3. Crear Movimiento de Stock
-            costo_total = cantidad * precio_unitario
-            StockMovement.objects.create(
-                producto=producto,
-                tipo_movimiento='ENTRADA',
-                cantidad_movida=float(cantidad),
-                costo_unitario=precio_unitario,
-                costo_total=costo_total,
-                referencia=f"FAC {factura.numero_factura}",
-                motivo=f"Compra a {factura.proveedor.nombre}"
+            # 2. Escritura en bloque: detalles, stock y movimientos
+            for producto in productos.values():
+                producto.recalcular_totales()
+            FacturaProducto.objects.bulk_create(detalles)
+            Inventario.objects.bulk_update(
+                list(productos.values()),
+                ['Cantidad', 'PrecioGS', 'PrecioTotalGS', 'FechaUltimoMovimiento', 'EstadoStock']
             )
-            
-            # Acumular para total
-            monto_total += costo_total
-            
-            items_procesados.append({
-                'codigo': producto.CodigoProducto,
-                'producto': producto.Producto,
-                'cantidad': float(cantidad),
-                'precio': float(precio_unitario),
-            })
-            
-            contador += 1
+            ajustar_precios_productos(productos.values())
+            StockMovement.objects.bulk_create(movimientos)
+            # bulk_* no dispara señales: se invalida la caché del autocompletado y se valora a mano
+            transaction.on_commit(cache_autocompletado.invalidar)
+            invalidar_modelos(Inventario)
+            registrar_movimientos(movimientos)
         
         if not items_procesados:
             messages.error(request, '❌ Debes seleccionar al menos un producto.')
@@ -630,9 +929,9 @@ def guardar_factura(request):
         )
         return redirect('compras:facturas')
         
-    except Inventario.DoesNotExist as e:
-        messages.error(request, f'❌ Producto no encontrado: {str(e)}')
     except Exception as e:
+        # Nada a medias: se descarta todo lo escrito en esta factura
+        transaction.set_rollback(True)
         messages.error(request, f'❌ Error al guardar: {str(e)[:150]}')
         import traceback
         traceback.print_exc()
@@ -2,7 +2,10 @@
 
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import PerfilEmpleado, RegistroJornada, SolicitudLibre
+from mi_proyecto.cache import invalidar_modelos
+from .models import PerfilEmpleado, RegistroJornada, SolicitudLibre, SaldoMensual, SaldoHoras
+from .saldos import recalcular_meses
+from .calendario import invalidar_meses
 
 # ============================================================
 # ADMIN PARA PERFILES DE EMPLEADOS
@@ -74,12 +77,18 @@ class RegistroJornadaAdmin(admin.ModelAdmin):
     actions = ['marcar_como_salida_forzada', 'limpiar_salida_forzada']
     
     def marcar_como_salida_forzada(self, request, queryset):
+        afectados = list(queryset.values_list('empleado_id', 'fecha'))
         updated = queryset.update(salida_forzada=True)
+        invalidar_meses('horas', afectados)
+        invalidar_modelos(RegistroJornada)
         self.message_user(request, f'✅ {updated} registro(s) marcado(s).')
     marcar_como_salida_forzada.short_description = '🚨 Marcar como salida forzada'
     
     def limpiar_salida_forzada(self, request, queryset):
+        afectados = list(queryset.values_list('empleado_id', 'fecha'))
         updated = queryset.update(salida_forzada=False)
+        invalidar_meses('horas', afectados)
+        invalidar_modelos(RegistroJornada)
         self.message_user(request, f'✅ Marca eliminada de {updated} registro(s).')
     limpiar_salida_forzada.short_description = '✔️  Limpiar salida forzada'
 
@@ -122,16 +131,44 @@ class SolicitudLibreAdmin(admin.ModelAdmin):
     actions = ['aprobar_solicitudes', 'rechazar_solicitudes']
     
     def aprobar_solicitudes(self, request, queryset):
-        updated = queryset.filter(estado='PENDIENTE').update(estado='APROBADO')
+        pendientes = queryset.filter(estado='PENDIENTE')
+        afectados = list(pendientes.values_list('empleado_id', 'fecha_libre'))
+        updated = pendientes.update(estado='APROBADO')
+        # update() no dispara señales: se actualizan el libro de saldos y el calendario a mano
+        recalcular_meses(afectados)
+        invalidar_meses('solicitudes', afectados)
         self.message_user(request, f'✅ {updated} solicitud(es) aprobada(s).')
     aprobar_solicitudes.short_description = '✅ Aprobar'
     
     def rechazar_solicitudes(self, request, queryset):
-        updated = queryset.filter(estado='PENDIENTE').update(estado='RECHAZADO')
+        pendientes = queryset.filter(estado='PENDIENTE')
+        afectados = list(pendientes.values_list('empleado_id', 'fecha_libre'))
+        updated = pendientes.update(estado='RECHAZADO')
+        invalidar_meses('solicitudes', afectados)
         self.message_user(request, f'❌ {updated} solicitud(es) rechazada(s).')
     rechazar_solicitudes.short_description = '❌ Rechazar'
 
 
+
+# ============================================================
+# ADMIN PARA EL LIBRO DE SALDOS (SOLO LECTURA)
+# ============================================================
+
+@admin.register(SaldoHoras)
+class SaldoHorasAdmin(admin.ModelAdmin):
+    list_display = ('empleado', 'horas_extras', 'horas_usadas', 'saldo', 'actualizado')
+    search_fields = ('empleado__username',)
+    readonly_fields = ('empleado', 'horas_extras', 'horas_usadas', 'actualizado')
+
+
+@admin.register(SaldoMensual)
+class SaldoMensualAdmin(admin.ModelAdmin):
+    list_display = ('empleado', 'anio', 'mes', 'horas_extras', 'horas_usadas', 'saldo', 'actualizado')
+    list_filter = ('anio', 'mes')
+    search_fields = ('empleado__username',)
+    readonly_fields = ('empleado', 'anio', 'mes', 'horas_extras', 'horas_usadas', 'actualizado')
+
+
 # Customización
 admin.site.site_header = "Control de Horas"
 admin.site.site_title = "Sistema de Control"
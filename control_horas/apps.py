@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class ControlHorasConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'control_horas'
+
+    def ready(self):
+        from mi_proyecto.cache import conectar_invalidacion
+        from . import signals  # noqa: F401
+        conectar_invalidacion(self)
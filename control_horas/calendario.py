@@ -0,0 +1,328 @@
+# ============================================================
+# control_horas/calendario.py - FEED DEL CALENDARIO (FullCalendar)
+# ============================================================
+#
+# journal_data_api responde siempre sobre una ventana acotada de fechas. Los
+# eventos se arman por (tipo, empleado, mes) y se guardan en caché bajo una
+# versión por empleado y mes; la versión es la marca de tiempo del último
+# cambio de ese mes, así que también sirve para ETag/Last-Modified:
+#   - Navegar el calendario hacia meses ya vistos no toca la base de datos.
+#   - Si nada cambió, el navegador recibe un 304 sin cuerpo.
+# Las versiones solo son permanentes con una caché compartida entre procesos
+# (SYM_CACHE 'archivo' o 'redis'); en memoria vencen a los pocos minutos.
+#
+# Cualquier escritura sobre RegistroJornada o SolicitudLibre debe llamar a
+# invalidar_meses (las señales lo hacen; bulk_create/update() a mano).
+
+import hashlib
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.urls import reverse
+
+from .models import RegistroJornada, SolicitudLibre
+
+TIPOS = ('horas', 'solicitudes')
+
+# FullCalendar pide como mucho 6 semanas (vista mensual); se deja margen
+# para los filtros fecha_inicio/fecha_fin del formulario
+MAX_DIAS_VENTANA = 62
+TIEMPO_CACHE_EVENTOS = 60 * 60 * 24
+
+# Con la caché en memoria (SYM_CACHE='memoria', propia de cada proceso) una
+# escritura en otro worker, el admin o upload_excel solo invalida su propio
+# proceso: versiones y eventos vencen pronto para acotar cuánto tiempo otro
+# proceso puede seguir sirviendo (y respondiendo 304 sobre) eventos viejos
+TIEMPO_CACHE_LOCAL = 60 * 5
+BACKENDS_COMPARTIDOS = ('archivo', 'redis')
+
+COLORES_SOLICITUD = {'APROBADO': '#10b981', 'PENDIENTE': '#f59e0b', 'RECHAZADO': '#dc3545'}
+CLASES_SOLICITUD = {
+    'APROBADO': 'fc-event-day_libre-aprobado',
+    'PENDIENTE': 'fc-event-day_libre-pendiente',
+    'RECHAZADO': 'fc-event-day_libre-rechazado',
+}
+
+
+def _tiempos_cache():
+    """(timeout de las versiones, timeout de los eventos) según el backend."""
+    if getattr(settings, 'SYM_CACHE', 'memoria') in BACKENDS_COMPARTIDOS:
+        return None, TIEMPO_CACHE_EVENTOS
+    return TIEMPO_CACHE_LOCAL, TIEMPO_CACHE_LOCAL
+
+
+def _clave_version(tipo, empleado_id, anio, mes):
+    return f'calendario:version:{tipo}:{empleado_id}:{anio}-{mes:02d}'
+
+
+def _clave_eventos(tipo, empleado_id, anio, mes, version):
+    return f'calendario:eventos:{tipo}:{empleado_id}:{anio}-{mes:02d}:{version}'
+
+
+# ============================================================
+# 1. VENTANA DE FECHAS
+# ============================================================
+
+def _leer_fecha(valor):
+    """Acepta '2025-03-01' o el ISO completo que envía FullCalendar ('2025-03-01T00:00:00-03:00')."""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor[:10], '%Y-%m-%d').date()
+    except ValueError:
+        return None
+
+
+def ventana_desde_parametros(params, hoy=None):
+    """
+    (inicio, fin) con fin exclusivo. Usa el rango visible de FullCalendar
+    (start/end) acotado por los filtros fecha_inicio/fecha_fin; sin nada,
+    el mes en curso. Nunca supera MAX_DIAS_VENTANA.
+    """
+    inicio = _leer_fecha(params.get('start'))
+    fin = _leer_fecha(params.get('end'))
+
+    filtro_inicio = _leer_fecha(params.get('fecha_inicio'))
+    filtro_fin = _leer_fecha(params.get('fecha_fin'))
+    if filtro_inicio and (inicio is None or filtro_inicio > inicio):
+        inicio = filtro_inicio
+    if filtro_fin and (fin is None or filtro_fin + timedelta(days=1) < fin):
+        fin = filtro_fin + timedelta(days=1)
+
+    if inicio is None and fin is None:
+        hoy = hoy or date.today()
+        inicio = hoy.replace(day=1)
+    elif inicio is None:
+        inicio = fin - timedelta(days=MAX_DIAS_VENTANA)
+
+    if fin is None or fin > inicio + timedelta(days=MAX_DIAS_VENTANA):
+        fin = inicio + timedelta(days=MAX_DIAS_VENTANA)
+    return inicio, max(inicio, fin)
+
+
+def meses_de_ventana(inicio, fin):
+    """[(anio, mes)] que toca el rango [inicio, fin)."""
+    meses = []
+    anio, mes = inicio.year, inicio.month
+    while date(anio, mes, 1) < fin:
+        meses.append((anio, mes))
+        anio, mes = (anio + 1, 1) if mes == 12 else (anio, mes + 1)
+    return meses
+
+
+# ============================================================
+# 2. VERSIONES E INVALIDACIÓN
+# ============================================================
+
+def invalidar_meses(tipo, pares):
+    """
+    Marca como modificados los meses de `pares` [(empleado_id, fecha)].
+    Se aplica al confirmar la transacción para que nadie cachee datos viejos
+    bajo la versión nueva.
+    """
+    claves = {_clave_version(tipo, empleado_id, fecha.year, fecha.month) for empleado_id, fecha in pares}
+    if not claves:
+        return
+
+    def _marcar():
+        version = time.time_ns()
+        cache.set_many({clave: version for clave in claves}, timeout=_tiempos_cache()[0])
+
+    transaction.on_commit(_marcar)
+
+
+def versiones(tipo, empleado_ids, meses):
+    """
+    {(empleado_id, anio, mes): version}. Un mes sin versión en caché (caché
+    reiniciada) se marca como modificado ahora: nunca se sirve algo viejo.
+    """
+    claves = {
+        (empleado_id, anio, mes): _clave_version(tipo, empleado_id, anio, mes)
+        for empleado_id in empleado_ids for anio, mes in meses
+    }
+    encontradas = cache.get_many(list(claves.values()))
+
+    faltantes = {clave: valor for clave, valor in claves.items() if valor not in encontradas}
+    if faltantes:
+        ahora = time.time_ns()
+        cache.set_many({valor: ahora for valor in faltantes.values()}, timeout=_tiempos_cache()[0])
+        encontradas.update({valor: ahora for valor in faltantes.values()})
+
+    return {clave: encontradas[valor] for clave, valor in claves.items()}
+
+
+def validadores(tipo, ventana, versiones_por_mes):
+    """(etag, last_modified) de la respuesta a partir de las versiones involucradas."""
+    firma = hashlib.sha1(
+        repr((tipo, ventana, sorted(versiones_por_mes.items()))).encode()
+    ).hexdigest()
+    ultima = max(versiones_por_mes.values(), default=0)
+    return f'"{firma}"', ultima // 1_000_000_000
+
+
+# ============================================================
+# 3. ARMADO DE EVENTOS
+# ============================================================
+
+def _eventos_jornadas(filas, formatear):
+    # Un solo reverse(): el resto de las URLs sale de la plantilla
+    plantilla_url = reverse('control_horas:editar_registro', args=[0]).replace('/0/', '/{}/')
+
+    for fila in filas:
+        empleado_nombre = fila['empleado__username'].capitalize()
+        url_edicion = plantilla_url.format(fila['id'])
+        entrada = fila['entrada'].strftime('%H:%M') if fila['entrada'] else 'N/A'
+
+        if fila['salida_forzada'] or fila['horas_netas'] is None:
+            yield {
+                'id': fila['id'],
+                'title': f'⚠️ Error: Entrada {entrada}',
+                'start': fila['fecha'].isoformat(),
+                'allDay': True,
+                'backgroundColor': '#f97316',
+                'borderColor': '#f97316',
+                'url': url_edicion,
+                'extendedProps': {
+                    'tipo': 'incompleto',
+                    'empleado': empleado_nombre,
+                    'entrada': entrada,
+                    'salida': fila['salida'].strftime('%H:%M') if fila['salida'] else 'N/A',
+                    'horas_netas': 'N/A',
+                    'horas_extras': 'N/A',
+                    'mensaje': 'Registro Incompleto. Requiere corrección.',
+                },
+                'className': 'fc-event-jornada-base'
+            }
+            continue
+
+        saldo_display = formatear(fila['horas_extras'])
+        horas_netas_display = formatear(fila['horas_netas'])
+        if fila['horas_extras'] and fila['horas_extras'] > timedelta(minutes=0):
+            bg_color = '#10b981'
+            title = f'✅ {horas_netas_display} (+{saldo_display} Extra)'
+        else:
+            bg_color = '#60a5fa'
+            title = f'✔️ {horas_netas_display}'
+
+        yield {
+            'id': fila['id'],
+            'title': title,
+            'start': fila['fecha'].isoformat(),
+            'allDay': True,
+            'backgroundColor': bg_color,
+            'borderColor': bg_color,
+            'url': url_edicion,
+            'extendedProps': {
+                'tipo': 'completo',
+                'empleado': empleado_nombre,
+                'entrada': entrada,
+                'salida': fila['salida'].strftime('%H:%M') if fila['salida'] else 'N/A',
+                'horas_netas': horas_netas_display,
+                'horas_extras': saldo_display,
+            },
+            'className': 'fc-event-jornada-base'
+        }
+
+
+def _eventos_solicitudes(filas, formatear):
+    for fila in filas:
+        empleado_nombre = fila['empleado__username'].capitalize()
+        color = COLORES_SOLICITUD.get(fila['estado'], '#6c757d')
+        yield {
+            'id': f'sol-{fila["id"]}',
+            'title': f'{empleado_nombre} ({fila["estado"]})',
+            'start': fila['fecha_libre'].isoformat(),
+            'allDay': True,
+            'backgroundColor': color,
+            'borderColor': color,
+            'extendedProps': {
+                'empleado': empleado_nombre,
+                'estado': fila['estado'],
+                'horas_solicitadas': formatear(fila['horas_solicitadas']),
+                'motivo': fila['motivo'] or 'No especificado',
+                'tipo': 'dia_libre',
+            },
+            'className': CLASES_SOLICITUD.get(fila['estado'], 'fc-event-other')
+        }
+
+
+# Por tipo: modelo, campo de fecha, columnas necesarias y armador de eventos
+FUENTES = {
+    'horas': (
+        RegistroJornada, 'fecha',
+        ('id', 'empleado_id', 'empleado__username', 'fecha', 'entrada', 'salida',
+         'horas_netas', 'horas_extras', 'salida_forzada'),
+        _eventos_jornadas,
+    ),
+    'solicitudes': (
+        SolicitudLibre, 'fecha_libre',
+        ('id', 'empleado_id', 'empleado__username', 'fecha_libre', 'estado', 'horas_solicitadas', 'motivo'),
+        _eventos_solicitudes,
+    ),
+}
+
+
+def _eventos_desde_base(tipo, empleado_ids, meses, formatear):
+    """{(empleado_id, anio, mes): [eventos]} de los meses pedidos, con una sola consulta."""
+    modelo, campo_fecha, columnas, armar = FUENTES[tipo]
+    anio, mes = meses[-1]
+    fin = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+
+    filas = (
+        modelo.objects.filter(
+            empleado_id__in=empleado_ids,
+            **{f'{campo_fecha}__gte': date(*meses[0], 1), f'{campo_fecha}__lt': fin},
+        )
+        .values(*columnas)
+        .order_by(campo_fecha, 'id')
+    )
+
+    por_mes = defaultdict(list)
+    for fila in filas:
+        fecha = fila[campo_fecha]
+        por_mes[(fila['empleado_id'], fecha.year, fecha.month)].append(fila)
+
+    return {clave: list(armar(filas_mes, formatear)) for clave, filas_mes in por_mes.items()}
+
+
+def eventos_calendario(tipo, empleado_ids, inicio, fin, versiones_por_mes, formatear):
+    """
+    Eventos de `tipo` de los empleados en [inicio, fin), ordenados por fecha.
+    Cada (empleado, mes) sale de la caché; los que faltan se arman todos
+    juntos con una consulta y se guardan.
+    """
+    claves = {
+        clave: _clave_eventos(tipo, *clave, version)
+        for clave, version in versiones_por_mes.items()
+    }
+    en_cache = cache.get_many(list(claves.values()))
+
+    faltantes = [clave for clave, valor in claves.items() if valor not in en_cache]
+    por_mes = {clave: en_cache[valor] for clave, valor in claves.items() if valor in en_cache}
+    if faltantes:
+        nuevos = _eventos_desde_base(
+            tipo,
+            sorted({empleado_id for empleado_id, _, _ in faltantes}),
+            sorted({(anio, mes) for _, anio, mes in faltantes}),
+            formatear,
+        )
+        guardar = {}
+        for clave in faltantes:
+            eventos = nuevos.get(clave, [])
+            por_mes[clave] = eventos
+            guardar[claves[clave]] = eventos
+        cache.set_many(guardar, timeout=_tiempos_cache()[1])
+
+    desde, hasta = inicio.isoformat(), fin.isoformat()
+    eventos = [
+        evento
+        for clave in sorted(por_mes)
+        for evento in por_mes[clave]
+        if desde <= evento['start'] < hasta
+    ]
+    eventos.sort(key=lambda evento: evento['start'])
+    return eventos
@@ -68,6 +68,28 @@ class UploadFileForm(forms.Form):
     # ¡CRÍTICO! Cambiamos 'file' a 'archivo' para que coincida con views.py
     archivo = forms.FileField(label='Selecciona el archivo Excel de Jornadas:')
 
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    """FileField que acepta varios archivos y devuelve una lista."""
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(MultipleFileField, self).clean(d, initial) for d in data]
+        return [super().clean(data, initial)]
+
+
+class UploadLoteForm(forms.Form):
+    archivos = MultipleFileField(
+        label='Selecciona varios archivos de Jornadas o un ZIP',
+        help_text='Excel (.xlsx/.xlsm), CSV o un .zip con los reportes del reloj de varios empleados.'
+    )
+
 # =================================================================
 # 2. Formulario para Solicitud de Días Libres
 # =================================================================
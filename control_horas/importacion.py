@@ -0,0 +1,406 @@
+# ============================================================
+# control_horas/importacion.py - IMPORTACIÓN DE MARCACIONES
+# ============================================================
+#
+# Dos etapas separadas:
+#   1. Parseo (sin base de datos): lee las filas del XLSX en modo read-only
+#      (iter_rows(values_only=True)) o del CSV, y arma en memoria un dict
+#      {fecha: jornada} con el número de afiliación del empleado.
+#   2. Guardado: un único bulk_create(update_conflicts=True) sobre
+#      (empleado, fecha) y la actualización del libro de saldos.
+#
+# El parseo no toca la base de datos: es una función de (nombre, bytes), y
+# en las cargas por lote (muchos archivos o un ZIP) corre en un pool de procesos.
+
+import csv
+import io
+import os
+import re
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime, time, timedelta
+from itertools import repeat
+
+from django.db import transaction
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from mi_proyecto.cache import invalidar_modelos
+
+from . import proceso_parseo
+from .models import PerfilEmpleado, RegistroJornada
+from .saldos import recalcular_meses
+from .calendario import invalidar_meses
+
+# Mapeo de meses en español a inglés para el parseo
+MESES = {
+    'octubre': 'October', 'noviembre': 'November', 'diciembre': 'December',
+    'enero': 'January', 'febrero': 'February', 'marzo': 'March',
+    'abril': 'April', 'mayo': 'May', 'junio': 'June',
+    'julio': 'July', 'agosto': 'August', 'septiembre': 'September',
+}
+
+EVENTOS = {
+    'inicio de jornada': 'entrada',
+    'finaliza la jornada': 'salida',
+}
+
+EVENTOS_IGNORADOS = ('pausa de jornada (comida)', 'reanuda la jornada')
+
+# Celda del número de afiliación en los XLSX del reloj (E3)
+FILA_AFILIACION, COLUMNA_AFILIACION = 2, 4
+PATRON_AFILIACION = re.compile(r'N.*?AFILIAC.*?(\d+)', re.IGNORECASE | re.DOTALL)
+
+# Misma salida por defecto que save_incomplete_jornada
+SALIDA_POR_DEFECTO = time(hour=17, minute=0)
+
+CAMPOS_JORNADA = ['entrada', 'salida', 'horas_netas', 'horas_extras', 'salida_forzada']
+
+EXTENSIONES_JORNADA = ('xlsx', 'xlsm', 'csv')
+
+# Procesos para parsear lotes (openpyxl es CPU puro: los hilos no escalan por el GIL)
+MAX_PROCESOS_PARSEO = 4
+
+# Límites al descomprimir un ZIP subido (un ZIP de pocos KB puede declarar
+# gigas): archivos por ZIP, tamaño de cada archivo y total descomprimido
+MAX_ARCHIVOS_ZIP = 1000
+MAX_TAMANO_ARCHIVO_ZIP = 20 * 1024 * 1024
+MAX_TAMANO_TOTAL_ZIP = 200 * 1024 * 1024
+
+
+# ============================================================
+# 1. LECTURA DE FILAS
+# ============================================================
+
+def _texto_celda(valor):
+    """Mismo texto que producía el paso intermedio por CSV (None -> '')."""
+    return '' if valor is None else str(valor)
+
+
+def leer_xlsx(contenido):
+    """Retorna (nro_afiliacion, filas) leyendo el XLSX en modo read-only."""
+    libro = load_workbook(io.BytesIO(contenido), read_only=True)
+    try:
+        hoja = libro.active
+        nro_afiliacion = None
+        filas = []
+        for indice, fila in enumerate(hoja.iter_rows(values_only=True)):
+            if indice == FILA_AFILIACION and len(fila) > COLUMNA_AFILIACION and fila[COLUMNA_AFILIACION]:
+                nro_afiliacion = str(fila[COLUMNA_AFILIACION]).strip()
+            filas.append([_texto_celda(valor) for valor in fila])
+        return nro_afiliacion, filas
+    finally:
+        libro.close()
+
+
+def leer_csv(contenido):
+    """Retorna (nro_afiliacion, filas) del CSV del reloj (latin-1)."""
+    texto = contenido.decode('latin-1').replace('\r\n', '\n').replace('\r', '\n')
+    match = PATRON_AFILIACION.search(texto)
+    nro_afiliacion = match.group(1).strip() if match else None
+    return nro_afiliacion, list(csv.reader(io.StringIO(texto), delimiter=',', quotechar='"'))
+
+
+# ============================================================
+# 2. PARSEO DE JORNADAS (SIN BASE DE DATOS)
+# ============================================================
+
+def _jornada_incompleta(entrada):
+    return {
+        'entrada': entrada,
+        'salida': SALIDA_POR_DEFECTO,
+        'horas_netas': None,
+        'horas_extras': timedelta(hours=0),
+        'salida_forzada': True,  # Marcador CRÍTICO para indicar que necesita revisión
+    }
+
+
+def _parsear_fecha(celda):
+    raw_date_part = re.sub(r'^\w+,\s*|\s*\d{2}:\d{2}$', '', celda.strip().strip('"')).strip()
+    for es, en in MESES.items():
+        raw_date_part = raw_date_part.replace(es, en)
+    return datetime.strptime(raw_date_part, '%d %B %Y').date()
+
+
+def parsear_jornadas(filas, calcular_horas):
+    """
+    Recorre las filas del reporte del reloj y arma las jornadas del empleado.
+    `calcular_horas(fecha, entrada, salida)` -> (horas_netas, horas_extras).
+
+    Retorna (jornadas, errores, completas): jornadas es {fecha: campos}; si una
+    fecha aparece dos veces queda la última, igual que con update_or_create.
+    """
+    jornadas = {}
+    errores = []
+    completas = 0
+
+    fecha_actual = None
+    registro_jornada = {}
+
+    for row_num, row in enumerate(filas):
+        # Saltar encabezados, resúmenes y pausas de comida
+        if len(row) > 0 and 'RESUMEN' in row[0].upper():
+            break
+        if not row or not row[0] or 'total tiempo' in row[0].lower() or 'tiempo total' in row[0].lower():
+            continue
+        if len(row) > 1 and row[1].strip().lower() in EVENTOS_IGNORADOS:
+            continue
+
+        # A. DETECTAR Y PARSEAR LA FECHA (Inicio de un nuevo día)
+        if ',' in row[0] and any(m in row[0].lower() for m in MESES):
+            try:
+                nueva_fecha = _parsear_fecha(row[0])
+            except ValueError:
+                # Ignorar líneas que parecen fechas pero no se pueden parsear
+                nueva_fecha = None
+
+            if nueva_fecha:
+                if fecha_actual and registro_jornada.get('entrada') and not registro_jornada.get('salida'):
+                    errores.append(f"⚠️ REGISTRO INCOMPLETO DETECTADO: {fecha_actual.isoformat()}")
+                    jornadas[fecha_actual] = _jornada_incompleta(registro_jornada['entrada'])
+
+                fecha_actual = nueva_fecha
+                registro_jornada = {'entrada': None, 'salida': None}
+                continue
+
+        # B. DETECTAR Y ASIGNAR HORA (Entrada/Salida)
+        if fecha_actual and len(row) > 1 and ':' in row[0] and row[1].strip().lower() in EVENTOS:
+            try:
+                hora_evento = datetime.strptime(row[0].split(' ')[0].strip(), '%H:%M').time()
+                campo = EVENTOS[row[1].strip().lower()]
+                registro_jornada[campo] = hora_evento
+
+                # Si se detecta la SALIDA y tenemos ENTRADA, calcular y guardar
+                if campo == 'salida' and registro_jornada.get('entrada'):
+                    duracion_neta, horas_extras = calcular_horas(
+                        fecha_actual, registro_jornada['entrada'], registro_jornada['salida']
+                    )
+                    jornadas[fecha_actual] = {
+                        'entrada': registro_jornada['entrada'],
+                        'salida': registro_jornada['salida'],
+                        'horas_netas': duracion_neta,
+                        'horas_extras': horas_extras,
+                        'salida_forzada': False,  # Registro completo
+                    }
+                    completas += 1
+                    fecha_actual = None
+                    registro_jornada = {}
+
+            except Exception as e:
+                errores.append(f"Error procesando la jornada de **{fecha_actual}** (Fila {row_num + 1}). Detalles: {e}")
+
+                # Si hubo un error en el cálculo, intentamos guardar al menos la entrada
+                if fecha_actual and registro_jornada.get('entrada'):
+                    jornadas[fecha_actual] = _jornada_incompleta(registro_jornada['entrada'])
+
+                fecha_actual = None
+                registro_jornada = {}
+
+    return jornadas, errores, completas
+
+
+def parsear_archivo(nombre, contenido, calcular_horas):
+    """
+    Parsea un archivo del reloj (XLSX/XLSM o CSV) completo.
+    Retorna un dict con nombre, nro_afiliacion, jornadas, errores, completas
+    y primeras_lineas (para diagnosticar archivos sin número de afiliación).
+    """
+    es_excel = nombre.rsplit('.', 1)[-1].lower() in ('xlsx', 'xlsm')
+    nro_afiliacion, filas = leer_xlsx(contenido) if es_excel else leer_csv(contenido)
+    jornadas, errores, completas = parsear_jornadas(filas, calcular_horas)
+
+    return {
+        'nombre': nombre,
+        'nro_afiliacion': nro_afiliacion,
+        'jornadas': jornadas,
+        'errores': errores,
+        'completas': completas,
+        'primeras_lineas': '\n'.join(','.join(fila) for fila in filas[:5]).replace('"', ''),
+    }
+
+
+# ============================================================
+# 3. GUARDADO EN BLOQUE
+# ============================================================
+
+def guardar_jornadas(jornadas_por_empleado):
+    """
+    Inserta o actualiza todas las jornadas con un bulk_create(update_conflicts=True)
+    sobre la restricción única (empleado, fecha), y actualiza el libro de saldos
+    y la caché del calendario (bulk_create no dispara señales). `jornadas_por_empleado` es
+    {empleado_id: {fecha: campos}}. Retorna la cantidad de filas escritas.
+    """
+    objetos = [
+        RegistroJornada(empleado_id=empleado_id, fecha=fecha, **campos)
+        for empleado_id, jornadas in jornadas_por_empleado.items()
+        for fecha, campos in jornadas.items()
+    ]
+    if not objetos:
+        return 0
+
+    with transaction.atomic():
+        RegistroJornada.objects.bulk_create(
+            objetos,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['empleado', 'fecha'],
+            update_fields=CAMPOS_JORNADA,
+        )
+        pares = [(obj.empleado_id, obj.fecha) for obj in objetos]
+        recalcular_meses(pares)
+        invalidar_meses('horas', pares)
+        invalidar_modelos(RegistroJornada)
+
+    return len(objetos)
+
+
+# ============================================================
+# 4. CARGA POR LOTE (VARIOS ARCHIVOS O ZIP)
+# ============================================================
+
+def _extension(nombre):
+    return nombre.rsplit('.', 1)[-1].lower() if '.' in nombre else ''
+
+
+def _es_archivo_del_zip(info):
+    """Descarta directorios, ocultos y la metadata que agrega macOS (__MACOSX)."""
+    base = os.path.basename(info.filename)
+    return not (info.is_dir() or not base or base.startswith('.') or info.filename.startswith('__MACOSX'))
+
+
+def expandir_archivos(archivos_subidos):
+    """
+    Convierte los archivos subidos en [(nombre, bytes)], abriendo los ZIP.
+    Retorna (archivos, rechazados); rechazados es [(nombre, motivo)].
+    """
+    archivos = []
+    rechazados = []
+
+    for subido in archivos_subidos:
+        if _extension(subido.name) != 'zip':
+            if _extension(subido.name) in EXTENSIONES_JORNADA:
+                archivos.append((subido.name, subido.read()))
+            else:
+                rechazados.append((subido.name, 'Formato no soportado (use XLSX, XLSM, CSV o ZIP).'))
+            continue
+
+        try:
+            with zipfile.ZipFile(subido) as comprimido:
+                miembros = [info for info in comprimido.infolist() if _es_archivo_del_zip(info)]
+                if len(miembros) > MAX_ARCHIVOS_ZIP:
+                    rechazados.append((
+                        subido.name, f'El ZIP es demasiado grande: tiene {len(miembros)} archivos '
+                                     f'(máximo {MAX_ARCHIVOS_ZIP}).'
+                    ))
+                    continue
+
+                # file_size es el tamaño declarado; zipfile no descomprime más que eso
+                total = 0
+                for info in miembros:
+                    nombre = f'{subido.name}/{info.filename}'
+                    if _extension(os.path.basename(info.filename)) not in EXTENSIONES_JORNADA:
+                        rechazados.append((nombre, 'Formato no soportado dentro del ZIP.'))
+                    elif info.file_size > MAX_TAMANO_ARCHIVO_ZIP:
+                        rechazados.append((
+                            nombre, f'El archivo es demasiado grande (máximo {MAX_TAMANO_ARCHIVO_ZIP // 2**20} MB).'
+                        ))
+                    elif total + info.file_size > MAX_TAMANO_TOTAL_ZIP:
+                        rechazados.append((
+                            nombre, f'El ZIP es demasiado grande: supera {MAX_TAMANO_TOTAL_ZIP // 2**20} MB '
+                                    'descomprimido. Súbalo en partes.'
+                        ))
+                    else:
+                        total += info.file_size
+                        archivos.append((nombre, comprimido.read(info)))
+        except zipfile.BadZipFile:
+            rechazados.append((subido.name, 'El ZIP está dañado o no es un ZIP válido.'))
+
+    return archivos, rechazados
+
+
+def _parsear_seguro(nombre, contenido, calcular_horas):
+    """parsear_archivo sin excepciones: un archivo dañado no corta el lote."""
+    try:
+        return parsear_archivo(nombre, contenido, calcular_horas)
+    except (InvalidFileException, zipfile.BadZipFile):
+        return {'nombre': nombre, 'error': 'No es un archivo Excel (.xlsx) válido o está corrupto.'}
+    except Exception as e:
+        return {'nombre': nombre, 'error': f'Error al procesar el archivo: {e}'}
+
+
+def parsear_en_paralelo(archivos, calcular_horas, max_procesos=MAX_PROCESOS_PARSEO):
+    """
+    Parsea [(nombre, bytes)] en un pool de procesos y retorna los resultados
+    en el mismo orden. Si el pool no puede arrancar, parsea en este proceso.
+    """
+    procesos = min(max_procesos, len(archivos), os.cpu_count() or 1)
+    if procesos <= 1:
+        return [_parsear_seguro(nombre, contenido, calcular_horas) for nombre, contenido in archivos]
+
+    nombres = [nombre for nombre, _ in archivos]
+    contenidos = [contenido for _, contenido in archivos]
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=proceso_parseo.inicializar) as pool:
+            return list(pool.map(_parsear_seguro, nombres, contenidos, repeat(calcular_horas)))
+    except (BrokenProcessPool, OSError):
+        return [_parsear_seguro(nombre, contenido, calcular_horas) for nombre, contenido in archivos]
+
+
+def importar_lote(archivos_subidos, calcular_horas):
+    """
+    Importa muchos archivos del reloj (o ZIPs) de una vez:
+    parseo en paralelo, una consulta para resolver todos los números de
+    afiliación y un único upsert en bloque para todas las jornadas.
+
+    Retorna el reporte por archivo: dicts con nombre, estado ('ok',
+    'advertencia' o 'error'), nro_afiliacion, empleado, registros, dias y errores.
+    """
+    archivos, rechazados = expandir_archivos(archivos_subidos)
+    resultados = parsear_en_paralelo(archivos, calcular_horas)
+
+    numeros = {r['nro_afiliacion'] for r in resultados if r.get('nro_afiliacion')}
+    perfiles = {
+        nro: (user_id, username)
+        for nro, user_id, username in PerfilEmpleado.objects.filter(
+            nro_afiliacion__in=numeros
+        ).values_list('nro_afiliacion', 'user_id', 'user__username')
+    }
+
+    jornadas_por_empleado = defaultdict(dict)
+    reporte = [
+        {'nombre': nombre, 'estado': 'error', 'nro_afiliacion': None, 'empleado': None,
+         'registros': 0, 'dias': 0, 'errores': [motivo]}
+        for nombre, motivo in rechazados
+    ]
+
+    for resultado in resultados:
+        nro = resultado.get('nro_afiliacion')
+        fila = {
+            'nombre': resultado['nombre'], 'estado': 'error', 'nro_afiliacion': nro,
+            'empleado': None, 'registros': 0, 'dias': 0, 'errores': [],
+        }
+
+        if resultado.get('error'):
+            fila['errores'] = [resultado['error']]
+        elif not nro:
+            fila['errores'] = ['No se pudo extraer el Número de Afiliación (Cédula).']
+        elif nro not in perfiles:
+            fila['errores'] = [f'No se encontró un perfil con el Número de Afiliación: {nro}.']
+        else:
+            user_id, username = perfiles[nro]
+            # Si dos archivos traen el mismo día del mismo empleado, gana el último
+            jornadas_por_empleado[user_id].update(resultado['jornadas'])
+            fila.update(
+                estado='advertencia' if resultado['errores'] else 'ok',
+                empleado=username,
+                registros=resultado['completas'],
+                dias=len(resultado['jornadas']),
+                errores=resultado['errores'],
+            )
+
+        reporte.append(fila)
+
+    guardar_jornadas(jornadas_por_empleado)
+    return reporte
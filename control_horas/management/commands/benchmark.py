@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from mi_proyecto.benchmark import (
+    ESCALAS, comparar_reportes, ejecutar_benchmark, guardar_reporte, leer_reporte,
+)
+
+
+class Command(BaseCommand):
+    help = ('Genera datos sintéticos en una base de prueba descartable, mide las vistas clave de '
+            'todas las apps y escribe un reporte JSON. Con --comparar falla si hay regresiones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--escala', choices=sorted(ESCALAS), default='pequena',
+                            help='Volumen de datos (grande = 50k SKUs, 1M movimientos, 200 empleados x 5 años).')
+        parser.add_argument('--repeticiones', type=int, default=5,
+                            help='Veces que se mide cada caso (se reporta mínimo, mediana, p95 y máximo).')
+        parser.add_argument('--semilla', type=int, default=1)
+        parser.add_argument('--salida', default='benchmark.json',
+                            help='Ruta del reporte JSON.')
+        parser.add_argument('--comparar',
+                            help='Reporte JSON anterior contra el que se buscan regresiones.')
+        parser.add_argument('--tolerancia', type=float, default=0.2,
+                            help='Empeoramiento tolerado de la mediana (0.2 = 20%%).')
+        parser.add_argument('--solo', nargs='+',
+                            help='Mide solo estos casos (p. ej. deposito_view saldo_horas_view).')
+        parser.add_argument('--db',
+                            help='Archivo SQLite de prueba a conservar entre corridas (evita regenerar los datos).')
+
+    def handle(self, *args, **options):
+        base = leer_reporte(options['comparar']) if options['comparar'] else None
+
+        # Nunca sobre la base real: se crea (o reutiliza con --db) la base de prueba
+        if options['db']:
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = options['db']
+        nombre_original = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=bool(options['db']))
+
+        try:
+            self.stdout.write(f'Escala {options["escala"]}: {ESCALAS[options["escala"]]}')
+            reporte = ejecutar_benchmark(
+                escala=options['escala'],
+                repeticiones=options['repeticiones'],
+                semilla=options['semilla'],
+                solo=options['solo'],
+                salida=self.stdout.write,
+            )
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0, keepdb=bool(options['db']))
+            teardown_test_environment()
+
+        guardar_reporte(reporte, options['salida'])
+        self.stdout.write(self.style.SUCCESS(f'Reporte guardado en {options["salida"]}'))
+
+        if base:
+            regresiones = comparar_reportes(reporte, base, options['tolerancia'])
+            for regresion in regresiones:
+                self.stdout.write(self.style.WARNING(regresion))
+            if regresiones:
+                raise CommandError(f'{len(regresiones)} problema(s) al comparar contra {options["comparar"]}.')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones.'))
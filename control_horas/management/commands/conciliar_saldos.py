@@ -0,0 +1,33 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from control_horas.saldos import conciliar, escribir_libro, rollups_desde_registros
+
+
+class Command(BaseCommand):
+    help = ('Verifica el libro de saldos (SaldoMensual/SaldoHoras) contra RegistroJornada y '
+            'SolicitudLibre. Con --corregir lo reconstruye desde las tablas crudas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--corregir', action='store_true',
+                            help='Reconstruye el libro completo si hay diferencias.')
+
+    def handle(self, *args, **options):
+        diferencias = conciliar()
+
+        if not diferencias:
+            self.stdout.write(self.style.SUCCESS('Libro de saldos conciliado: sin diferencias.'))
+            return
+
+        usernames = dict(User.objects.filter(pk__in={d[0] for d in diferencias}).values_list('pk', 'username'))
+        for empleado_id, anio, mes, esperado, registrado in diferencias:
+            periodo = f'{mes:02d}/{anio}' if mes else 'TOTAL'
+            self.stdout.write(self.style.WARNING(
+                f'{usernames.get(empleado_id, empleado_id)} {periodo}: '
+                f'esperado (extras, usadas)={esperado} registrado={registrado}'
+            ))
+        self.stdout.write(self.style.WARNING(f'Diferencias encontradas: {len(diferencias)}'))
+
+        if options['corregir']:
+            escribir_libro(rollups_desde_registros())
+            self.stdout.write(self.style.SUCCESS('Libro de saldos reconstruido.'))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.7 on 2026-10-18 07:07
+
+import datetime
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def construir_libro(apps, schema_editor):
+    """Carga inicial del libro de saldos desde las jornadas y solicitudes existentes."""
+    from control_horas.saldos import escribir_libro, rollups_desde_registros
+
+    rollups = rollups_desde_registros(
+        apps.get_model('control_horas', 'RegistroJornada'),
+        apps.get_model('control_horas', 'SolicitudLibre'),
+    )
+    escribir_libro(
+        rollups,
+        apps.get_model('control_horas', 'SaldoMensual'),
+        apps.get_model('control_horas', 'SaldoHoras'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('control_horas', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoHoras',
+            fields=[
+                ('empleado', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='saldo_horas', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('horas_extras', models.DurationField(default=datetime.timedelta(0))),
+                ('horas_usadas', models.DurationField(default=datetime.timedelta(0))),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Saldo de Horas',
+                'verbose_name_plural': 'Saldos de Horas',
+            },
+        ),
+        migrations.CreateModel(
+            name='SaldoMensual',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('anio', models.PositiveSmallIntegerField()),
+                ('mes', models.PositiveSmallIntegerField()),
+                ('horas_extras', models.DurationField(default=datetime.timedelta(0))),
+                ('horas_usadas', models.DurationField(default=datetime.timedelta(0))),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos_mensuales', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Saldo Mensual',
+                'verbose_name_plural': 'Saldos Mensuales',
+                'ordering': ['empleado', '-anio', '-mes'],
+                'unique_together': {('empleado', 'anio', 'mes')},
+            },
+        ),
+        migrations.RunPython(construir_libro, migrations.RunPython.noop),
+    ]
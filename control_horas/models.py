@@ -101,4 +101,51 @@ class SolicitudLibre(models.Model):
         unique_together = ('empleado', 'fecha_libre')
 
     def __str__(self):
-        return f'{self.empleado.username} solicita libre el {self.fecha_libre} ({self.estado})'
\ No newline at end of file
+        return f'{self.empleado.username} solicita libre el {self.fecha_libre} ({self.estado})'
+
+# ============================================================
+# LIBRO DE SALDOS DE HORAS (MATERIALIZADO)
+# ============================================================
+# Se mantiene desde las señales de RegistroJornada y SolicitudLibre
+# (ver control_horas/saldos.py). Verificar con: manage.py conciliar_saldos
+
+class SaldoMensual(models.Model):
+    """Horas extras ganadas y horas libres aprobadas de un empleado en un mes."""
+    empleado = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saldos_mensuales')
+    anio = models.PositiveSmallIntegerField()
+    mes = models.PositiveSmallIntegerField()
+    horas_extras = models.DurationField(default=timedelta(0))
+    horas_usadas = models.DurationField(default=timedelta(0))
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Saldo Mensual'
+        verbose_name_plural = 'Saldos Mensuales'
+        unique_together = ('empleado', 'anio', 'mes')
+        ordering = ['empleado', '-anio', '-mes']
+
+    def __str__(self):
+        return f'{self.empleado.username} {self.mes:02d}/{self.anio}'
+
+    @property
+    def saldo(self):
+        return self.horas_extras - self.horas_usadas
+
+
+class SaldoHoras(models.Model):
+    """Saldo total de horas compensatorias (suma de los SaldoMensual del empleado)."""
+    empleado = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='saldo_horas')
+    horas_extras = models.DurationField(default=timedelta(0))
+    horas_usadas = models.DurationField(default=timedelta(0))
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Saldo de Horas'
+        verbose_name_plural = 'Saldos de Horas'
+
+    def __str__(self):
+        return f'Saldo de {self.empleado.username}'
+
+    @property
+    def saldo(self):
+        return self.horas_extras - self.horas_usadas
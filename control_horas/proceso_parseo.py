@@ -0,0 +1,13 @@
+# ============================================================
+# control_horas/proceso_parseo.py - ARRANQUE DE LOS PROCESOS DE PARSEO
+# ============================================================
+#
+# En Windows los procesos hijos del pool arrancan de cero (spawn) e importan
+# el inicializador antes de ejecutarlo. Por eso vive en este módulo, que no
+# importa modelos: importacion.py no se puede cargar hasta que Django esté listo.
+
+
+def inicializar():
+    """Carga Django en el proceso hijo antes de recibir archivos para parsear."""
+    import django
+    django.setup()
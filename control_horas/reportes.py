@@ -0,0 +1,77 @@
+# ============================================================
+# control_horas/reportes.py - CAPA DE REPORTES DE SALDOS
+# ============================================================
+#
+# Arma el resumen de saldos de muchos empleados con un número constante de
+# consultas (sin importar la cantidad de empleados):
+#   1. Perfiles + saldo total + saldo del mes (JOIN al libro de saldos).
+#   2. Últimas N jornadas de todos a la vez (ROW_NUMBER() OVER PARTITION BY).
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import F, OuterRef, Subquery, Window
+from django.db.models.functions import RowNumber
+
+from .models import RegistroJornada, SaldoMensual
+
+CERO = timedelta(0)
+
+
+def ultimas_jornadas_por_empleado(empleado_ids, cantidad=5):
+    """
+    {empleado_id: [jornadas más recientes primero]} con una sola consulta:
+    numera las jornadas de cada empleado por fecha descendente y se queda
+    con las primeras `cantidad`.
+    """
+    jornadas = (
+        RegistroJornada.objects.filter(empleado_id__in=empleado_ids)
+        .annotate(posicion=Window(
+            expression=RowNumber(),
+            partition_by=[F('empleado_id')],
+            order_by=F('fecha').desc(),
+        ))
+        .filter(posicion__lte=cantidad)
+        .values('id', 'empleado_id', 'fecha', 'entrada', 'salida', 'horas_extras')
+        .order_by('empleado_id', '-fecha')
+    )
+
+    por_empleado = defaultdict(list)
+    for jornada in jornadas:
+        por_empleado[jornada['empleado_id']].append(jornada)
+    return por_empleado
+
+
+def resumen_saldos(perfiles, anio, mes, ultimos=5):
+    """
+    Resumen por empleado para el tablero de saldos.
+
+    `perfiles` es un queryset de PerfilEmpleado. Retorna una lista de dicts
+    con 'perfil', 'saldo_total', 'saldo_mensual' (timedelta) y 'registros'
+    (las últimas `ultimos` jornadas como dicts).
+    """
+    extras_mes = SaldoMensual.objects.filter(
+        empleado_id=OuterRef('user_id'), anio=anio, mes=mes
+    ).values('horas_extras')[:1]
+
+    perfiles = list(
+        perfiles.select_related('user')
+        .annotate(
+            total_extras=F('user__saldo_horas__horas_extras'),
+            total_usadas=F('user__saldo_horas__horas_usadas'),
+            extras_mes=Subquery(extras_mes),
+        )
+        .order_by('user__username')
+    )
+
+    jornadas = ultimas_jornadas_por_empleado([p.user_id for p in perfiles], ultimos) if perfiles else {}
+
+    return [
+        {
+            'perfil': perfil,
+            'saldo_total': (perfil.total_extras or CERO) - (perfil.total_usadas or CERO),
+            'saldo_mensual': perfil.extras_mes or CERO,
+            'registros': jornadas.get(perfil.user_id, []),
+        }
+        for perfil in perfiles
+    ]
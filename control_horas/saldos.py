@@ -0,0 +1,279 @@
+# ============================================================
+# control_horas/saldos.py - LIBRO DE SALDOS DE HORAS
+# ============================================================
+#
+# El saldo de horas compensatorias (extras ganadas - horas libres aprobadas)
+# se mantiene materializado en SaldoMensual (un registro por empleado y mes)
+# y SaldoHoras (total por empleado). Cada alta/edición/baja de un
+# RegistroJornada o SolicitudLibre recalcula solo el mes afectado, así que
+# leer un saldo es una consulta por clave primaria.
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+from django.db.models import Sum
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .models import RegistroJornada, SolicitudLibre, SaldoMensual, SaldoHoras
+
+CERO = timedelta(0)
+
+
+def _rango_mes(anio, mes):
+    """(primer día del mes, primer día del mes siguiente) para filtrar con índices."""
+    inicio = date(anio, mes, 1)
+    fin = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+    return inicio, fin
+
+
+# ============================================================
+# 1. ACTUALIZACIÓN INCREMENTAL
+# ============================================================
+
+def recalcular_mes(empleado_id, anio, mes):
+    """Recalcula el SaldoMensual de un empleado/mes y el SaldoHoras total."""
+    inicio, fin = _rango_mes(anio, mes)
+
+    with transaction.atomic():
+        extras = RegistroJornada.objects.filter(
+            empleado_id=empleado_id, fecha__gte=inicio, fecha__lt=fin
+        ).aggregate(total=Sum('horas_extras'))['total'] or CERO
+
+        usadas = SolicitudLibre.objects.filter(
+            empleado_id=empleado_id, estado='APROBADO', fecha_libre__gte=inicio, fecha_libre__lt=fin
+        ).aggregate(total=Sum('horas_solicitadas'))['total'] or CERO
+
+        if extras == CERO and usadas == CERO:
+            SaldoMensual.objects.filter(empleado_id=empleado_id, anio=anio, mes=mes).delete()
+        else:
+            SaldoMensual.objects.update_or_create(
+                empleado_id=empleado_id, anio=anio, mes=mes,
+                defaults={'horas_extras': extras, 'horas_usadas': usadas},
+            )
+
+        # El total se suma sobre los meses (decenas de filas), no sobre las jornadas
+        totales = SaldoMensual.objects.filter(empleado_id=empleado_id).aggregate(
+            extras=Sum('horas_extras'), usadas=Sum('horas_usadas')
+        )
+        SaldoHoras.objects.update_or_create(
+            empleado_id=empleado_id,
+            defaults={
+                'horas_extras': totales['extras'] or CERO,
+                'horas_usadas': totales['usadas'] or CERO,
+            },
+        )
+
+
+def recalcular_meses(pares):
+    """
+    Recalcula de una vez los meses afectados por una carga masiva
+    (bulk_create/bulk_update no disparan señales). `pares` son (empleado_id, fecha).
+    Usa consultas agrupadas y upserts en bloque: el costo no depende de
+    cuántos meses o empleados abarque la carga.
+    """
+    meses = {(empleado_id, fecha.year, fecha.month) for empleado_id, fecha in pares}
+    if not meses:
+        return
+    if len(meses) == 1:
+        recalcular_mes(*meses.pop())
+        return
+
+    empleado_ids = {empleado_id for empleado_id, _, _ in meses}
+    inicio = min(_rango_mes(anio, mes)[0] for _, anio, mes in meses)
+    fin = max(_rango_mes(anio, mes)[1] for _, anio, mes in meses)
+
+    with transaction.atomic():
+        rollups = rollups_desde_registros(empleado_ids=empleado_ids, desde=inicio, hasta=fin)
+
+        filas = []
+        vacios = []
+        for clave in meses:
+            extras, usadas = rollups.get(clave, (CERO, CERO))
+            if extras == CERO and usadas == CERO:
+                vacios.append(clave)
+            else:
+                empleado_id, anio, mes = clave
+                filas.append(SaldoMensual(
+                    empleado_id=empleado_id, anio=anio, mes=mes, horas_extras=extras, horas_usadas=usadas
+                ))
+
+        SaldoMensual.objects.bulk_create(
+            filas,
+            batch_size=1000,
+            update_conflicts=True,
+            unique_fields=['empleado', 'anio', 'mes'],
+            update_fields=['horas_extras', 'horas_usadas', 'actualizado'],
+        )
+        for empleado_id, anio, mes in vacios:
+            SaldoMensual.objects.filter(empleado_id=empleado_id, anio=anio, mes=mes).delete()
+
+        totales = (
+            SaldoMensual.objects.filter(empleado_id__in=empleado_ids)
+            .values('empleado_id')
+            .annotate(extras=Sum('horas_extras'), usadas=Sum('horas_usadas'))
+            .order_by()
+        )
+        por_empleado = {t['empleado_id']: t for t in totales}
+        SaldoHoras.objects.bulk_create(
+            [
+                SaldoHoras(
+                    empleado_id=empleado_id,
+                    horas_extras=por_empleado.get(empleado_id, {}).get('extras') or CERO,
+                    horas_usadas=por_empleado.get(empleado_id, {}).get('usadas') or CERO,
+                )
+                for empleado_id in empleado_ids
+            ],
+            update_conflicts=True,
+            unique_fields=['empleado'],
+            update_fields=['horas_extras', 'horas_usadas', 'actualizado'],
+        )
+
+
+# ============================================================
+# 2. LECTURA (O(1))
+# ============================================================
+
+def saldo_total(empleado):
+    """
+    Saldo total acumulado (timedelta). Las señales mantienen SaldoHoras al día
+    desde la migración que armó el libro: si no hay fila, el empleado nunca
+    tuvo jornadas ni libres aprobados y el saldo es cero.
+    """
+    saldo = SaldoHoras.objects.filter(empleado=empleado).first()
+    return saldo.saldo if saldo else CERO
+
+
+def saldo_mensual(empleado, anio, mes):
+    """Horas extras del mes (timedelta), tal como las mostraba obtener_saldo_mensual."""
+    horas = SaldoMensual.objects.filter(
+        empleado=empleado, anio=anio, mes=mes
+    ).values_list('horas_extras', flat=True).first()
+    return horas or CERO
+
+
+def saldos_totales(empleado_ids):
+    """{empleado_id: saldo} para muchos empleados en una sola consulta."""
+    return {
+        s.empleado_id: s.saldo
+        for s in SaldoHoras.objects.filter(empleado_id__in=list(empleado_ids))
+    }
+
+
+# ============================================================
+# 3. RECONSTRUCCIÓN Y CONCILIACIÓN
+# ============================================================
+
+def rollups_desde_registros(registro_model=RegistroJornada, solicitud_model=SolicitudLibre, empleado_id=None,
+                            empleado_ids=None, desde=None, hasta=None):
+    """
+    Calcula los saldos mensuales desde las tablas crudas con dos GROUP BY,
+    opcionalmente acotados a empleados y a un rango de fechas [desde, hasta).
+    Retorna {(empleado_id, anio, mes): [horas_extras, horas_usadas]}.
+    Recibe los modelos por parámetro para poder usarse desde migraciones.
+    """
+    registros = registro_model.objects.all()
+    solicitudes = solicitud_model.objects.filter(estado='APROBADO')
+    if empleado_id is not None:
+        registros = registros.filter(empleado_id=empleado_id)
+        solicitudes = solicitudes.filter(empleado_id=empleado_id)
+    if empleado_ids is not None:
+        registros = registros.filter(empleado_id__in=empleado_ids)
+        solicitudes = solicitudes.filter(empleado_id__in=empleado_ids)
+    if desde is not None:
+        registros = registros.filter(fecha__gte=desde)
+        solicitudes = solicitudes.filter(fecha_libre__gte=desde)
+    if hasta is not None:
+        registros = registros.filter(fecha__lt=hasta)
+        solicitudes = solicitudes.filter(fecha_libre__lt=hasta)
+
+    rollups = defaultdict(lambda: [CERO, CERO])
+
+    extras = (
+        registros.annotate(anio=ExtractYear('fecha'), mes=ExtractMonth('fecha'))
+        .values('empleado_id', 'anio', 'mes')
+        .annotate(total=Sum('horas_extras'))
+        .order_by()
+    )
+    for fila in extras:
+        rollups[(fila['empleado_id'], fila['anio'], fila['mes'])][0] = fila['total'] or CERO
+
+    usadas = (
+        solicitudes.annotate(anio=ExtractYear('fecha_libre'), mes=ExtractMonth('fecha_libre'))
+        .values('empleado_id', 'anio', 'mes')
+        .annotate(total=Sum('horas_solicitadas'))
+        .order_by()
+    )
+    for fila in usadas:
+        rollups[(fila['empleado_id'], fila['anio'], fila['mes'])][1] = fila['total'] or CERO
+
+    return {
+        clave: valores for clave, valores in rollups.items()
+        if valores[0] != CERO or valores[1] != CERO
+    }
+
+
+def escribir_libro(rollups, mensual_model=SaldoMensual, total_model=SaldoHoras, empleado_id=None):
+    """Reemplaza el libro (completo, o de un empleado) por los rollups dados."""
+    mensuales = mensual_model.objects.all()
+    totales_qs = total_model.objects.all()
+    if empleado_id is not None:
+        mensuales = mensuales.filter(empleado_id=empleado_id)
+        totales_qs = totales_qs.filter(empleado_id=empleado_id)
+
+    totales = defaultdict(lambda: [CERO, CERO])
+    filas = []
+    for (emp_id, anio, mes), (extras, usadas) in rollups.items():
+        filas.append(mensual_model(empleado_id=emp_id, anio=anio, mes=mes, horas_extras=extras, horas_usadas=usadas))
+        totales[emp_id][0] += extras
+        totales[emp_id][1] += usadas
+    if empleado_id is not None:
+        # El empleado queda con su fila de total aunque no tenga movimientos (saldo cero)
+        totales[empleado_id]
+
+    with transaction.atomic():
+        mensuales.delete()
+        totales_qs.delete()
+        mensual_model.objects.bulk_create(filas, batch_size=1000)
+        total_model.objects.bulk_create(
+            [total_model(empleado_id=emp_id, horas_extras=e, horas_usadas=u) for emp_id, (e, u) in totales.items()],
+            batch_size=1000,
+        )
+
+
+def reconstruir_empleado(empleado_id):
+    escribir_libro(rollups_desde_registros(empleado_id=empleado_id), empleado_id=empleado_id)
+
+
+def conciliar():
+    """
+    Compara el libro contra las tablas crudas. Retorna una lista de diferencias
+    (empleado_id, anio, mes, esperado, registrado); mes=None indica el total.
+    """
+    esperado = rollups_desde_registros()
+    registrado = {
+        (s.empleado_id, s.anio, s.mes): [s.horas_extras, s.horas_usadas]
+        for s in SaldoMensual.objects.all()
+    }
+
+    diferencias = []
+    for clave in sorted(set(esperado) | set(registrado)):
+        valor_esperado = esperado.get(clave, [CERO, CERO])
+        valor_registrado = registrado.get(clave, [CERO, CERO])
+        if valor_esperado != valor_registrado:
+            diferencias.append((*clave, tuple(valor_esperado), tuple(valor_registrado)))
+
+    totales_esperados = defaultdict(lambda: [CERO, CERO])
+    for (emp_id, _, _), (extras, usadas) in esperado.items():
+        totales_esperados[emp_id][0] += extras
+        totales_esperados[emp_id][1] += usadas
+    totales_registrados = {
+        s.empleado_id: [s.horas_extras, s.horas_usadas] for s in SaldoHoras.objects.all()
+    }
+    for emp_id in sorted(set(totales_esperados) | set(totales_registrados)):
+        valor_esperado = totales_esperados.get(emp_id, [CERO, CERO])
+        valor_registrado = totales_registrados.get(emp_id, [CERO, CERO])
+        if valor_esperado != valor_registrado:
+            diferencias.append((emp_id, None, None, tuple(valor_esperado), tuple(valor_registrado)))
+
+    return diferencias
@@ -0,0 +1,59 @@
+# ============================================================
+# control_horas/signals.py - MANTENIMIENTO DEL LIBRO DE SALDOS Y DE LAS CACHÉS
+# ============================================================
+
+from datetime import date
+
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import RegistroJornada, SolicitudLibre
+from .saldos import recalcular_mes
+from .calendario import invalidar_meses
+
+# Campo de fecha que ubica cada modelo en un mes del libro
+CAMPO_FECHA = {
+    RegistroJornada: 'fecha',
+    SolicitudLibre: 'fecha_libre',
+}
+
+# Tipo de evento del calendario que alimenta cada modelo
+TIPO_CALENDARIO = {
+    RegistroJornada: 'horas',
+    SolicitudLibre: 'solicitudes',
+}
+
+
+@receiver(pre_save, sender=RegistroJornada, dispatch_uid='saldos_pre_save_jornada')
+@receiver(pre_save, sender=SolicitudLibre, dispatch_uid='saldos_pre_save_solicitud')
+def recordar_mes_anterior(sender, instance, **kwargs):
+    """Si cambia el empleado o la fecha, el mes anterior también debe recalcularse."""
+    instance._mes_anterior = None
+    if instance.pk:
+        campo = CAMPO_FECHA[sender]
+        anterior = sender.objects.filter(pk=instance.pk).values_list('empleado_id', campo).first()
+        if anterior:
+            instance._mes_anterior = (anterior[0], anterior[1].year, anterior[1].month)
+
+
+@receiver(post_save, sender=RegistroJornada, dispatch_uid='saldos_post_save_jornada')
+@receiver(post_save, sender=SolicitudLibre, dispatch_uid='saldos_post_save_solicitud')
+@receiver(post_delete, sender=RegistroJornada, dispatch_uid='saldos_post_delete_jornada')
+@receiver(post_delete, sender=SolicitudLibre, dispatch_uid='saldos_post_delete_solicitud')
+def actualizar_libro_saldos(sender, instance, **kwargs):
+    origen = kwargs.get('origin')
+    if origen is not None and getattr(origen, 'model', type(origen)) is not sender:
+        # Borrado en cascada (p. ej. se elimina el User): el libro se borra con él
+        return
+
+    fecha = getattr(instance, CAMPO_FECHA[sender])
+    mes_actual = (instance.empleado_id, fecha.year, fecha.month)
+    recalcular_mes(*mes_actual)
+
+    fechas = [(instance.empleado_id, fecha)]
+    mes_anterior = getattr(instance, '_mes_anterior', None)
+    if mes_anterior and mes_anterior != mes_actual:
+        recalcular_mes(*mes_anterior)
+        fechas.append((mes_anterior[0], date(mes_anterior[1], mes_anterior[2], 1)))
+
+    invalidar_meses(TIPO_CALENDARIO[sender], fechas)
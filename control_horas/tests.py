@@ -1,3 +1,123 @@
-from django.test import TestCase
+import io
+import zipfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+
+from . import importacion
+from .models import RegistroJornada, SaldoHoras, SaldoMensual, SolicitudLibre
+from .saldos import conciliar, reconstruir_empleado, recalcular_meses, saldo_mensual, saldo_total, saldos_totales
+
+
+# ============================================================
+# LIBRO DE SALDOS (control_horas/saldos.py)
+# ============================================================
+
+class SaldosTestCase(TestCase):
+    """El libro que mantienen las señales y las cargas masivas coincide con las tablas crudas."""
+
+    def setUp(self):
+        self.empleado = User.objects.create_user('empleado', password='clave')
+        self.otro = User.objects.create_user('otro', password='clave')
+
+    def _jornada(self, empleado, fecha, extras):
+        return RegistroJornada.objects.create(empleado=empleado, fecha=fecha, horas_extras=timedelta(hours=extras))
+
+    def test_sin_movimientos_el_saldo_es_cero(self):
+        self.assertEqual(saldo_total(self.empleado), timedelta(0))
+        self.assertEqual(saldo_mensual(self.empleado, 2025, 3), timedelta(0))
+        self.assertEqual(conciliar(), [])
+
+    def test_jornadas_y_libres_aprobados(self):
+        self._jornada(self.empleado, date(2025, 3, 3), 2)
+        self._jornada(self.empleado, date(2025, 3, 4), 1.5)
+        self._jornada(self.empleado, date(2025, 4, 1), 3)
+        solicitud = SolicitudLibre.objects.create(
+            empleado=self.empleado, fecha_libre=date(2025, 4, 10), horas_solicitadas=timedelta(hours=4),
+        )
+        # Pendiente: no descuenta
+        self.assertEqual(saldo_total(self.empleado), timedelta(hours=6.5))
+
+        solicitud.estado = 'APROBADO'
+        solicitud.save()
+        self.assertEqual(saldo_total(self.empleado), timedelta(hours=2.5))
+        self.assertEqual(saldo_mensual(self.empleado, 2025, 3), timedelta(hours=3.5))
+        self.assertEqual(saldos_totales([self.empleado.id, self.otro.id]), {self.empleado.id: timedelta(hours=2.5)})
+        self.assertEqual(conciliar(), [])
+
+    def test_cambio_de_mes_y_baja(self):
+        jornada = self._jornada(self.empleado, date(2025, 3, 3), 2)
+        jornada.fecha = date(2025, 5, 3)
+        jornada.save()
+        self.assertFalse(SaldoMensual.objects.filter(empleado=self.empleado, anio=2025, mes=3).exists())
+        self.assertEqual(saldo_mensual(self.empleado, 2025, 5), timedelta(hours=2))
+
+        jornada.delete()
+        self.assertFalse(SaldoMensual.objects.filter(empleado=self.empleado).exists())
+        self.assertEqual(saldo_total(self.empleado), timedelta(0))
+        self.assertEqual(conciliar(), [])
+
+    def test_carga_masiva(self):
+        registros = [
+            RegistroJornada(empleado=empleado, fecha=date(2025, mes, dia), horas_extras=timedelta(hours=1))
+            for empleado in (self.empleado, self.otro)
+            for mes in (1, 2, 3)
+            for dia in (5, 6)
+        ]
+        RegistroJornada.objects.bulk_create(registros)
+        self.assertNotEqual(conciliar(), [])
+
+        recalcular_meses((r.empleado_id, r.fecha) for r in registros)
+        self.assertEqual(conciliar(), [])
+        self.assertEqual(saldo_total(self.otro), timedelta(hours=6))
+
+    def test_conciliar_detecta_y_reconstruir_corrige(self):
+        self._jornada(self.empleado, date(2025, 3, 3), 2)
+        SaldoHoras.objects.filter(empleado=self.empleado).update(horas_extras=timedelta(hours=9))
+        self.assertEqual(conciliar(), [
+            (self.empleado.id, None, None, (timedelta(hours=2), timedelta(0)), (timedelta(hours=9), timedelta(0))),
+        ])
+
+        reconstruir_empleado(self.empleado.id)
+        self.assertEqual(conciliar(), [])
+        self.assertEqual(saldo_total(self.empleado), timedelta(hours=2))
+
+
+# ============================================================
+# ZIP SUBIDOS EN LA CARGA POR LOTE (control_horas/importacion.py)
+# ============================================================
+
+def _zip(archivos):
+    salida = io.BytesIO()
+    with zipfile.ZipFile(salida, 'w', compression=zipfile.ZIP_DEFLATED) as comprimido:
+        for nombre, contenido in archivos.items():
+            comprimido.writestr(nombre, contenido)
+    return SimpleUploadedFile('marcaciones.zip', salida.getvalue())
+
+
+@mock.patch.multiple(importacion, MAX_ARCHIVOS_ZIP=4, MAX_TAMANO_ARCHIVO_ZIP=1000, MAX_TAMANO_TOTAL_ZIP=1500)
+class ExpandirZipTestCase(SimpleTestCase):
+
+    def test_archivos_validos(self):
+        archivos, rechazados = importacion.expandir_archivos([_zip({
+            'a.csv': b'1', 'dir/b.xlsx': b'2', 'notas.txt': b'3', '__MACOSX/._a.csv': b'', '.oculto.csv': b'',
+        })])
+        self.assertEqual(archivos, [('marcaciones.zip/a.csv', b'1'), ('marcaciones.zip/dir/b.xlsx', b'2')])
+        self.assertEqual([nombre for nombre, _ in rechazados], ['marcaciones.zip/notas.txt'])
+
+    def test_demasiados_archivos(self):
+        archivos, rechazados = importacion.expandir_archivos([_zip({f'{n}.csv': b'1' for n in range(5)})])
+        self.assertEqual(archivos, [])
+        self.assertIn('demasiado grande', rechazados[0][1])
+
+    def test_tamano_por_archivo_y_total(self):
+        """Archivos que se comprimen a casi nada: el límite es sobre el tamaño descomprimido."""
+        archivos, rechazados = importacion.expandir_archivos([_zip({
+            'grande.csv': b'0' * 1001, 'a.csv': b'0' * 800, 'b.csv': b'0' * 800, 'c.csv': b'0' * 100,
+        })])
+        self.assertEqual([nombre for nombre, _ in archivos], ['marcaciones.zip/a.csv', 'marcaciones.zip/c.csv'])
+        self.assertEqual([nombre for nombre, _ in rechazados], ['marcaciones.zip/grande.csv', 'marcaciones.zip/b.csv'])
+        self.assertTrue(all('demasiado grande' in motivo for _, motivo in rechazados))
@@ -31,6 +31,7 @@ urlpatterns = [
     path('SYM/rrhh/gestion/<int:solicitud_id>/', views.aprobar_rechazar_solicitud, name='aprobar_rechazar_solicitud'),
  
     path('SYM/rrhh/cargar/', views.upload_excel_view, name='upload_excel'),
+    path('SYM/rrhh/cargar/lote/', views.upload_lote_view, name='upload_lote'),
     path('SYM/rrhh/exportar/', views.export_jornadas_csv, name='exportar_registros'),
 
     path('SYM/rrhh/control_dashboard/', views.control_horas_dashboard, name='control_dashboard'),
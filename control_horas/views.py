@@ -1,20 +1,24 @@
-import csv
-import io
 from django.shortcuts import render, redirect, get_object_or_404
-from django.db.models import Sum
 from django.db import IntegrityError, transaction
 from django.contrib import messages
 from django.contrib.auth import login, logout
 from django.contrib.auth.views import LoginView
-from django.http import JsonResponse, HttpResponse
-from django.urls import reverse_lazy, reverse 
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from mi_proyecto.csv_streaming import stream_csv
 from .models import RegistroJornada, PerfilEmpleado, SolicitudLibre
-from .forms import SolicitudLibreForm, EmpleadoLoginForm, UploadFileForm, RegistroJornadaForm 
+from . import saldos
+from .reportes import resumen_saldos
+from . import calendario
+from .importacion import parsear_archivo, guardar_jornadas, importar_lote
+from zipfile import BadZipFile
+from .forms import SolicitudLibreForm, EmpleadoLoginForm, UploadFileForm, UploadLoteForm, RegistroJornadaForm 
 from datetime import datetime, time, timedelta, date
 from django.utils import timezone
 from calendar import month_name
 from django.contrib.auth.models import User
-import re 
 from functools import wraps
 from django.shortcuts import redirect
 from django.contrib import messages
@@ -25,10 +29,7 @@ from django.db import transaction
 from .models import SolicitudLibre
 from django.contrib.auth.decorators import login_required, user_passes_test
 from datetime import timedelta # Asegúrate de tener esta importación
-from openpyxl import load_workbook 
 from decimal import Decimal
-from django.urls import reverse # Asegúrate de importar reverse
-from django.db.models import Q 
 from openpyxl.utils.exceptions import InvalidFileException # Importación necesaria para manejar errores de archivo
 # =================================================================
 # 1. REGLAS DE NEGOCIO Y LÓGICA CENTRAL
@@ -160,35 +161,14 @@ def obtener_saldo_actual(empleado):
     Calcula el saldo total de horas compensatorias acumuladas (Ganadas - Usadas).
     
     El parámetro 'empleado' es el objeto User (user_instance) que pasas desde la vista.
+    Se lee del libro de saldos materializado (ver saldos.py): una sola consulta.
     """
-    
-    # 1. Horas Extras Ganadas (acumuladas)
-    total_extras_ganadas = RegistroJornada.objects.filter(
-        empleado=empleado
-    ).aggregate(Sum('horas_extras'))['horas_extras__sum'] or timedelta(hours=0)
-    
-    # 2. Horas Libres APROBADAS (utilizadas)
-    total_horas_usadas = SolicitudLibre.objects.filter(
-        empleado=empleado,
-        estado='APROBADO' # Solo contamos las que ya fueron aprobadas
-    ).aggregate(Sum('horas_solicitadas'))['horas_solicitadas__sum'] or timedelta(hours=0)
-    
-    # 3. Retorna el saldo total
-    return total_extras_ganadas - total_horas_usadas
+    return saldos.saldo_total(empleado)
 
 # --- FUNCIÓN AUXILIAR PARA CÁLCULO DE SALDO MENSUAL ---
 def obtener_saldo_mensual(empleado, mes_num, anio):
     """Calcula el saldo total de horas extras acumuladas del empleado para un mes específico."""
-    
-    saldo_mensual = RegistroJornada.objects.filter(
-        empleado=empleado,
-        fecha__year=anio,
-        fecha__month=mes_num
-    ).aggregate(
-        saldo_mensual=Sum('horas_extras')
-    )['saldo_mensual'] or timedelta(0)
-    
-    return saldo_mensual
+    return saldos.saldo_mensual(empleado, anio, mes_num)
 
 
 # --- FUNCIÓN AUXILIAR DE FORMATO DE TIEMPO (CORRECCIÓN CLAVE) ---
@@ -253,46 +233,35 @@ def saldo_horas_view(request):
     año_actual = hoy.year
     nombre_mes = month_name[mes_actual_num].capitalize()
     
-    contexto_empleados = []
-    
     # Determinar qué empleados mostrar
     if request.user.is_staff:
-        empleados_a_mostrar = PerfilEmpleado.objects.all().select_related('user')
+        empleados_a_mostrar = PerfilEmpleado.objects.all()
     else:
         try:
-            empleados_a_mostrar = [request.user.perfilempleado]
+            empleados_a_mostrar = PerfilEmpleado.objects.filter(pk=request.user.perfilempleado.pk)
         except PerfilEmpleado.DoesNotExist:
             messages.error(request, "Error: Su cuenta de usuario no tiene un perfil de empleado asociado.")
             return redirect('control_horas:logout_confirm')
 
-    for perfil in empleados_a_mostrar:
-        user_instance = perfil.user
-        
-        # 1. CALCULAR SALDO TOTAL ACUMULADO
-        total_acumulado_td = obtener_saldo_actual(user_instance)
-        
-        # 2. CALCULAR SALDO MENSUAL
-        saldo_mensual_td = obtener_saldo_mensual(user_instance, mes_actual_num, año_actual)
-        
-        # 3. OBTENER Y FORMATEAR ÚLTIMOS REGISTROS
-        registros_formateados = []
-        # CORRECCIÓN: Filtramos por el objeto User que está en la FK
-        registros_qs = RegistroJornada.objects.filter(empleado=user_instance).order_by('-fecha')[:5]
-        
-        for reg in registros_qs:
-            registros_formateados.append({
-                'fecha': reg.fecha,
-                'entrada': reg.entrada,
-                'salida': reg.salida,
-                'id': reg.id,
-                'horas_extras_display': format_timedelta_display(reg.horas_extras),
-            })
-            
-        # 4. Construir el objeto de contexto
+    # Saldos totales, saldo del mes y últimos 5 registros de todos los
+    # empleados en un número fijo de consultas (ver reportes.py)
+    contexto_empleados = []
+    for fila in resumen_saldos(empleados_a_mostrar, año_actual, mes_actual_num, ultimos=5):
+        registros_formateados = [
+            {
+                'fecha': reg['fecha'],
+                'entrada': reg['entrada'],
+                'salida': reg['salida'],
+                'id': reg['id'],
+                'horas_extras_display': format_timedelta_display(reg['horas_extras']),
+            }
+            for reg in fila['registros']
+        ]
+
         contexto_empleados.append({
-            'nombre': user_instance.username,
-            'saldo_total': format_timedelta_display(total_acumulado_td),
-            'saldo_mensual': format_timedelta_display(saldo_mensual_td),
+            'nombre': fila['perfil'].user.username,
+            'saldo_total': format_timedelta_display(fila['saldo_total']),
+            'saldo_mensual': format_timedelta_display(fila['saldo_mensual']),
             'registros': registros_formateados,
         })
         
@@ -357,179 +326,48 @@ def calendario_solicitudes_view(request):
 # =================================================================
 @requiere_nivel(1)
 def journal_data_api(request):
+    """
+    Feed de eventos de FullCalendar. Responde siempre sobre una ventana
+    acotada (start/end del calendario y los filtros del formulario) y se
+    arma desde la caché por empleado y mes (ver calendario.py), con
+    ETag/Last-Modified para que el navegador reciba 304 si nada cambió.
+    """
     user = request.user
     # Usamos '' como valor por defecto para manejar correctamente 'Todos los funcionarios'
-    empleado_username = request.GET.get('empleado', '') 
-    tipo_dato = request.GET.get('tipo') 
-    
-    if not tipo_dato or tipo_dato not in ['horas', 'solicitudes']:
-        return JsonResponse({'error': 'Tipo de dato (tipo) es requerido o inválido.'}, status=400)
-
-    # 1. FILTRO BASE: Rango de Fechas
-    q_filter = Q()
-    
-    fecha_inicio_str = request.GET.get('fecha_inicio')
-    fecha_fin_str = request.GET.get('fecha_fin')
-    
-    try:
-        if fecha_inicio_str:
-            fecha_inicio = datetime.strptime(fecha_inicio_str, '%Y-%m-%d').date()
-            # Filtra por el campo de fecha correcto según el tipo de dato
-            date_field = 'fecha' if tipo_dato == 'horas' else 'fecha_libre'
-            q_filter &= Q(**{f'{date_field}__gte': fecha_inicio})
-        
-        if fecha_fin_str:
-            fecha_fin = datetime.strptime(fecha_fin_str, '%Y-%m-%d').date()
-            date_field = 'fecha' if tipo_dato == 'horas' else 'fecha_libre'
-            q_filter &= Q(**{f'{date_field}__lte': fecha_fin})
-            
-    except ValueError:
-        # Si el formato de fecha es incorrecto, simplemente no aplica el filtro de fecha
-        pass 
-        
-    data = []
-    
-    # ----------------------------------------------------------------------
-    # LÓGICA PARA JORNADAS DE TRABAJO (TIPO: HORAS)
-    # ----------------------------------------------------------------------
-    if tipo_dato == 'horas':
-        from .models import RegistroJornada
-        
-        # 2. FILTRO DE EMPLEADO para HORAS
-        horas_empleado_filter = Q()
-        if user.is_staff:
-            # Si es staff y se ha filtrado a un empleado específico:
-            if empleado_username: 
-                horas_empleado_filter &= Q(empleado__username__iexact=empleado_username)
-            # Si no hay empleado_username (''), el filtro queda Q(), mostrando todos.
-        else:
-            # Si NO es staff, solo ve sus propias jornadas
-            horas_empleado_filter &= Q(empleado=user) 
-
-        # Se aplica el filtro de fechas (q_filter) Y el de empleado
-        jornadas_qs = RegistroJornada.objects.filter(q_filter & horas_empleado_filter).select_related('empleado').order_by('fecha')
-        
-        # ... (rest of the processing logic for 'horas' is correct and maintained)
-        for jornada in jornadas_qs:
-            empleado_nombre = jornada.empleado.username.capitalize() 
-            
-            url_edicion = None
-            # Permitir edición solo a Staff o al propio empleado
-            if user.is_staff or user.username == jornada.empleado.username: 
-                url_edicion = reverse('control_horas:editar_registro', args=[jornada.pk])
-            
-            # --- CORRECCIÓN DE DATOS PARA INCOMPLETO/COMPLETO ---
-            
-            if jornada.salida_forzada or jornada.horas_netas is None:
-                salida_fmt = jornada.salida.strftime('%H:%M') if jornada.salida else 'N/A'
-                
-                data.append({
-                    'id': jornada.pk,
-                    'title': f'⚠️ Error: Entrada {jornada.entrada.strftime("%H:%M")}',
-                    'start': jornada.fecha.isoformat(),
-                    'allDay': True,
-                    'backgroundColor': '#f97316', 
-                    'borderColor': '#f97316',
-                    'url': url_edicion,
-                    'extendedProps': {
-                        'tipo': 'incompleto', 
-                        'empleado': empleado_nombre,
-                        'entrada': jornada.entrada.strftime('%H:%M'),
-                        'salida': salida_fmt, 
-                        'horas_netas': 'N/A',
-                        'horas_extras': 'N/A', 
-                        'mensaje': 'Registro Incompleto. Requiere corrección.',
-                    },
-                    'className': 'fc-event-jornada-base'
-                })
-            
-            else: 
-                try:
-                    # Se asume que format_timedelta_display está definido. Si no, se usa str().
-                    saldo_display = format_timedelta_display(jornada.horas_extras)
-                    horas_netas_display = format_timedelta_display(jornada.horas_netas)
-                except NameError:
-                    saldo_display = str(jornada.horas_extras)
-                    horas_netas_display = str(jornada.horas_netas)
-                
-                if jornada.horas_extras and jornada.horas_extras > timedelta(minutes=0):
-                    bg_color = '#10b981'
-                    title = f'✅ {horas_netas_display} (+{saldo_display} Extra)'
-                else:
-                    bg_color = '#60a5fa'
-                    title = f'✔️ {horas_netas_display}'
-
-                data.append({
-                    'id': jornada.pk,
-                    'title': title, 
-                    'start': jornada.fecha.isoformat(),
-                    'allDay': True, 
-                    'backgroundColor': bg_color,
-                    'borderColor': bg_color,
-                    'url': url_edicion,
-                    'extendedProps': {
-                        'tipo': 'completo', 
-                        'empleado': empleado_nombre,
-                        'entrada': jornada.entrada.strftime('%H:%M'),
-                        'salida': jornada.salida.strftime('%H:%M'),
-                        'horas_netas': horas_netas_display,
-                        'horas_extras': saldo_display, 
-                    },
-                    'className': 'fc-event-jornada-base' 
-                })
-
-
-    # ----------------------------------------------------------------------
-    # LÓGICA PARA SOLICITUDES (TIPO: SOLICITUDES) - REFORZADO
-    # ----------------------------------------------------------------------
-    elif tipo_dato == 'solicitudes':
-        from .models import SolicitudLibre 
-        
-        # 2. FILTRO DE EMPLEADO para SOLICITUDES (Aplicando restricción para no-staff)
-        solicitudes_empleado_filter = Q()
-        
-        if user.is_staff:
-            # Staff: ve todas o las del empleado filtrado.
-            if empleado_username:
-                solicitudes_empleado_filter &= Q(empleado__username=empleado_username) 
-        else:
-            # No-Staff: solo ve sus propias solicitudes.
-            solicitudes_empleado_filter &= Q(empleado=user)
-
+    empleado_username = request.GET.get('empleado', '')
+    tipo_dato = request.GET.get('tipo')
 
-        # 3. EJECUTAR QUERYSET CON AMBOS FILTROS
-        solicitudes = SolicitudLibre.objects.filter(q_filter & solicitudes_empleado_filter).select_related('empleado').order_by('fecha_libre')
-        
-        # 4. PROCESAR DATOS
-        for sol in solicitudes:
-            empleado_nombre = sol.empleado.username.capitalize()
+    if not tipo_dato or tipo_dato not in calendario.TIPOS:
+        return JsonResponse({'error': 'Tipo de dato (tipo) es requerido o inválido.'}, status=400)
 
-            try:
-                horas_solicitadas_display = format_timedelta_display(sol.horas_solicitadas)
-            except NameError:
-                horas_solicitadas_display = str(sol.horas_solicitadas)
+    # 1. VENTANA DE FECHAS (nunca el historial completo)
+    inicio, fin = calendario.ventana_desde_parametros(request.GET)
+    meses = calendario.meses_de_ventana(inicio, fin)
 
-            color_map = {'APROBADO': '#10b981', 'PENDIENTE': '#f59e0b', 'RECHAZADO': '#dc3545'}
-            class_map = {'APROBADO': 'fc-event-day_libre-aprobado', 'PENDIENTE': 'fc-event-day_libre-pendiente', 'RECHAZADO': 'fc-event-day_libre-rechazado'}
-            
-            data.append({
-                'id': f'sol-{sol.pk}',
-                'title': f'{empleado_nombre} ({sol.estado})',
-                'start': sol.fecha_libre.isoformat(),
-                'allDay': True,
-                'backgroundColor': color_map.get(sol.estado, '#6c757d'),
-                'borderColor': color_map.get(sol.estado, '#6c757d'),
-                'extendedProps': {
-                    'empleado': empleado_nombre,
-                    'estado': sol.estado,
-                    'horas_solicitadas': horas_solicitadas_display,
-                    'motivo': sol.motivo or 'No especificado', 
-                    'tipo': 'dia_libre',
-                },
-                'className': class_map.get(sol.estado, 'fc-event-other')
-            })
-
-    return JsonResponse(data, safe=False)
+    # 2. EMPLEADOS VISIBLES: el staff ve todos o el filtrado; el resto, solo lo suyo
+    if not user.is_staff:
+        empleado_ids = [user.id]
+    elif empleado_username:
+        empleado_ids = list(User.objects.filter(username__iexact=empleado_username).values_list('id', flat=True))
+    else:
+        empleado_ids = list(User.objects.values_list('id', flat=True))
+
+    # 3. VALIDACIÓN CONDICIONAL: sin cambios en esos meses -> 304 sin tocar la base
+    versiones = calendario.versiones(tipo_dato, empleado_ids, meses)
+    etag, ultima_modificacion = calendario.validadores(tipo_dato, (inicio, fin), versiones)
+    no_modificado = get_conditional_response(request, etag=etag, last_modified=ultima_modificacion)
+    if no_modificado is not None:
+        return no_modificado
+
+    data = calendario.eventos_calendario(
+        tipo_dato, empleado_ids, inicio, fin, versiones, format_timedelta_display
+    )
+
+    response = JsonResponse(data, safe=False)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(ultima_modificacion)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 @requiere_nivel(5)
 def editar_registro_jornada_view(request, registro_id):
     
@@ -666,16 +504,19 @@ def gestion_solicitudes_view(request):
     Vista de gestión para administradores: ver solicitudes pendientes y pasadas.
     """
     # Solicitudes pendientes (más importantes)
-    pendientes = SolicitudLibre.objects.filter(estado='PENDIENTE').order_by('fecha_solicitud')
+    pendientes = SolicitudLibre.objects.filter(estado='PENDIENTE').select_related('empleado').order_by('fecha_solicitud')
     
     # Solicitudes recientes (últimas 20 aprobadas/rechazadas)
-    recientes = SolicitudLibre.objects.exclude(estado='PENDIENTE').order_by('-fecha_solicitud')[:20]
+    recientes = SolicitudLibre.objects.exclude(estado='PENDIENTE').select_related('empleado').order_by('-fecha_solicitud')[:20]
     
     # Obtener el saldo de cada empleado con solicitudes pendientes
-    empleados_con_solicitudes = pendientes.values_list('empleado', flat=True).distinct()
+    empleados_con_solicitudes = User.objects.filter(
+        pk__in=pendientes.values('empleado')
+    ).values_list('pk', 'username')
+    saldos_por_id = saldos.saldos_totales(pk for pk, _ in empleados_con_solicitudes)
     saldos_empleados = {
-        User.objects.get(pk=user_id).username: format_timedelta_display(obtener_saldo_actual(User.objects.get(pk=user_id)))
-        for user_id in empleados_con_solicitudes
+        username: format_timedelta_display(saldos_por_id.get(pk, timedelta(0)))
+        for pk, username in empleados_con_solicitudes
     }
     
     context = {
@@ -740,183 +581,45 @@ def aprobar_rechazar_solicitud(request, solicitud_id):
 @requiere_nivel(5)
 def upload_excel_view(request):
     """
-    Maneja la carga de archivos de jornada. Usa openpyxl para XLSX/XLSM
-    y la lógica de regex/CSV como fallback para otros formatos.
+    Maneja la carga de archivos de jornada. Usa openpyxl (read-only) para XLSX/XLSM
+    y la lógica de regex/CSV como fallback para otros formatos. Todas las
+    jornadas del archivo se guardan con un único upsert en bloque.
     """
     
-    # Declaración de variables globales requeridas por utilidades externas
-    global HORA_INICIO_OFICIAL, DURACION_ALMUERZO, JORNADA_ESTANDAR 
-    
     if request.method == 'POST' and request.FILES.get('archivo'):
         archivo = request.FILES['archivo']
-        registros_actualizados = 0
-        errores = []
-
-        # Determinar si es XLSX (opción B) o CSV (fallback)
-        file_extension = archivo.name.split('.')[-1].lower()
-        is_excel = file_extension in ['xlsx', 'xlsm']
 
         try:
-            file_data_str = ""
-            nro_afiliacion = None
+            # --- 1. PARSEO EN MEMORIA (XLSX read-only o CSV, ver importacion.py) ---
+            resultado = parsear_archivo(archivo.name, archivo.read(), calcular_horas_jornada)
+            nro_afiliacion = resultado['nro_afiliacion']
 
-            if is_excel:
-                # --- 1. PROCESAMIENTO DE ARCHIVOS XLSX (openpyxl) ---
-                workbook = load_workbook(archivo)
-                sheet = workbook.active
-                
-                # Extracción directa de la celda E3
-                nro_afiliacion_raw = sheet['E3'].value
-                
-                if nro_afiliacion_raw:
-                    nro_afiliacion = str(nro_afiliacion_raw).strip() 
-                
-                # Convertir la hoja activa en formato CSV en memoria
-                buffer = io.StringIO()
-                writer = csv.writer(buffer)
-
-                for row in sheet.iter_rows():
-                    writer.writerow([cell.value if cell.value is not None else '' for cell in row])
-                
-                file_data_str = buffer.getvalue()
-                
-            else:
-                # --- 1. PROCESAMIENTO DE ARCHIVOS CSV (Fallback/Original) ---
-                file_data_str = archivo.read().decode('latin-1')
-                file_data_str = file_data_str.replace('\r\n', '\n').replace('\r', '\n')
-                
-                # Extracción con REGEX para CSV
-                pattern = r'N.*?AFILIAC.*?(\d+)'
-                nro_afiliacion = None
-                match = re.search(pattern, file_data_str, re.IGNORECASE | re.DOTALL) 
-                if match:
-                    nro_afiliacion = match.group(1).strip()
-            
             # --- 2. VALIDACIÓN Y BÚSQUEDA POR NÚMERO ---
             if not nro_afiliacion:
                 # Mensaje de error si no se encuentra el Nº de Afiliación
-                primeras_lineas = '\n'.join(file_data_str.split('\n')[:5]).replace('"', '')
-                messages.error(request, f"Error: ¡Fallo crítico! No se pudo extraer el **Número de Afiliación (Cédula)**. Primeras líneas para diagnóstico:\n---\n{primeras_lineas}\n---")
+                messages.error(request, f"Error: ¡Fallo crítico! No se pudo extraer el **Número de Afiliación (Cédula)**. Primeras líneas para diagnóstico:\n---\n{resultado['primeras_lineas']}\n---")
                 return redirect('control_horas:saldo_horas')
 
             # Buscar por el Número de Afiliación en la base de datos
-            # Nota: Asume que PerfilEmpleado está correctamente importado
-            empleado_perfil_obj = PerfilEmpleado.objects.filter(nro_afiliacion=nro_afiliacion).first()
+            empleado_perfil_obj = PerfilEmpleado.objects.filter(nro_afiliacion=nro_afiliacion).select_related('user').first()
             if not empleado_perfil_obj:
                 messages.error(request, f"Error: No se encontró un perfil con el Número de Afiliación: **{nro_afiliacion}**.")
                 return redirect('control_horas:saldo_horas')
 
-            empleado_user_obj = empleado_perfil_obj.user
-            
-            # --- 3. PROCESAMIENTO DE JORNADAS ---
-            csv_reader = csv.reader(io.StringIO(file_data_str), delimiter=',', quotechar='"')
-            
-            fecha_actual = None
-            registro_jornada = {}
-            
-            # Mapeo de meses en español a inglés para el parseo
-            month_map = {
-                'octubre': 'October', 'noviembre': 'November', 'diciembre': 'December',
-                'enero': 'January', 'febrero': 'February', 'marzo': 'March',
-                'abril': 'April', 'mayo': 'May', 'junio': 'June',
-                'julio': 'July', 'agosto': 'August', 'septiembre': 'September',
-            }
-            
-            event_map = {
-                'inicio de jornada': 'entrada',
-                'finaliza la jornada': 'salida',
-            }
+            # --- 3. GUARDADO EN BLOQUE (un upsert para todo el archivo) ---
+            guardar_jornadas({empleado_perfil_obj.user_id: resultado['jornadas']})
+            registros_actualizados = resultado['completas']
+            errores = resultado['errores']
 
-            with transaction.atomic():
-                
-                for row_num, row in enumerate(csv_reader):
-                    # Saltar encabezados, resúmenes y pausas de comida
-                    if len(row) > 0 and 'RESUMEN' in row[0].upper(): break 
-                    if not row or not row[0] or 'total tiempo' in row[0].lower() or 'tiempo total' in row[0].lower(): continue
-                    if len(row) > 1 and row[1].strip().lower() in ['pausa de jornada (comida)', 'reanuda la jornada']: continue 
-
-                    # A. DETECTAR Y PARSEAR LA FECHA (Inicio de un nuevo día)
-                    if ',' in row[0] and any(m in row[0].lower() for m in month_map.keys()): 
-                        try:
-                            # Parsear la fecha
-                            raw_date_part = re.sub(r'^\w+,\s*|\s*\d{2}:\d{2}$', '', row[0].strip().strip('"')).strip()
-                            partes_fecha_en = raw_date_part
-                            for es, en in month_map.items():
-                                partes_fecha_en = partes_fecha_en.replace(es, en)
-                                
-                            nueva_fecha = datetime.strptime(partes_fecha_en, '%d %B %Y').date()
-                            
-                            # --- LÓGICA DE VALIDACIÓN DE JORNADA ABIERTA ---
-                            if fecha_actual and registro_jornada.get('entrada') and not registro_jornada.get('salida'):
-                                errores.append(f"⚠️ REGISTRO INCOMPLETO DETECTADO: {fecha_actual.isoformat()}")
-                                save_incomplete_jornada(empleado_user_obj, fecha_actual, registro_jornada['entrada'])
-                                
-                            # Asignar la nueva fecha y resetear el seguimiento de la jornada
-                            fecha_actual = nueva_fecha
-                            registro_jornada = {'entrada': None, 'salida': None}
-                            continue
-                        except Exception:
-                            # Ignorar líneas que parecen fechas pero no se pueden parsear
-                            pass 
-
-                    # B. DETECTAR Y ASIGNAR HORA (Entrada/Salida)
-                    if fecha_actual and len(row) > 1 and ':' in row[0] and row[1].strip().lower() in event_map:
-                        try:
-                            hora_str_clean = row[0].split(' ')[0].strip()
-                            tipo_evento = row[1].strip().lower()
-                            
-                            hora_evento = datetime.strptime(hora_str_clean, '%H:%M').time()
-                            campo = event_map[tipo_evento]
-                            registro_jornada[campo] = hora_evento
-                            
-                            # Si se detecta la SALIDA y tenemos ENTRADA, calcular y guardar
-                            if campo == 'salida' and registro_jornada.get('entrada'):
-                                
-                                # --- REGLAS DE CÁLCULO ---
-                                # Nota: Asume que calcular_horas_jornada está disponible
-                                duracion_neta, horas_extras = calcular_horas_jornada(
-                                    fecha=fecha_actual,
-                                    entrada=registro_jornada['entrada'],
-                                    salida=registro_jornada['salida']
-                                )
-                                
-                                # Crear o Actualizar el registro
-                                RegistroJornada.objects.update_or_create(
-                                    empleado=empleado_user_obj, 
-                                    fecha=fecha_actual,
-                                    defaults={
-                                        'entrada': registro_jornada['entrada'], 
-                                        'salida': registro_jornada['salida'],
-                                        'horas_netas': duracion_neta,
-                                        'horas_extras': horas_extras,
-                                        'salida_forzada': False, # Registro completo
-                                    }
-                                )
-                                registros_actualizados += 1
-                                # Reiniciar el seguimiento
-                                fecha_actual = None 
-                                registro_jornada = {}
-                                
-                        except Exception as e:
-                            # Captura errores en el parseo o cálculo
-                            errores.append(f"Error procesando la jornada de **{fecha_actual}** (Fila {row_num + 1}). Detalles: {e}")
-                            
-                            # Si hubo un error en el cálculo, intentamos guardar al menos la entrada
-                            if fecha_actual and registro_jornada.get('entrada'):
-                                save_incomplete_jornada(empleado_user_obj, fecha_actual, registro_jornada['entrada'])
-                                
-                            fecha_actual = None 
-                            registro_jornada = {}
-
-                if errores:
-                    messages.warning(request, f"¡Atención! Se cargaron {registros_actualizados} registros, pero hubo registros incompletos en {len(errores)} días. Revise los mensajes de error individuales.")
-                    # Los errores se muestran uno por uno
-                    for err in errores:
-                        messages.error(request, err)
-                else:
-                    messages.success(request, f"¡Procesamiento finalizado! Se cargaron/actualizaron {registros_actualizados} registros para {empleado_perfil_obj.user.username.capitalize()}.")
+            if errores:
+                messages.warning(request, f"¡Atención! Se cargaron {registros_actualizados} registros, pero hubo registros incompletos en {len(errores)} días. Revise los mensajes de error individuales.")
+                # Los errores se muestran uno por uno
+                for err in errores:
+                    messages.error(request, err)
+            else:
+                messages.success(request, f"¡Procesamiento finalizado! Se cargaron/actualizaron {registros_actualizados} registros para {empleado_perfil_obj.user.username.capitalize()}.")
             
-        except InvalidFileException:
+        except (InvalidFileException, BadZipFile):
             messages.error(request, "Error de procesamiento: El archivo subido no es un archivo **Excel (.xlsx)** válido o está corrupto. Intente guardarlo de nuevo.")
         except Exception as e:
             # Captura errores generales
@@ -931,11 +634,46 @@ def upload_excel_view(request):
     # El template base (o upload_excel.html) ya itera sobre 'messages'.
     context = {
         'form': form,
+        'form_lote': UploadLoteForm(),
         # Si el template upload_excel.html tiene un bucle 'if error',
         # puedes eliminarlo y usar solo el bucle 'if messages'.
     }
     return render(request, 'control_horas/upload_excel.html', context)
 
+
+@requiere_nivel(5)
+def upload_lote_view(request):
+    """
+    Carga por lote de fin de mes: varios archivos del reloj o un ZIP.
+    El parseo corre en paralelo y todo se guarda en bloque (ver importacion.py);
+    se muestra un reporte consolidado por archivo.
+    """
+    form_lote = UploadLoteForm(request.POST or None, request.FILES or None)
+    reporte_lote = None
+
+    if request.method == 'POST' and form_lote.is_valid():
+        try:
+            reporte_lote = importar_lote(form_lote.cleaned_data['archivos'], calcular_horas_jornada)
+        except Exception as e:
+            messages.error(request, f"Error al procesar el lote. Detalles: {e}")
+        else:
+            con_error = sum(1 for fila in reporte_lote if fila['estado'] == 'error')
+            registros = sum(fila['registros'] for fila in reporte_lote)
+            empleados = len({fila['empleado'] for fila in reporte_lote if fila['empleado']})
+
+            if con_error:
+                messages.warning(request, f"Lote procesado con errores: {len(reporte_lote) - con_error} de {len(reporte_lote)} archivos cargados ({registros} registros). Revise el reporte.")
+            else:
+                messages.success(request, f"¡Lote procesado! {len(reporte_lote)} archivos, {registros} registros para {empleados} empleados.")
+            form_lote = UploadLoteForm()
+
+    context = {
+        'form': UploadFileForm(),
+        'form_lote': form_lote,
+        'reporte_lote': reporte_lote,
+    }
+    return render(request, 'control_horas/upload_excel.html', context)
+
 @requiere_nivel(1)
 def calculadora_view(request):
     """
@@ -992,35 +730,84 @@ def calculadora_view(request):
 # 6. VISTAS DE REPORTES (Exportación)
 # =================================================================
 
+COLUMNAS_EXPORTACION = [
+    'ID Registro',
+    'Empleado (Username)',
+    'Fecha',
+    'Entrada',
+    'Salida',
+    'Horas Netas (HH:MM:SS)',
+    'Horas Extra (HH:MM:SS)'
+]
+
+# Filas que se traen de la base por cada ida y vuelta del cursor
+TAMANO_BLOQUE_EXPORTACION = 2000
+
+
+def filas_exportacion_jornadas(registros):
+    """
+    Genera las filas de la exportación leyendo con un cursor por bloques.
+    El username viene en el mismo SELECT (JOIN) y no se instancian modelos.
+    """
+    columnas = registros.values_list(
+        'pk', 'empleado__username', 'fecha', 'entrada', 'salida', 'horas_netas', 'horas_extras'
+    )
+    for pk, username, fecha, entrada, salida, horas_netas, horas_extras in columnas.iterator(chunk_size=TAMANO_BLOQUE_EXPORTACION):
+        yield [
+            pk,
+            username,
+            fecha.isoformat(),
+            entrada.strftime('%H:%M:%S') if entrada else '',
+            salida.strftime('%H:%M:%S') if salida else '',
+            format_timedelta_to_hhmmss(horas_netas),
+            format_timedelta_to_hhmmss(horas_extras),
+        ]
+
+
+def stream_csv_jornadas(registros):
+    """CSV línea por línea: la descarga empieza con el primer bloque."""
+    return stream_csv(COLUMNAS_EXPORTACION, filas_exportacion_jornadas(registros))
+
+
+def stream_xlsx_jornadas(registros, tamano_chunk=64 * 1024):
+    """
+    XLSX con openpyxl en modo write_only (las filas no quedan en memoria).
+    El formato zip obliga a cerrar el libro antes de enviarlo: se arma en un
+    archivo temporal (en disco si supera 1 MB) y se envía por bloques.
+    """
+    from openpyxl import Workbook
+    from tempfile import SpooledTemporaryFile
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet('Jornadas')
+    hoja.append(COLUMNAS_EXPORTACION)
+    for fila in filas_exportacion_jornadas(registros):
+        hoja.append(fila)
+
+    with SpooledTemporaryFile(max_size=1024 * 1024) as temporal:
+        libro.save(temporal)
+        temporal.seek(0)
+        while True:
+            bloque = temporal.read(tamano_chunk)
+            if not bloque:
+                break
+            yield bloque
+
+
 @requiere_nivel(1)
 def export_jornadas_csv(request):
     """
-    Exporta los registros de jornada a un archivo CSV.
+    Exporta los registros de jornada a CSV (por defecto) o XLSX (?formato=xlsx).
+    La respuesta es un StreamingHttpResponse: memoria constante aunque se
+    exporte un año completo de todo el personal.
     """
-    # 1. Preparar la respuesta HTTP para CSV
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = f'attachment; filename="reporte_jornadas_{timezone.now().strftime("%Y%m%d_%H%M%S")}.csv"'
-
-    csv_buffer = io.StringIO()
-    writer = csv.writer(csv_buffer)
-
-    # 2. Definir encabezados del CSV
-    writer.writerow([
-        'ID Registro',
-        'Empleado (Username)',
-        'Fecha',
-        'Entrada',
-        'Salida',
-        'Horas Netas (HH:MM:SS)',
-        'Horas Extra (HH:MM:SS)'
-    ])
-
-    # 3. Filtrado de datos (por parámetros GET)
+    # 1. Filtrado de datos (por parámetros GET)
     registros = RegistroJornada.objects.all().order_by('empleado__username', 'fecha')
     
     empleado_username = request.GET.get('empleado')
     fecha_inicio_str = request.GET.get('fecha_inicio')
     fecha_fin_str = request.GET.get('fecha_fin')
+    formato = request.GET.get('formato', 'csv').lower()
     
     try:
         if empleado_username:
@@ -1038,22 +825,22 @@ def export_jornadas_csv(request):
         messages.error(request, "Error en el formato de fecha de filtrado. Se esperaba AAAA-MM-DD.")
         return redirect('control_horas:saldo_horas') 
 
+    # 2. Respuesta en streaming según el formato
+    nombre_base = f'reporte_jornadas_{timezone.now().strftime("%Y%m%d_%H%M%S")}'
+
+    if formato == 'xlsx':
+        response = StreamingHttpResponse(
+            stream_xlsx_jornadas(registros),
+            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{nombre_base}.xlsx"'
+    else:
+        response = StreamingHttpResponse(stream_csv_jornadas(registros), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{nombre_base}.csv"'
 
-    # 4. Escribir los datos en el CSV
-    for registro in registros:
-        writer.writerow([
-            registro.pk,
-            registro.empleado.username,
-            registro.fecha.isoformat(),
-            registro.entrada.strftime('%H:%M:%S'),
-            registro.salida.strftime('%H:%M:%S'),
-            format_timedelta_to_hhmmss(registro.horas_netas),
-            format_timedelta_to_hhmmss(registro.horas_extras),
-        ])
-
-    # 5. Escribir el contenido del buffer a la respuesta
-    response.write(csv_buffer.getvalue())
     return response
+
+
 def control_horas_dashboard(request):
     """
     Vista principal del dashboard de Control de Horas, dentro del módulo RR.HH.
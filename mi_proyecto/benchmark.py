@@ -0,0 +1,532 @@
+# mi_proyecto/benchmark.py - BANCO DE PRUEBAS DE RENDIMIENTO
+
+"""
+Genera datos sintéticos con volúmenes realistas (inventario, movimientos,
+facturas, jornadas, solicitudes y reportes de asistencia), mide las vistas y
+funciones clave y arma un reporte JSON comparable entre corridas.
+
+Se usa desde `manage.py benchmark`, que corre siempre sobre una base de
+datos de prueba descartable (nunca sobre la de producción).
+
+Los datos son deterministas para una misma escala y semilla, así que dos
+reportes de la misma escala se pueden comparar con comparar_reportes().
+"""
+
+import io
+import json
+import platform
+import random
+import statistics
+import time
+from contextlib import redirect_stdout
+from datetime import date, datetime, timedelta
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+
+from clientes.models import Empresa, ReporteAsistencia
+from clientes.pdf import abrir_pdf, generar_artefacto, invalidar_artefactos
+from compras.busqueda import cache_autocompletado
+from compras.models import Factura, FacturaProducto, Inventario, Proveedor, StockMovement
+from compras.valoracion import reconstruir_valoracion
+from control_horas import saldos
+from control_horas.models import PerfilEmpleado, RegistroJornada, SolicitudLibre
+
+VERSION_REPORTE = 1
+TAMANO_LOTE = 2000
+
+ESCALAS = {
+    'pequena': {
+        'skus': 2_000, 'movimientos': 50_000, 'empleados': 20, 'anios': 1,
+        'facturas': 500, 'lineas_factura': 8, 'reportes': 300,
+    },
+    'media': {
+        'skus': 10_000, 'movimientos': 200_000, 'empleados': 50, 'anios': 2,
+        'facturas': 2_000, 'lineas_factura': 10, 'reportes': 2_000,
+    },
+    'grande': {
+        'skus': 50_000, 'movimientos': 1_000_000, 'empleados': 200, 'anios': 5,
+        'facturas': 10_000, 'lineas_factura': 10, 'reportes': 10_000,
+    },
+}
+
+PRODUCTOS = ('Rodamiento', 'Correa', 'Filtro', 'Sensor', 'Válvula', 'Motor', 'Contactor',
+             'Relé', 'Cable', 'Manguera', 'Tornillo', 'Engranaje', 'Bomba', 'Fusible')
+MATERIALES = ('acero', 'inoxidable', 'bronce', 'PVC', 'aluminio', 'goma', 'cobre')
+MARCAS = ('SKF', 'Siemens', 'Schneider', 'Festo', 'WEG', 'ABB', 'Gates', 'Parker')
+
+PREFIJO_SKU = 'BM'
+USUARIO_BENCHMARK = 'benchmark'
+DIAS_SEMANA = ('lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo')
+NOMBRES_MES = ('enero', 'febrero', 'marzo', 'abril', 'mayo', 'junio', 'julio',
+               'agosto', 'septiembre', 'octubre', 'noviembre', 'diciembre')
+
+
+# ==========================================================
+# 1. GENERADORES DE DATOS SINTÉTICOS
+# ==========================================================
+
+def _en_lotes(objetos, tamano=TAMANO_LOTE * 10):
+    lote = []
+    for objeto in objetos:
+        lote.append(objeto)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def _sku(indice):
+    return f'{PREFIJO_SKU}{indice:06d}'
+
+
+def generar_inventario(rnd, cantidad):
+    ubicaciones = [f'Estante {letra}{numero}' for letra in 'ABCDEFGH' for numero in range(1, 6)]
+
+    def productos():
+        for i in range(cantidad):
+            precio = rnd.randint(5, 2_000) * 1000
+            yield Inventario(
+                CodigoProducto=_sku(i),
+                Producto=f'{rnd.choice(PRODUCTOS)} {rnd.choice(MATERIALES)} {rnd.randint(1, 500)}mm',
+                Marca=rnd.choice(MARCAS),
+                Modelo=f'M-{rnd.randint(100, 999)}',
+                Cantidad=float(rnd.randint(0, 300)),
+                Ubicacion=rnd.choice(ubicaciones),
+                MinimoAdmisible=float(rnd.randint(0, 20)),
+                MaximoAdmisible=float(rnd.randint(50, 400)),
+                PrecioGS=float(precio),
+                PrecioUSD=round(precio / 7300, 2),
+                PrecioTotalGS=0.0,
+            )
+
+    for lote in _en_lotes(productos()):
+        for producto in lote:
+            producto.recalcular_totales()
+        Inventario.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+
+
+def generar_movimientos(rnd, cantidad, skus, anios):
+    ahora = timezone.now()
+    minutos_historia = anios * 365 * 24 * 60
+
+    def movimientos():
+        for _ in range(cantidad):
+            tipo = rnd.choices(('ENTRADA', 'SALIDA', 'AJUSTE'), weights=(5, 4, 1))[0]
+            cantidad_movida = float(rnd.randint(1, 50))
+            costo = rnd.randint(5, 2_000) * 1000
+            yield StockMovement(
+                producto_id=rnd.choice(skus),
+                tipo_movimiento=tipo,
+                cantidad_movida=cantidad_movida,
+                fecha_movimiento=ahora - timedelta(minutes=rnd.randint(0, minutos_historia)),
+                motivo='Movimiento sintético',
+                costo_unitario=costo,
+                costo_total=costo * cantidad_movida,
+                referencia=f'BM-{rnd.randint(1, 99_999)}',
+            )
+
+    for lote in _en_lotes(movimientos()):
+        StockMovement.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+    # bulk_create no pasa por las señales: los acumulados de valoración se arman al final
+    reconstruir_valoracion()
+
+
+def generar_facturas(rnd, cantidad, lineas_por_factura, skus, usuario):
+    proveedores = [
+        Proveedor(ruc=f'80{i:06d}-1', nombre=f'Proveedor Benchmark {i}', activo=True)
+        for i in range(max(10, cantidad // 50))
+    ]
+    Proveedor.objects.bulk_create(proveedores, batch_size=TAMANO_LOTE)
+
+    hoy = date.today()
+    facturas = [
+        Factura(
+            numero_factura=f'BM-001-{i:07d}',
+            proveedor=proveedor,
+            ruc_proveedor=proveedor.ruc,
+            fecha_emision=hoy - timedelta(days=rnd.randint(0, 365 * 2)),
+            monto_total=0,
+            pdf_original=f'facturas/originales/bm_{i}.pdf',
+            estado='procesada',
+            usuario=usuario,
+        )
+        for i, proveedor in ((i, rnd.choice(proveedores)) for i in range(cantidad))
+    ]
+    for lote in _en_lotes(facturas):
+        Factura.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+
+    ids = list(Factura.objects.filter(numero_factura__startswith='BM-').values_list('id', flat=True))
+
+    def detalles():
+        for factura_id in ids:
+            for sku in rnd.sample(skus, lineas_por_factura):
+                detalle = FacturaProducto(
+                    factura_id=factura_id, producto_id=sku,
+                    cantidad=float(rnd.randint(1, 40)), precio_unitario=rnd.randint(5, 2_000) * 1000,
+                )
+                detalle.calcular_subtotal()
+                yield detalle
+
+    for lote in _en_lotes(detalles()):
+        FacturaProducto.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+
+
+def generar_empleados(cantidad):
+    User.objects.bulk_create(
+        [User(username=f'bm_emp{i:04d}', first_name=f'Empleado {i}') for i in range(cantidad)],
+        batch_size=TAMANO_LOTE,
+    )
+    usuarios = list(User.objects.filter(username__startswith='bm_emp').order_by('username'))
+    PerfilEmpleado.objects.bulk_create(
+        [PerfilEmpleado(user=u, nivel=1, nro_afiliacion=f'9{i:05d}') for i, u in enumerate(usuarios)],
+        batch_size=TAMANO_LOTE,
+    )
+    return usuarios
+
+
+def generar_jornadas(rnd, usuarios, anios):
+    """Jornadas de lunes a viernes de los últimos `anios` años, con algunas incompletas."""
+    hoy = date.today()
+    inicio = hoy - timedelta(days=365 * anios)
+    dias = [inicio + timedelta(days=d) for d in range((hoy - inicio).days) if (inicio + timedelta(days=d)).weekday() < 5]
+
+    def jornadas():
+        for usuario in usuarios:
+            for dia in dias:
+                entrada = datetime.combine(dia, datetime.min.time()) + timedelta(hours=7, minutes=rnd.randint(0, 30))
+                if rnd.random() < 0.02:
+                    yield RegistroJornada(
+                        empleado_id=usuario.id, fecha=dia, entrada=entrada.time(),
+                        salida=None, horas_netas=None, horas_extras=timedelta(0), salida_forzada=True,
+                    )
+                    continue
+                salida = entrada + timedelta(hours=9, minutes=rnd.randint(0, 180))
+                horas_netas = salida - entrada - timedelta(hours=1)
+                yield RegistroJornada(
+                    empleado_id=usuario.id, fecha=dia, entrada=entrada.time(), salida=salida.time(),
+                    horas_netas=horas_netas, horas_extras=max(timedelta(0), horas_netas - timedelta(hours=8)),
+                )
+
+    for lote in _en_lotes(jornadas()):
+        RegistroJornada.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+
+    def solicitudes():
+        for usuario in usuarios:
+            for dia in rnd.sample(dias, min(len(dias), 10 * anios)):
+                yield SolicitudLibre(
+                    empleado_id=usuario.id, fecha_libre=dia,
+                    horas_solicitadas=timedelta(hours=rnd.choice((4, 8))),
+                    estado=rnd.choices(('APROBADO', 'PENDIENTE', 'RECHAZADO'), weights=(7, 2, 1))[0],
+                    motivo='Solicitud sintética',
+                )
+
+    for lote in _en_lotes(solicitudes()):
+        SolicitudLibre.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+
+    # bulk_create no dispara señales: el libro de saldos se arma de una vez
+    saldos.escribir_libro(saldos.rollups_desde_registros())
+
+
+def generar_reportes(rnd, cantidad, usuario):
+    empresas = Empresa.objects.bulk_create(
+        [Empresa(nombre=f'Cliente Benchmark {i}') for i in range(max(5, cantidad // 100))],
+        batch_size=TAMANO_LOTE,
+    )
+    empresas = list(Empresa.objects.filter(nombre__startswith='Cliente Benchmark'))
+    hoy = date.today()
+    reportes = (
+        # bulk_create no pasa por save(): el número se asigna acá
+        ReporteAsistencia(
+            numero_reporte=f'AST-BM-{i:06d}',
+            fecha_asistencia=hoy - timedelta(days=rnd.randint(0, 365 * 3)),
+            empresa=rnd.choice(empresas),
+            maquina=f'{rnd.choice(PRODUCTOS)} línea {rnd.randint(1, 9)}',
+            persona_solicita=f'Encargado {rnd.randint(1, 50)}',
+            usuario=usuario,
+            problema='Equipo detenido. ' * rnd.randint(1, 5),
+            problema_encontrado='Componente desgastado. ' * rnd.randint(1, 5),
+            solucion='Se reemplazó el componente y se probó el equipo. ' * rnd.randint(1, 5),
+        )
+        for i in range(cantidad)
+    )
+    for lote in _en_lotes(reportes):
+        ReporteAsistencia.objects.bulk_create(lote, batch_size=TAMANO_LOTE)
+
+
+def usuario_benchmark():
+    usuario, creado = User.objects.get_or_create(
+        username=USUARIO_BENCHMARK, defaults={'is_staff': True, 'is_superuser': True}
+    )
+    if creado:
+        PerfilEmpleado.objects.create(user=usuario, nivel=5)
+    return usuario
+
+
+def generar_datos(escala, semilla=1, salida=None):
+    """
+    Llena la base con los volúmenes de `escala`. Si los datos de esa escala ya
+    están (base reutilizada con --db), no genera nada. Retorna los segundos por etapa.
+    """
+    volumen = ESCALAS[escala]
+    usuario = usuario_benchmark()
+    if Inventario.objects.filter(CodigoProducto__startswith=PREFIJO_SKU).count() == volumen['skus']:
+        return {}
+
+    rnd = random.Random(semilla)
+    skus = [_sku(i) for i in range(volumen['skus'])]
+    etapas = (
+        ('inventario', lambda: generar_inventario(rnd, volumen['skus'])),
+        ('movimientos', lambda: generar_movimientos(rnd, volumen['movimientos'], skus, volumen['anios'])),
+        ('facturas', lambda: generar_facturas(rnd, volumen['facturas'], volumen['lineas_factura'], skus, usuario)),
+        ('jornadas', lambda: generar_jornadas(rnd, generar_empleados(volumen['empleados']), volumen['anios'])),
+        ('reportes', lambda: generar_reportes(rnd, volumen['reportes'], usuario)),
+    )
+
+    segundos = {}
+    for nombre, generar in etapas:
+        inicio = time.perf_counter()
+        with transaction.atomic():
+            generar()
+        segundos[nombre] = round(time.perf_counter() - inicio, 2)
+        if salida:
+            salida(f'  {nombre}: {segundos[nombre]} s')
+    return segundos
+
+
+def contar_datos():
+    modelos = (Inventario, StockMovement, Factura, FacturaProducto, RegistroJornada, SolicitudLibre, ReporteAsistencia)
+    return {modelo._meta.label: modelo.objects.count() for modelo in modelos}
+
+
+def archivo_reloj(nro_afiliacion, anio, mes):
+    """XLSX con el formato del reloj de asistencia (ver control_horas/importacion.py)."""
+    nombre_mes = NOMBRES_MES[mes - 1]
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(['REPORTE DE ASISTENCIA'])
+    hoja.append([''])
+    hoja.append(['', '', '', 'N° AFILIACION', nro_afiliacion])
+    hoja.append([''])
+    dia = date(anio, mes, 1)
+    while dia.month == mes:
+        if dia.weekday() < 5:
+            hoja.append([f'{DIAS_SEMANA[dia.weekday()]}, {dia.day} {nombre_mes} {anio} 00:00', ''])
+            hoja.append(['07:05', 'Inicio de jornada'])
+            hoja.append(['12:00', 'Pausa de jornada (comida)'])
+            hoja.append([f'{17 + dia.day % 3}:30', 'Finaliza la jornada'])
+            hoja.append(['Total tiempo', '9:00'])
+        dia += timedelta(days=1)
+    contenido = io.BytesIO()
+    libro.save(contenido)
+    return contenido.getvalue()
+
+
+# ==========================================================
+# 2. CASOS MEDIDOS
+# ==========================================================
+
+def casos_benchmark(escala):
+    """
+    Lista de (nombre, ejecutar, antes). `ejecutar` hace el request o la llamada
+    medida; `antes` (opcional) prepara cada repetición y no se mide.
+    """
+    volumen = ESCALAS[escala]
+    cliente = Client()
+    cliente.force_login(usuario_benchmark())
+    rnd = random.Random(2)
+    hoy = date.today()
+
+    empleado = User.objects.filter(username__startswith='bm_emp').order_by('username').first()
+    perfil = PerfilEmpleado.objects.get(user=empleado)
+    reporte_id = ReporteAsistencia.objects.filter(numero_reporte__startswith='AST-BM-').values_list('id', flat=True).first()
+    proveedor = Proveedor.objects.filter(ruc__startswith='80').first()
+    skus = [_sku(i) for i in range(volumen['skus'])]
+    inicio_vista = hoy.replace(day=1) - timedelta(days=6)
+    ventana = {'start': inicio_vista.isoformat(), 'end': (inicio_vista + timedelta(days=42)).isoformat()}
+    reloj = archivo_reloj(perfil.nro_afiliacion, hoy.year, hoy.month)
+    facturas_creadas = []
+
+    def get(nombre_url, *args, **params):
+        return lambda: cliente.get(reverse(nombre_url, args=args), params, secure=True)
+
+    def nueva_factura():
+        factura = Factura.objects.create(
+            numero_factura=f'BM-CASO-{len(facturas_creadas):06d}-{time.time_ns()}',
+            proveedor=proveedor, ruc_proveedor=proveedor.ruc, fecha_emision=hoy,
+            monto_total=0, pdf_original='facturas/originales/bm_caso.pdf', usuario=usuario_benchmark(),
+        )
+        facturas_creadas.append(factura.id)
+
+    def guardar_factura():
+        datos = {'factura_id': facturas_creadas[-1], 'nombre_proveedor': proveedor.nombre}
+        for i, sku in enumerate(rnd.sample(skus, 50), start=1):
+            datos[f'producto_id_{i}'] = sku
+            datos[f'cantidad_{i}'] = str(rnd.randint(1, 10))
+            datos[f'precio_unitario_{i}'] = str(rnd.randint(5, 500) * 1000)
+        return cliente.post(reverse('compras:guardar_factura'), datos, secure=True)
+
+    def reporte_para_pdf():
+        return (
+            ReporteAsistencia.objects.select_related('empresa', 'usuario')
+            .prefetch_related('archivos').get(pk=reporte_id)
+        )
+
+    exportacion = {
+        'empresa': ReporteAsistencia.objects.filter(pk=reporte_id).values_list('empresa_id', flat=True).first(),
+        'desde': (hoy - timedelta(days=180)).isoformat(),
+        'hasta': hoy.isoformat(),
+        'descargar': '1',
+    }
+
+    def pdfs_exportacion():
+        # Solo se mide el ZIP de PDFs ya generados: los procesos del pool no ven
+        # la base de prueba (en memoria) del benchmark
+        reportes = ReporteAsistencia.objects.filter(
+            empresa_id=exportacion['empresa'], fecha_asistencia__gte=hoy - timedelta(days=180),
+        ).select_related('empresa', 'usuario').prefetch_related('archivos')
+        for reporte in reportes:
+            abrir_pdf(reporte)[0].close()
+
+    def asegurar_pdf():
+        # La descarga medida es la del PDF ya generado; el render lo mide reporte_pdf_render
+        abrir_pdf(reporte_para_pdf())[0].close()
+
+    def subir_reloj():
+        return cliente.post(
+            reverse('control_horas:upload_excel'),
+            {'archivo': SimpleUploadedFile('reloj.xlsx', reloj)},
+            secure=True,
+        )
+
+    return [
+        ('deposito_view', get('compras:deposito'), None),
+        ('deposito_view_busqueda', get('compras:deposito', search='rodamiento acero'), None),
+        ('detalle_producto_view', get('compras:detalle_producto', skus[0], agrupar='semana'), None),
+        ('valoracion_view', get('compras:valoracion'), None),
+        ('valoracion_view_fecha', get('compras:valoracion', fecha=(hoy - timedelta(days=90)).isoformat()), None),
+        ('search_products_ajax', get('compras:search_products_ajax', q='rodamiento'), cache_autocompletado.invalidar),
+        ('guardar_factura', guardar_factura, nueva_factura),
+        ('saldo_horas_view', get('control_horas:saldo_horas'), None),
+        ('journal_data_api_frio', get('control_horas:journal_data_api', tipo='horas', **ventana), cache.clear),
+        ('journal_data_api_cache', get('control_horas:journal_data_api', tipo='horas', **ventana), None),
+        ('upload_excel_view', subir_reloj, None),
+        ('reporte_pdf', get('clientes:reporte_pdf', reporte_id), asegurar_pdf),
+        ('reporte_pdf_encolar', get('clientes:reporte_pdf', reporte_id), lambda: invalidar_artefactos(reporte_id)),
+        ('reporte_pdf_render', lambda: generar_artefacto(reporte_para_pdf()), lambda: invalidar_artefactos(reporte_id)),
+        ('exportar_reportes_zip', get('clientes:exportar_reportes', **exportacion), pdfs_exportacion),
+        ('saldos.conciliar', saldos.conciliar, None),
+    ]
+
+
+def _consumir(resultado):
+    """Fuerza el cuerpo de las respuestas en streaming para medirlas completas."""
+    if getattr(resultado, 'streaming', False):
+        for _ in resultado.streaming_content:
+            pass
+    return getattr(resultado, 'status_code', None)
+
+
+def medir_caso(ejecutar, antes, repeticiones):
+    tiempos = []
+    consultas = []
+    estado = None
+    for _ in range(repeticiones):
+        if antes:
+            antes()
+        with CaptureQueriesContext(connection) as capturadas, redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            estado = _consumir(ejecutar())
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        consultas.append(len(capturadas))
+
+    tiempos.sort()
+    return {
+        'ms_min': round(tiempos[0], 2),
+        'ms_mediana': round(statistics.median(tiempos), 2),
+        'ms_p95': round(tiempos[min(len(tiempos) - 1, int(round(0.95 * (len(tiempos) - 1))))], 2),
+        'ms_max': round(tiempos[-1], 2),
+        'consultas': max(consultas),
+        'estado_http': estado,
+    }
+
+
+# ==========================================================
+# 3. REPORTE Y COMPARACIÓN
+# ==========================================================
+
+def ejecutar_benchmark(escala='pequena', repeticiones=5, semilla=1, solo=None, salida=None):
+    generacion = generar_datos(escala, semilla, salida)
+    datos = contar_datos()
+    casos = {}
+    for nombre, ejecutar, antes in casos_benchmark(escala):
+        if solo and nombre not in solo:
+            continue
+        casos[nombre] = medir_caso(ejecutar, antes, repeticiones)
+        if salida:
+            resultado = casos[nombre]
+            salida(f'  {nombre}: mediana {resultado["ms_mediana"]} ms, {resultado["consultas"]} consultas')
+
+    return {
+        'version': VERSION_REPORTE,
+        'fecha': timezone.now().isoformat(),
+        'escala': escala,
+        'volumen': ESCALAS[escala],
+        'semilla': semilla,
+        'repeticiones': repeticiones,
+        'entorno': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'base_de_datos': connection.vendor,
+            'base_en_memoria': connection.vendor == 'sqlite' and connection.is_in_memory_db(),
+            'plataforma': platform.platform(),
+        },
+        'datos': datos,
+        'generacion_segundos': generacion,
+        'casos': casos,
+    }
+
+
+def comparar_reportes(actual, base, tolerancia=0.2):
+    """
+    Regresiones de `actual` contra `base`: casos cuya mediana empeoró más que
+    `tolerancia` (0.2 = 20 %) o que hacen más consultas. Lista de textos.
+    """
+    if actual['escala'] != base['escala']:
+        return [f'Las escalas no coinciden ({actual["escala"]} vs {base["escala"]}): no son comparables.']
+    for clave in ('base_de_datos', 'base_en_memoria'):
+        if actual['entorno'].get(clave) != base['entorno'].get(clave):
+            return [f'Los entornos no coinciden en {clave}: no son comparables.']
+
+    regresiones = []
+    for nombre, caso in actual['casos'].items():
+        anterior = base['casos'].get(nombre)
+        if not anterior:
+            continue
+        if caso['ms_mediana'] > anterior['ms_mediana'] * (1 + tolerancia):
+            regresiones.append(
+                f'{nombre}: mediana {anterior["ms_mediana"]} -> {caso["ms_mediana"]} ms '
+                f'(+{(caso["ms_mediana"] / anterior["ms_mediana"] - 1) * 100:.0f} %)'
+            )
+        if caso['consultas'] > anterior['consultas']:
+            regresiones.append(f'{nombre}: consultas {anterior["consultas"]} -> {caso["consultas"]}')
+    return regresiones
+
+
+def guardar_reporte(reporte, ruta):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(reporte, archivo, indent=2, ensure_ascii=False)
+
+
+def leer_reporte(ruta):
+    with open(ruta, encoding='utf-8') as archivo:
+        return json.load(archivo)
@@ -0,0 +1,160 @@
+# mi_proyecto/cache.py - CACHÉ DE FRAGMENTOS CON INVALIDACIÓN POR MODELO
+
+"""
+Capa común de caché para todas las apps (el backend se elige en settings.CACHES).
+
+Cada modelo cacheable tiene una "versión" en la caché: la marca de tiempo de
+su último cambio. Las claves de los fragmentos incluyen las versiones de los
+modelos de los que dependen, así que invalidar es solo cambiar la versión;
+las entradas viejas dejan de leerse y vencen solas.
+
+    from mi_proyecto.cache import cachear_resultado
+
+    @cachear_resultado(modelos=['compras.Inventario'])
+    def resumen_stock(categoria):
+        ...
+
+    # Fragmentos de template: {% cache 300 tabla_stock firma %}
+    context['firma'] = firma_modelos('compras.Inventario', 'compras.Factura')
+
+Los modelos que invalidan están en MODELOS_CACHEADOS: el ready() de cada app
+llama a conectar_invalidacion, que conecta post_save/post_delete de los suyos.
+Los caminos en bloque (bulk_create, bulk_update, update()) llaman a
+invalidar_modelos a mano.
+"""
+
+import hashlib
+import time
+from functools import wraps
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+# Modelo cuyas escrituras invalidan -> modelo cuya versión cambia (los
+# adjuntos forman parte del reporte: invalidan ReporteAsistencia)
+MODELOS_CACHEADOS = {
+    'compras.Inventario': 'compras.Inventario',
+    'compras.Factura': 'compras.Factura',
+    'control_horas.RegistroJornada': 'control_horas.RegistroJornada',
+    'clientes.ReporteAsistencia': 'clientes.ReporteAsistencia',
+    'clientes.ArchivoReporte': 'clientes.ReporteAsistencia',
+}
+
+_FALTA = object()
+
+
+def _etiqueta(modelo):
+    """'app.modelo' (en minúsculas) a partir de la clase, una instancia o el texto."""
+    if isinstance(modelo, str):
+        return apps.get_model(modelo)._meta.label_lower
+    return modelo._meta.label_lower
+
+
+def _clave_version(etiqueta):
+    return f'cache:version:{etiqueta}'
+
+
+# ==========================================================
+# 1. VERSIONES POR MODELO
+# ==========================================================
+
+def version_modelos(*modelos):
+    """
+    Tupla con la versión de cada modelo. Si una versión no está (caché
+    reiniciada o desalojada) se crea con la hora actual: nunca se devuelve
+    un fragmento calculado antes de un cambio.
+    """
+    claves = [_clave_version(_etiqueta(m)) for m in modelos]
+    encontradas = cache.get_many(claves)
+
+    faltantes = [clave for clave in claves if clave not in encontradas]
+    if faltantes:
+        ahora = time.time_ns()
+        for clave in faltantes:
+            # add() no pisa la versión si otro proceso la creó recién
+            cache.add(clave, ahora, timeout=None)
+        encontradas.update(cache.get_many(faltantes))
+
+    return tuple(encontradas.get(clave, 0) for clave in claves)
+
+
+def firma_modelos(*modelos):
+    """Texto corto que cambia con cualquier escritura sobre los modelos (para {% cache %})."""
+    return hashlib.sha1(repr(version_modelos(*modelos)).encode()).hexdigest()[:16]
+
+
+def invalidar_modelos(*modelos):
+    """
+    Marca los modelos como modificados. Se aplica al confirmar la transacción
+    para que ningún fragmento calculado con datos viejos quede bajo la versión nueva.
+    """
+    claves = [_clave_version(_etiqueta(m)) for m in modelos]
+
+    def _marcar():
+        ahora = time.time_ns()
+        cache.set_many({clave: ahora for clave in claves}, timeout=None)
+
+    transaction.on_commit(_marcar)
+
+
+def conectar_invalidacion(app_config):
+    """Conecta post_save/post_delete de los modelos de la app listados en MODELOS_CACHEADOS (desde ready())."""
+    for escrito, invalidado in MODELOS_CACHEADOS.items():
+        app_label, nombre_modelo = escrito.split('.')
+        if app_label != app_config.label:
+            continue
+
+        def _invalidar(sender, _invalidado=invalidado, **kwargs):
+            invalidar_modelos(_invalidado)
+
+        modelo = app_config.get_model(nombre_modelo)
+        post_save.connect(_invalidar, sender=modelo, weak=False, dispatch_uid=f'cache_fragmentos_{escrito}')
+        post_delete.connect(_invalidar, sender=modelo, weak=False, dispatch_uid=f'cache_fragmentos_{escrito}_del')
+
+
+# ==========================================================
+# 2. FRAGMENTOS
+# ==========================================================
+
+def clave_fragmento(nombre, *partes, modelos=()):
+    """Clave de caché de un fragmento: nombre + partes + versiones de sus modelos."""
+    firma = hashlib.sha1(repr((partes, version_modelos(*modelos))).encode()).hexdigest()
+    return f'cache:fragmento:{nombre}:{firma}'
+
+
+def obtener_fragmento(nombre, calcular, *partes, modelos=(), timeout=None):
+    """Devuelve el fragmento cacheado o lo calcula con `calcular()` y lo guarda."""
+    clave = clave_fragmento(nombre, *partes, modelos=modelos)
+    valor = cache.get(clave, _FALTA)
+    if valor is _FALTA:
+        valor = calcular()
+        cache.set(clave, valor, timeout if timeout is not None else settings.CACHE_FRAGMENTOS_TTL)
+    return valor
+
+
+def cachear_resultado(modelos, timeout=None, nombre=None):
+    """
+    Decorador: cachea el resultado de la función según sus argumentos y las
+    versiones de `modelos`. Los argumentos deben ser valores simples (ids,
+    fechas, textos): forman parte de la clave a través de repr().
+    El resultado debe poder serializarse (pickle) para los backends de archivo y Redis.
+    """
+    def decorador(funcion):
+        nombre_fragmento = nombre or f'{funcion.__module__}.{funcion.__qualname__}'
+
+        @wraps(funcion)
+        def envoltura(*args, **kwargs):
+            return obtener_fragmento(
+                nombre_fragmento,
+                lambda: funcion(*args, **kwargs),
+                args, sorted(kwargs.items()),
+                modelos=modelos,
+                timeout=timeout,
+            )
+
+        envoltura.sin_cache = funcion
+        return envoltura
+    return decorador
@@ -0,0 +1,25 @@
+# mi_proyecto/csv_streaming.py - CSV EN STREAMING (StreamingHttpResponse)
+
+"""
+Exportaciones CSV que se envían línea por línea: csv.writer escribe sobre un
+pseudo-archivo que devuelve cada línea en vez de acumularla, así la descarga
+empieza con la primera fila y nunca se arma el archivo completo en memoria.
+
+    response = StreamingHttpResponse(stream_csv(COLUMNAS, filas), content_type='text/csv')
+"""
+
+import csv
+
+
+class BufferEco:
+    """Pseudo-archivo para csv.writer: devuelve la línea en vez de acumularla."""
+    def write(self, value):
+        return value
+
+
+def stream_csv(columnas, filas):
+    """Genera la línea de encabezado y una línea CSV por cada fila de `filas`."""
+    writer = csv.writer(BufferEco())
+    yield writer.writerow(columnas)
+    for fila in filas:
+        yield writer.writerow(fila)
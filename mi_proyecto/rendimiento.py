@@ -0,0 +1,218 @@
+# mi_proyecto/rendimiento.py - MEDICIÓN DE RENDIMIENTO POR VISTA
+
+"""
+Middleware que mide cada request: tiempo total, cantidad de consultas SQL,
+tiempo en la base de datos y tamaño de la respuesta, agrupado por nombre de
+URL ('app:nombre'). Funciona con DEBUG=False: las consultas se cuentan con
+connection.execute_wrapper, no con connection.queries.
+
+Las mediciones quedan en memoria (por proceso) en una ventana de las últimas
+RENDIMIENTO_VENTANA requests por vista, y se consultan en /SYM/rendimiento/
+(solo staff). Si una vista supera su presupuesto de consultas
+(PRESUPUESTO_CONSULTAS / PRESUPUESTO_CONSULTAS_DEFECTO) se registra un warning.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.db import connections
+from django.http import FileResponse, JsonResponse
+from django.views.decorators.http import require_http_methods
+
+logger = logging.getLogger(__name__)
+
+# Límites (ms) de los tramos del histograma de tiempos
+TRAMOS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+# ==========================================================
+# 1. REGISTRO EN MEMORIA
+# ==========================================================
+
+def _percentil(valores_ordenados, p):
+    if not valores_ordenados:
+        return 0
+    indice = min(len(valores_ordenados) - 1, int(round(p / 100 * (len(valores_ordenados) - 1))))
+    return valores_ordenados[indice]
+
+
+class RegistroRendimiento:
+    """Últimas `ventana` mediciones por vista, compartidas entre los hilos del proceso."""
+
+    def __init__(self, ventana=500):
+        self.ventana = ventana
+        self._lock = threading.Lock()
+        self._muestras = {}
+        self._totales = {}
+
+    def registrar(self, vista, ms, consultas, db_ms, tamano, excedido):
+        with self._lock:
+            muestras = self._muestras.get(vista)
+            if muestras is None:
+                muestras = self._muestras[vista] = deque(maxlen=self.ventana)
+                self._totales[vista] = {'requests': 0, 'excesos_presupuesto': 0}
+            muestras.append((ms, consultas, db_ms, tamano))
+            self._totales[vista]['requests'] += 1
+            self._totales[vista]['excesos_presupuesto'] += int(excedido)
+
+    def reiniciar(self):
+        with self._lock:
+            self._muestras.clear()
+            self._totales.clear()
+
+    def estadisticas(self):
+        """Resumen por vista, de la más lenta (p95) a la más rápida."""
+        with self._lock:
+            copia = {vista: (list(muestras), dict(self._totales[vista])) for vista, muestras in self._muestras.items()}
+
+        resumen = []
+        for vista, (muestras, totales) in copia.items():
+            tiempos = sorted(m[0] for m in muestras)
+            consultas = sorted(m[1] for m in muestras)
+            tamanos = [m[3] for m in muestras if m[3] is not None]
+
+            histograma = {f'<={limite}ms': 0 for limite in TRAMOS_MS}
+            histograma[f'>{TRAMOS_MS[-1]}ms'] = 0
+            for ms in tiempos:
+                tramo = next((f'<={limite}ms' for limite in TRAMOS_MS if ms <= limite), f'>{TRAMOS_MS[-1]}ms')
+                histograma[tramo] += 1
+
+            n = len(muestras)
+            resumen.append({
+                'vista': vista,
+                'muestras': n,
+                **totales,
+                'presupuesto_consultas': presupuesto_consultas(vista),
+                'ms_p50': round(_percentil(tiempos, 50), 1),
+                'ms_p95': round(_percentil(tiempos, 95), 1),
+                'ms_p99': round(_percentil(tiempos, 99), 1),
+                'ms_max': round(tiempos[-1], 1),
+                'consultas_promedio': round(sum(consultas) / n, 1),
+                'consultas_max': consultas[-1],
+                'db_ms_promedio': round(sum(m[2] for m in muestras) / n, 1),
+                'bytes_promedio': round(sum(tamanos) / len(tamanos)) if tamanos else None,
+                'histograma_ms': histograma,
+            })
+
+        resumen.sort(key=lambda fila: fila['ms_p95'], reverse=True)
+        return resumen
+
+
+registro_rendimiento = RegistroRendimiento(ventana=getattr(settings, 'RENDIMIENTO_VENTANA', 500))
+
+
+def presupuesto_consultas(vista):
+    presupuestos = getattr(settings, 'PRESUPUESTO_CONSULTAS', {})
+    return presupuestos.get(vista, getattr(settings, 'PRESUPUESTO_CONSULTAS_DEFECTO', None))
+
+
+# ==========================================================
+# 2. MIDDLEWARE
+# ==========================================================
+
+class _ContadorConsultas:
+    """execute_wrapper que cuenta las consultas y acumula su tiempo."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.segundos = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos += time.perf_counter() - inicio
+
+
+def _nombre_vista(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<sin_ruta>'
+    return match.view_name or '<sin_nombre>'
+
+
+class RendimientoMiddleware:
+    """
+    Va después de WhiteNoise (no mide estáticos) y antes del resto, así cuenta
+    también las consultas de sesión y autenticación. En las respuestas en
+    streaming (exportaciones) la medición termina al enviarse el último bloque;
+    en las FileResponse (PDFs de reportes), al cerrarse la respuesta.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        contador = _ContadorConsultas()
+        conexiones = [connections[alias] for alias in connections]
+        for conexion in conexiones:
+            conexion.execute_wrappers.append(contador)
+        inicio = time.perf_counter()
+
+        def terminar(response, tamano):
+            for conexion in conexiones:
+                if contador in conexion.execute_wrappers:
+                    conexion.execute_wrappers.remove(contador)
+            self._registrar(request, response, contador, time.perf_counter() - inicio, tamano)
+
+        try:
+            response = self.get_response(request)
+        except Exception:
+            terminar(None, None)
+            raise
+
+        if isinstance(response, FileResponse):
+            # Reasignar streaming_content descarta file_to_stream y con él el
+            # sendfile del servidor (wsgi.file_wrapper): se mide al cerrar
+            tamano = response.get('Content-Length')
+            response._resource_closers.append(lambda: terminar(response, int(tamano) if tamano else None))
+        elif response.streaming and not response.is_async:
+            response.streaming_content = self._medir_stream(response.streaming_content, response, terminar)
+        else:
+            terminar(response, None if response.streaming else len(response.content))
+        return response
+
+    @staticmethod
+    def _medir_stream(contenido, response, terminar):
+        tamano = 0
+        try:
+            for bloque in contenido:
+                tamano += len(bloque)
+                yield bloque
+        finally:
+            terminar(response, tamano)
+
+    def _registrar(self, request, response, contador, segundos, tamano):
+        vista = _nombre_vista(request)
+        presupuesto = presupuesto_consultas(vista)
+        excedido = presupuesto is not None and contador.consultas > presupuesto
+        if excedido:
+            logger.warning(
+                'La vista %s hizo %d consultas (presupuesto %d): %s %s',
+                vista, contador.consultas, presupuesto, request.method, request.get_full_path(),
+            )
+        registro_rendimiento.registrar(
+            vista, segundos * 1000, contador.consultas, contador.segundos * 1000, tamano, excedido
+        )
+
+
+# ==========================================================
+# 3. ENDPOINT (SOLO STAFF)
+# ==========================================================
+
+@login_required
+@require_http_methods(["GET"])
+def estadisticas_rendimiento(request):
+    """Histograma y percentiles por vista del proceso actual."""
+    if not request.user.is_staff:
+        return JsonResponse({'error': 'Acceso restringido'}, status=403)
+    return JsonResponse({
+        'ventana': registro_rendimiento.ventana,
+        'vistas': registro_rendimiento.estadisticas(),
+    })
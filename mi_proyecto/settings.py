@@ -44,6 +44,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware', # <--- AGREGAR ESTA LÍNEA
+    'mi_proyecto.rendimiento.RendimientoMiddleware',  # Tiempos y consultas por vista (/SYM/rendimiento/)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -117,6 +118,91 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 # URL pública que se usa para acceder a estos archivos en el navegador
 MEDIA_URL = '/media/'
 
+# ==========================================================
+# CACHÉ
+# ==========================================================
+# SYM_CACHE elige el backend (por defecto 'memoria'):
+#   - 'memoria': LocMemCache, propia de cada proceso. Alcanza con un solo
+#     runserver; lo que escriba otro proceso (p. ej. procesar_facturas) solo
+#     se ve al vencer el TTL de los fragmentos.
+#   - 'archivo': FileBasedCache en SYM_CACHE_DIR, compartida entre procesos.
+#   - 'redis':   RedisCache en SYM_REDIS_URL (requiere `pip install redis`).
+# El uso desde el código está en mi_proyecto/cache.py.
+SYM_CACHE = os.environ.get('SYM_CACHE', 'memoria')
+
+if SYM_CACHE == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('SYM_REDIS_URL', 'redis://127.0.0.1:6379/1'),
+            'KEY_PREFIX': 'sym',
+        }
+    }
+elif SYM_CACHE == 'archivo':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get('SYM_CACHE_DIR', os.path.join(BASE_DIR, 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'sym-memoria',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        }
+    }
+
+# Vida por defecto (segundos) de los fragmentos cacheados con mi_proyecto.cache
+CACHE_FRAGMENTOS_TTL = 300
+
+# ==========================================================
+# MEDICIÓN DE RENDIMIENTO (mi_proyecto/rendimiento.py)
+# ==========================================================
+# Mediciones guardadas por vista (las más viejas se descartan)
+RENDIMIENTO_VENTANA = 500
+
+# Consultas SQL máximas esperadas por request (incluye sesión y autenticación).
+# Al superarlas se registra un warning con la vista y la URL.
+PRESUPUESTO_CONSULTAS_DEFECTO = 50
+PRESUPUESTO_CONSULTAS = {
+    'control_horas:saldo_horas': 15,
+    'control_horas:exportar_registros': 10,
+    'control_horas:gestion_solicitudes': 10,
+    'control_horas:journal_data_api': 10,
+}
+
+# ==========================================================
+# PDF DE REPORTES DE ASISTENCIA (clientes/pdf.py)
+# ==========================================================
+# PDFs ya generados, uno por reporte (fuera de MEDIA_ROOT: no se publican en /media/)
+REPORTES_PDF_DIR = os.path.join(BASE_DIR, 'artefactos', 'reportes_pdf')
+
+# Los PDFs que no están generados se encolan para el worker
+# (manage.py procesar_pdfs_reportes) en vez de generarse dentro del request
+REPORTES_PDF_EN_COLA = os.environ.get('SYM_REPORTES_PDF_EN_COLA', '1') == '1'
+
+# Al editar un reporte o sus adjuntos, encolar la regeneración de su PDF
+# (si es False, se genera en la próxima descarga)
+REPORTES_PDF_REGENERAR = os.environ.get('SYM_REPORTES_PDF_REGENERAR', '0') == '1'
+
+# Límites del worker: PDFs generándose a la vez, prioridad de CPU (nice) de
+# sus procesos y trabajos sin terminar por usuario
+REPORTES_PDF_PROCESOS = int(os.environ.get('SYM_REPORTES_PDF_PROCESOS', '2'))
+REPORTES_PDF_NICE = 10
+REPORTES_PDF_MAX_EN_COLA_USUARIO = 5
+
+# Máximo de reportes por exportación masiva a ZIP (clientes/exportacion.py) y
+# segundos que el request espera los PDFs que faltan; debe quedar bien por
+# debajo del timeout de gunicorn (30 s por defecto)
+REPORTES_EXPORTACION_MAX = 500
+REPORTES_EXPORTACION_ESPERA = 20
+
+# Facturas con cientos de líneas envían 3 campos por producto (producto_id_N, cantidad_N, precio_unitario_N)
+DATA_UPLOAD_MAX_NUMBER_FIELDS = 5000
+
 # --- CONFIGURACIÓN DE SESIÓN Y AUTENTICACIÓN ---
 
 # Cierra la sesión automáticamente cuando el usuario cierra el navegador.
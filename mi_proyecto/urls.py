@@ -5,10 +5,14 @@ from django.shortcuts import redirect
 # 🛑 IMPORTS NECESARIOS PARA SERVIR ARCHIVOS DE MEDIA 🛑
 from django.conf import settings
 from django.conf.urls.static import static 
+from mi_proyecto.rendimiento import estadisticas_rendimiento
 # ==========================================================
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+
+    # Tiempos y consultas por vista (solo staff)
+    path('SYM/rendimiento/', estadisticas_rendimiento, name='estadisticas_rendimiento'),
     
     # Redirige la URL principal (http://127.0.0.1:8000/) a la página de login
     path('', lambda r: redirect('SYM/login/'), name='root_redirect'),